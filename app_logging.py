@@ -0,0 +1,100 @@
+# app_logging.py
+"""Leveled, per-subsystem logging for the editor and viewer.
+
+Every subsystem logs through ``get_logger('viewer.fog')`` and friends, all
+children of the ``story_builder`` logger, so one subsystem can be traced
+without the rest.  Pass format arguments instead of building f-strings
+(``log.debug("Loaded %d walls", count)``): nothing is formatted unless the
+level is enabled.
+
+``configure`` reads ``STORY_BUILDER_LOG``, a default level optionally
+followed by per-subsystem levels::
+
+    STORY_BUILDER_LOG=WARNING
+    STORY_BUILDER_LOG=INFO,viewer.tokens=DEBUG,viewer.visibility=DEBUG
+
+Messages that can fire every frame go through ``RateLimitedLog``, which
+emits each message at most once per interval and reports how many it
+dropped.
+"""
+import logging
+import os
+import time
+
+ROOT = 'story_builder'
+LOG_ENV = 'STORY_BUILDER_LOG'
+DEFAULT_LEVEL = 'INFO'
+FORMAT = '%(asctime)s %(levelname)-7s %(name)s: %(message)s'
+
+
+def get_logger(subsystem):
+    """Logger for a subsystem such as ``'viewer.fog'``."""
+    return logging.getLogger(f"{ROOT}.{subsystem}")
+
+
+def configure(spec=None):
+    """Set up console logging from ``spec`` or ``$STORY_BUILDER_LOG``.
+
+    Safe to call more than once; only the first call adds a handler.
+    """
+    if spec is None:
+        spec = os.environ.get(LOG_ENV, DEFAULT_LEVEL)
+
+    root = logging.getLogger(ROOT)
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(FORMAT, datefmt='%H:%M:%S'))
+        root.addHandler(handler)
+        root.propagate = False
+
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, level = part.rpartition('=')
+        level = level.strip().upper()
+        if not isinstance(logging.getLevelName(level), int):
+            root.warning("Ignoring unknown log level %r in %s", level, LOG_ENV)
+            continue
+        target = get_logger(name.strip()) if name else root
+        target.setLevel(level)
+    return root
+
+
+class RateLimitedLog:
+    """Emit each message template at most once per ``interval`` seconds.
+
+    Messages are keyed by their format string, so ``"at (%d, %d)"`` with
+    different positions counts as one message.  Disabled levels return
+    before any bookkeeping.
+    """
+
+    def __init__(self, logger, interval=1.0):
+        self.logger = logger
+        self.interval = interval
+        self._last = {}  # (level, msg) -> time last emitted
+        self._suppressed = {}  # (level, msg) -> count dropped since
+
+    def log(self, level, msg, *args):
+        if not self.logger.isEnabledFor(level):
+            return
+        key = (level, msg)
+        now = time.monotonic()
+        if now - self._last.get(key, -self.interval) < self.interval:
+            self._suppressed[key] = self._suppressed.get(key, 0) + 1
+            return
+        self._last[key] = now
+        suppressed = self._suppressed.pop(key, 0)
+        if suppressed:
+            self.logger.log(level, msg + " (%d similar suppressed)", *args, suppressed)
+        else:
+            self.logger.log(level, msg, *args)
+
+    def debug(self, msg, *args):
+        self.log(logging.DEBUG, msg, *args)
+
+    def info(self, msg, *args):
+        self.log(logging.INFO, msg, *args)
+
+    def warning(self, msg, *args):
+        self.log(logging.WARNING, msg, *args)
@@ -0,0 +1,387 @@
+# bench_app.py
+"""Headless benchmarks of the editor and viewer hot paths.
+
+Builds a synthetic map (size, wall density, locations and tokens are
+configurable), runs ``StandaloneMapEditor`` and ``StandaloneMapViewerApp``
+under SDL's dummy video driver against a throwaway SQLite database, and
+times:
+
+- editor: ``draw_map``, ``draw_walls_and_doors``, ``draw_locations`` while
+  panning, a full ``save_map``, an ``autosave`` after each small edit,
+  and ``load_map`` (including the background image decode)
+- viewer: ``update_visibility`` and ``draw_fog_of_war`` while the player
+  walks, and ``animate_tokens`` with every token moving
+
+Per-function timing percentiles (ms) and peak Python memory are printed and
+written to JSON so runs can be compared.  Memory is measured in a separate,
+shorter pass because tracing allocations slows the code down.
+Run from the repository root:
+
+    python benchmarks/bench_app.py --size 100 --density 0.2 --tokens 200 --output before.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+# Add the parent directory to sys.path to import our modules
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_ROOT)
+
+import pygame
+
+MEMORY_CALLS = 3  # Calls traced per function for peak memory
+
+
+class SyntheticDatabase:
+    """The parts of ``database.Database`` the editor's save and load paths use, on a file."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.cursor = self.conn.cursor()
+        self.cursor.executescript(
+            "CREATE TABLE IF NOT EXISTS maps ("
+            " id INTEGER PRIMARY KEY, name TEXT, image_path TEXT, grid_size INTEGER,"
+            " grid_enabled INTEGER, width INTEGER, height INTEGER, grid_color TEXT,"
+            " map_scale REAL, grid_style TEXT, grid_opacity REAL);"
+            "CREATE TABLE IF NOT EXISTS map_walls (map_id INTEGER, grid_x INTEGER, grid_y INTEGER);"
+            "CREATE TABLE IF NOT EXISTS map_doors (map_id INTEGER, grid_x INTEGER, grid_y INTEGER);"
+            "CREATE TABLE IF NOT EXISTS map_locations ("
+            " id INTEGER PRIMARY KEY, map_id INTEGER, x INTEGER, y INTEGER, name TEXT);"
+        )
+        self.conn.commit()
+
+    _COLUMNS = ('name', 'image_path', 'grid_size', 'grid_enabled', 'width', 'height',
+                'grid_color', 'map_scale', 'grid_style', 'grid_opacity')
+
+    def save_or_update_map(self, map_data):
+        values = [map_data[column] for column in self._COLUMNS]
+        if map_data.get('id'):
+            assignments = ", ".join(f"{column} = ?" for column in self._COLUMNS)
+            self.cursor.execute(f"UPDATE maps SET {assignments} WHERE id = ?", values + [map_data['id']])
+            self.conn.commit()
+            return map_data['id']
+        placeholders = ", ".join("?" for _ in self._COLUMNS)
+        self.cursor.execute(
+            f"INSERT INTO maps ({', '.join(self._COLUMNS)}) VALUES ({placeholders})", values
+        )
+        self.conn.commit()
+        return self.cursor.lastrowid
+
+    def get_map_by_id(self, map_id):
+        self.cursor.execute(f"SELECT id, {', '.join(self._COLUMNS)} FROM maps WHERE id = ?", (map_id,))
+        row = self.cursor.fetchone()
+        return dict(zip(('id',) + self._COLUMNS, row)) if row else None
+
+    def get_all_maps(self):
+        self.cursor.execute("SELECT id, name FROM maps")
+        return self.cursor.fetchall()
+
+    def get_map_locations(self, map_id):
+        self.cursor.execute("SELECT id, x, y, name FROM map_locations WHERE map_id = ?", (map_id,))
+        return self.cursor.fetchall()
+
+    def close(self):
+        self.conn.close()
+
+
+class SyntheticMapView:
+    """Camera and map size in place of ``EnhancedMapViewer`` for the viewer benchmarks."""
+
+    def __init__(self, app_ref=None):
+        self.app_ref = app_ref
+        self.map_area_rect = pygame.Rect(0, 0, 0, 0)
+        self.current_map_id = None
+        self.map_surface = None
+        self.map_width = 0
+        self.map_height = 0
+        self.grid_size = 0
+        self.zoom_level = 1.0
+        self.camera_x = 0.0
+        self.camera_y = 0.0
+        self.location_icons = []
+
+    def map_to_screen_coords(self, pos):
+        return (
+            int(self.map_area_rect.left + (pos[0] - self.camera_x) * self.zoom_level),
+            int(self.map_area_rect.top + (pos[1] - self.camera_y) * self.zoom_level)
+        )
+
+    def screen_to_map_coords(self, pos):
+        return (
+            (pos[0] - self.map_area_rect.left) / self.zoom_level + self.camera_x,
+            (pos[1] - self.map_area_rect.top) / self.zoom_level + self.camera_y
+        )
+
+    def handle_event(self, event):
+        pass
+
+    def update(self, time_delta):
+        pass
+
+    def draw(self, screen, **kwargs):
+        pass
+
+
+def make_image(width, height, seed=1):
+    """A map-like image: a base colour with scattered rectangles."""
+    rng = random.Random(seed)
+    image = pygame.Surface((width, height))
+    image.fill((90, 110, 80))
+    for _ in range(width * height // 20000 + 1):
+        color = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        image.fill(color, pygame.Rect(rng.randrange(width), rng.randrange(height),
+                                      rng.randint(8, 200), rng.randint(8, 200)))
+    return image
+
+
+def make_walls(size, density, seed=1):
+    rng = random.Random(seed)
+    return {(x, y) for x in range(size) for y in range(size) if rng.random() < density}
+
+
+def percentiles(samples):
+    """Summary of a list of millisecond timings."""
+    ordered = sorted(samples)
+    count = len(ordered)
+
+    def rank(q):
+        return ordered[min(count - 1, int(q * count))]
+
+    return {
+        'calls': count,
+        'mean_ms': sum(ordered) / count,
+        'p50_ms': rank(0.50),
+        'p90_ms': rank(0.90),
+        'p99_ms': rank(0.99),
+        'max_ms': ordered[-1]
+    }
+
+
+def measure(func, iterations, before=None):
+    """Time ``func`` ``iterations`` times, then trace a few calls for peak memory.
+
+    ``before`` runs untimed ahead of every call.
+    """
+    samples = []
+    for _ in range(iterations):
+        if before:
+            before()
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    stats = percentiles(samples)
+
+    tracemalloc.start()
+    for _ in range(min(MEMORY_CALLS, iterations)):
+        if before:
+            before()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        func()
+        stats['peak_kb'] = max(stats.get('peak_kb', 0.0),
+                               (tracemalloc.get_traced_memory()[1] - baseline) / 1024.0)
+    tracemalloc.stop()
+    return stats
+
+
+def bench_editor(args, db_path):
+    import map_editor
+
+    map_editor.Database = lambda: SyntheticDatabase(db_path)
+    editor = map_editor.StandaloneMapEditor()
+    rng = random.Random(args.seed)
+    results = {}
+    try:
+        size, grid = args.size, args.grid_size
+        editor.grid_size = grid
+        editor.set_map_image(make_image(size * grid, size * grid, args.seed).convert_alpha(), None)
+        editor.map_name = "Benchmark Map"
+        walls = make_walls(size, args.density, args.seed)
+        editor.add_cells('walls', walls)
+        editor.add_cells('doors', {(rng.randrange(size), rng.randrange(size)) for _ in range(size)})
+        for index in range(args.locations):
+            editor.locations.append({
+                'name': f"Location {index}", 'type': 'generic',
+                'x': rng.randrange(size * grid), 'y': rng.randrange(size * grid),
+                'notes': '', 'audio_file': None, 'sub_map_id': None
+            })
+        editor.journal.record_locations()
+
+        # Pan across the map, wrapping around, so tiles are both built and reused
+        span = max(1, size * grid - editor.map_area.width)
+        frame = [0]
+
+        def pan():
+            frame[0] += 1
+            editor.camera_x = (frame[0] * 37) % span
+            editor.camera_y = (frame[0] * 23) % span
+
+        for name in ('draw_map', 'draw_walls_and_doors', 'draw_locations'):
+            results[f'editor.{name}'] = measure(getattr(editor, name), args.iterations, pan)
+
+        def save():
+            editor.save_map()
+            while not editor.save_worker.idle:
+                time.sleep(0.0005)
+            editor.process_save_messages()
+
+        def autosave():
+            editor.autosave()
+            while not editor.save_worker.idle:
+                time.sleep(0.0005)
+            editor.process_save_messages()
+
+        def edit():
+            cells = {(rng.randrange(size), rng.randrange(size)) for _ in range(20)}
+            editor.remove_cells('walls', editor.walls.intersection(cells))
+            editor.add_cells('walls', editor.walls.missing(cells))
+
+        results['editor.save_map_full'] = measure(save, 1)
+        results['editor.save_map_incremental'] = measure(autosave, args.iterations // 4 or 1, edit)
+
+        map_id = editor.map_id
+
+        def load():
+            editor.load_map(map_id)
+            while editor.image_loader.loading:
+                editor.process_image_load()
+                time.sleep(0.0005)
+
+        results['editor.load_map'] = measure(load, args.iterations // 10 or 1)
+    finally:
+        editor.cleanup()
+    return results
+
+
+def bench_viewer(args, db_path):
+    try:
+        import standalone_map_viewer as viewer_module
+    except ImportError as e:
+        return {'viewer': {'skipped': f"Cannot import the viewer: {e}"}}
+    from fog import ExploredCells
+
+    viewer_module.Database = lambda: SyntheticDatabase(db_path)
+    viewer_module.EnhancedMapViewer = SyntheticMapView
+    app = viewer_module.StandaloneMapViewerApp()
+    rng = random.Random(args.seed)
+    results = {}
+    try:
+        size, grid = args.size, args.grid_size
+        view = app.map_viewer
+        view.grid_size = grid
+        view.map_width = view.map_height = size * grid
+        view.map_surface = pygame.Surface((1, 1))
+        view.current_map_id = 1
+
+        walls = make_walls(size, args.density, args.seed)
+        app.grid_layer.clear()
+        app.walls.update(walls)
+        app.walls_version += 1
+        app.explored = ExploredCells(size, size)
+        open_cells = [(x, y) for x in range(size) for y in range(size) if (x, y) not in walls]
+
+        player = app.token_registry.get('player_1')
+        player['x'], player['y'] = rng.choice(open_cells)
+        app.token_registry.moved(player)
+        for index in range(args.tokens):
+            x, y = rng.choice(open_cells)
+            app.token_registry.add({
+                'id': f'npc_{index}', 'name': f'NPC {index}', 'x': x, 'y': y, 'type': 'npc',
+                'target_x': x, 'target_y': y, 'is_moving': False, 'move_speed': 6.0,
+                'path': [], 'selected': False
+            })
+
+        def walk():
+            # Step the player to a random open neighbour and keep the camera on it
+            x, y = int(round(player['x'])), int(round(player['y']))
+            steps = [(x + dx, y + dy) for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))
+                     if 0 <= x + dx < size and 0 <= y + dy < size and (x + dx, y + dy) not in walls]
+            player['x'], player['y'] = rng.choice(steps) if steps else rng.choice(open_cells)
+            app.token_registry.moved(player)
+            view.camera_x = player['x'] * grid - view.map_area_rect.width / 2
+            view.camera_y = player['y'] * grid - view.map_area_rect.height / 2
+
+        results['viewer.update_visibility'] = measure(app.update_visibility, args.iterations, walk)
+
+        def walk_and_see():
+            walk()
+            app.update_visibility()
+
+        results['viewer.draw_fog_of_war'] = measure(app.draw_fog_of_war, args.iterations, walk_and_see)
+
+        def keep_moving():
+            # Give every token that has arrived a new nearby target
+            for token in app.tokens:
+                if not token['is_moving']:
+                    target_x = min(size - 1, max(0, int(token['x']) + rng.randint(-3, 3)))
+                    target_y = min(size - 1, max(0, int(token['y']) + rng.randint(-3, 3)))
+                    app.set_token_target(token, target_x, target_y)
+
+        def animate_frame():
+            app.animate_tokens(1.0 / 60.0)
+
+        results['viewer.animate_tokens'] = measure(animate_frame, args.iterations, keep_moving)
+    finally:
+        app.db.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=100, help="map side in grid cells")
+    parser.add_argument('--grid-size', type=int, default=32, help="grid cell size in pixels")
+    parser.add_argument('--density', type=float, default=0.2, help="fraction of cells that are walls")
+    parser.add_argument('--tokens', type=int, default=200, help="extra tokens in the viewer")
+    parser.add_argument('--locations', type=int, default=200, help="locations in the editor")
+    parser.add_argument('--iterations', type=int, default=200, help="timed calls per function")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='bench_app.json', help="JSON results file")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        # Saved images and the database stay in the throwaway directory
+        previous_cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            db_path = os.path.join(workdir, 'bench.db')
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                results.update(bench_editor(args, db_path))
+                results.update(bench_viewer(args, db_path))
+        finally:
+            os.chdir(previous_cwd)
+            pygame.quit()
+
+    report = {
+        'config': vars(args),
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'results': results
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'function':<30} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} {'peak KB':>9}")
+    for name, stats in results.items():
+        if 'skipped' in stats:
+            print(f"{name:<30} skipped: {stats['skipped']}")
+            continue
+        print(f"{name:<30} {stats['p50_ms']:>9.3f} {stats['p90_ms']:>9.3f} {stats['p99_ms']:>9.3f} "
+              f"{stats['max_ms']:>9.3f} {stats['peak_kb']:>9.1f}")
+    print(f"Wrote {output}")
+
+
+if __name__ == '__main__':
+    main()
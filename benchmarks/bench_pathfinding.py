@@ -0,0 +1,77 @@
+# bench_pathfinding.py
+"""A* pathfinding on 500x500 grids: long and short routes, and cached lookups.
+
+Long routes cross the whole map corner to corner; short routes are a
+click-to-move within 10 movement points (bounded by ``max_cost``).
+Run from the repository root:
+
+    python benchmarks/bench_pathfinding.py
+"""
+import os
+import random
+import sys
+import timeit
+
+# Add the parent directory to sys.path to import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pathfinding import ALTERNATING, EUCLIDEAN, Pathfinder, build_blocked, find_path
+
+GRID_SIZE = 500
+WALL_DENSITIES = (0.0, 0.1, 0.25)
+MODES = (
+    ('4-way', False, ALTERNATING),
+    ('8-way 1-2-1', True, ALTERNATING),
+    ('8-way sqrt2', True, EUCLIDEAN),
+)
+SHORT_TRIP = 7
+MOVEMENT = 10
+
+
+def make_walls(density, keep, seed=1):
+    """Scatter walls over the grid, keeping the given cells open."""
+    rng = random.Random(seed)
+    walls = set()
+    for x in range(GRID_SIZE):
+        for y in range(GRID_SIZE):
+            if rng.random() < density:
+                walls.add((x, y))
+    walls.difference_update(keep)
+    return walls
+
+
+def time_call(func, *args, repeat=3):
+    """Return the best per-call time in milliseconds."""
+    timer = timeit.Timer(lambda: func(*args))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1000.0
+
+
+def main():
+    start = (0, 0)
+    far = (GRID_SIZE - 1, GRID_SIZE - 1)
+    centre = (GRID_SIZE // 2, GRID_SIZE // 2)
+    near = (centre[0] + SHORT_TRIP, centre[1] - SHORT_TRIP // 2)
+
+    print(f"{'density':>8} {'mode':>12} {'long ms':>9} {'steps':>6} {'short ms':>9} "
+          f"{'cached us':>10}")
+    for density in WALL_DENSITIES:
+        walls = make_walls(density, keep=(start, far, centre, near))
+        blocked = build_blocked(walls, GRID_SIZE, GRID_SIZE)
+        for name, diagonal, rule in MODES:
+            long_args = (start, far, blocked, GRID_SIZE, GRID_SIZE, diagonal, rule)
+            short_args = (centre, near, blocked, GRID_SIZE, GRID_SIZE, diagonal, rule, MOVEMENT)
+            result = find_path(*long_args)
+            steps = len(result[0]) - 1 if result else '-'
+
+            pathfinder = Pathfinder()
+            cached_args = (centre, near, walls, GRID_SIZE, GRID_SIZE, 1, diagonal, rule, MOVEMENT)
+            pathfinder.find(*cached_args)
+            cached_us = time_call(pathfinder.find, *cached_args) * 1000.0
+
+            print(f"{density:>8.2f} {name:>12} {time_call(find_path, *long_args):>9.1f} "
+                  f"{steps:>6} {time_call(find_path, *short_args):>9.3f} {cached_us:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
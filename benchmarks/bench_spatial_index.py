@@ -0,0 +1,138 @@
+# bench_spatial_index.py
+"""Per-frame wall lookup and draw cost as the wall count grows.
+
+Mirrors the work ``StandaloneMapEditor.draw_walls_and_doors`` does: finding
+the wall cells inside a 950x740 view at 50px cells, centred on a map whose
+size grows with the wall count.  Compares the original full scan of a set
+against ``CellView.cells_in_rect`` on the ``GridLayer`` the editor uses,
+and, when pygame is installed, times drawing the view from ``OverlayCache``
+tiles both cold (every tile rendered) and warm (blits only).  Lookup and
+draw times should stay flat from 1k to 500k walls.
+Run from the repository root:
+
+    python benchmarks/bench_spatial_index.py
+"""
+import os
+import random
+import sys
+import timeit
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+# Add the parent directory to sys.path to import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grid_layer import GridLayer
+
+try:
+    import pygame
+    from overlay_cache import OverlayCache, tile_cells
+except ImportError:
+    pygame = None
+
+WALL_COUNTS = (1000, 10000, 100000, 500000)
+GRID_SIZE = 50
+VIEW_WIDTH, VIEW_HEIGHT = 950, 740
+
+
+def make_cells(count, seed=1):
+    """Random distinct cells on a square map at ~50% density; return (cells, side)."""
+    rng = random.Random(seed)
+    side = int((count * 2) ** 0.5) + 1
+    cells = set()
+    while len(cells) < count:
+        cells.add((rng.randrange(side), rng.randrange(side)))
+    return cells, side
+
+
+def view_rect(camera):
+    """Inclusive grid cell range the view covers."""
+    camera_x, camera_y = camera
+    return (camera_x // GRID_SIZE, camera_y // GRID_SIZE,
+            (camera_x + VIEW_WIDTH) // GRID_SIZE, (camera_y + VIEW_HEIGHT) // GRID_SIZE)
+
+
+def scan_all(walls, camera):
+    """The original draw path: test every wall against the view."""
+    camera_x, camera_y = camera
+    visible = 0
+    for wall_x, wall_y in walls:
+        screen_x = (wall_x * GRID_SIZE - camera_x)
+        screen_y = (wall_y * GRID_SIZE - camera_y)
+        if 0 <= screen_x < VIEW_WIDTH and 0 <= screen_y < VIEW_HEIGHT:
+            visible += 1
+    return visible
+
+
+def scan_grid(walls, camera):
+    """The grid draw path: only cells inside the view are looked at."""
+    camera_x, camera_y = camera
+    visible = 0
+    for wall_x, wall_y in walls.cells_in_rect(*view_rect(camera)):
+        screen_x = (wall_x * GRID_SIZE - camera_x)
+        screen_y = (wall_y * GRID_SIZE - camera_y)
+        if 0 <= screen_x < VIEW_WIDTH and 0 <= screen_y < VIEW_HEIGHT:
+            visible += 1
+    return visible
+
+
+def draw_tiles(screen, cache, grid, camera):
+    """``draw_walls_and_doors`` at zoom 1: blit the overlay tiles covering the view."""
+    camera_x, camera_y = camera
+    size = tile_cells(GRID_SIZE)
+    x0, y0, x1, y1 = view_rect(camera)
+    for tile_y in range(y0 // size, y1 // size + 1):
+        for tile_x in range(x0 // size, x1 // size + 1):
+            tile = cache.get_tile(GRID_SIZE, tile_x, tile_y, grid.walls, grid.doors)
+            if tile:
+                screen.blit(tile, (tile_x * size * GRID_SIZE - camera_x,
+                                   tile_y * size * GRID_SIZE - camera_y))
+
+
+def time_call(func, *args, repeat=5):
+    """Return the best per-call time in milliseconds."""
+    timer = timeit.Timer(lambda: func(*args))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1000.0
+
+
+def main():
+    screen = None
+    if pygame is not None:
+        pygame.init()
+        screen = pygame.display.set_mode((VIEW_WIDTH, VIEW_HEIGHT))
+
+    print(f"{'walls':>8} {'set scan ms':>12} {'grid ms':>8} {'cold draw ms':>13} "
+          f"{'warm draw ms':>13} {'on screen':>10} {'set MB':>7} {'grid MB':>8}")
+    for count in WALL_COUNTS:
+        cells, side = make_cells(count)
+        grid = GridLayer()
+        grid.walls.update(cells)
+        # View the middle of the map
+        camera = (side * GRID_SIZE // 2, side * GRID_SIZE // 2)
+        on_screen = scan_grid(grid.walls, camera)
+        assert scan_all(cells, camera) == on_screen
+        # The set itself plus one tuple and two ints per cell
+        set_mb = (sys.getsizeof(cells) + count * (sys.getsizeof((0, 0)) + 2 * 28)) / 2 ** 20
+
+        cold = warm = "n/a"
+        if screen is not None:
+            cache = OverlayCache()
+
+            def cold_draw():
+                cache.clear()
+                draw_tiles(screen, cache, grid, camera)
+
+            cold = f"{time_call(cold_draw):.3f}"
+            warm = f"{time_call(draw_tiles, screen, cache, grid, camera):.3f}"
+
+        print(f"{count:>8} {time_call(scan_all, cells, camera):>12.3f} "
+              f"{time_call(scan_grid, grid.walls, camera):>8.3f} {cold:>13} {warm:>13} "
+              f"{on_screen:>10} {set_mb:>7.1f} {grid.nbytes / 2 ** 20:>8.2f}")
+
+    if pygame is not None:
+        pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# bench_visibility.py
+"""Compare shadowcasting visibility against the per-cell Bresenham path.
+
+Shadowcasting is timed with the walls as a set and as the ``GridLayer``
+the viewer uses.
+
+Run from the repository root:
+
+    python benchmarks/bench_visibility.py
+"""
+import os
+import random
+import sys
+import timeit
+
+# Add the parent directory to sys.path to import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grid_layer import GridLayer
+from visibility import compute_visible_cells, compute_visible_cells_raycast
+
+GRID_SIZE = 100
+RADII = (3, 5, 10, 15, 20)
+WALL_DENSITIES = (0.0, 0.1, 0.3)
+
+
+def make_walls(density, seed=1):
+    """Scatter walls over the grid, keeping the centre cell open."""
+    rng = random.Random(seed)
+    centre = (GRID_SIZE // 2, GRID_SIZE // 2)
+    walls = set()
+    for x in range(GRID_SIZE):
+        for y in range(GRID_SIZE):
+            if (x, y) != centre and rng.random() < density:
+                walls.add((x, y))
+    return walls
+
+
+def time_call(func, *args, repeat=5):
+    """Return the best per-call time in milliseconds."""
+    timer = timeit.Timer(lambda: func(*args))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1000.0
+
+
+def main():
+    origin = (GRID_SIZE // 2, GRID_SIZE // 2)
+    print(f"{'density':>8} {'radius':>6} {'raycast ms':>11} {'shadow ms':>10} {'grid ms':>8} "
+          f"{'speedup':>8} {'cells':>6}")
+    for density in WALL_DENSITIES:
+        walls = make_walls(density)
+        grid = GridLayer()
+        grid.walls.update(walls)
+        for radius in RADII:
+            args = (origin, radius, walls, GRID_SIZE, GRID_SIZE)
+            raycast_ms = time_call(compute_visible_cells_raycast, *args)
+            shadow_ms = time_call(compute_visible_cells, *args)
+            grid_ms = time_call(compute_visible_cells, origin, radius, grid.walls, GRID_SIZE, GRID_SIZE)
+            cells = len(compute_visible_cells(*args))
+            print(f"{density:>8.1f} {radius:>6} {raycast_ms:>11.3f} {shadow_ms:>10.3f} {grid_ms:>8.3f} "
+                  f"{raycast_ms / grid_ms:>7.1f}x {cells:>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+# fog.py
+"""Persistent fog of war layer for the map viewer.
+
+The fog surface is allocated once and only touched when the visible set or
+the view (camera, zoom, grid size) changes.  A change of view rebuilds the
+whole surface; a change of visible cells only repaints the cells that
+entered or left view.  Idle frames are a single blit.
+
+Cells the player has seen but cannot currently see are kept in an
+``ExploredCells`` bitset and drawn with a lighter fog.  The bitset is stored
+per map in the ``map_exploration`` table so exploration survives restarts.
+"""
+import time
+
+import pygame
+
+FOG_COLOR = (0, 0, 0, 220)  # Very dark fog
+SEEN_COLOR = (0, 0, 0, 150)  # Explored but not currently visible
+CLEAR_COLOR = (0, 0, 0, 0)
+
+
+class FogLayer:
+    def __init__(self, size):
+        self.surface = pygame.Surface(size, pygame.SRCALPHA)
+        self.surface.fill(FOG_COLOR)
+        self.visible = frozenset()
+        self.view_key = None
+
+        # Frame-time counters
+        self.full_rebuilds = 0
+        self.partial_updates = 0
+        self.idle_frames = 0
+        self.last_update_ms = 0.0
+        self.last_frame_ms = 0.0
+
+    def invalidate(self):
+        """Force a full rebuild on the next update."""
+        self.view_key = None
+
+    def update(self, visible, view_key, cell_rect, explored=None, view_cells=None):
+        """Bring the fog surface in line with ``visible``.
+
+        ``view_key`` identifies the camera/zoom state; ``cell_rect(x, y)``
+        returns the screen rect of a grid cell for that state.  ``explored``
+        is an optional ``ExploredCells``; ``view_cells`` is the
+        ``(x0, y0, x1, y1)`` grid region on screen, used to limit how much of
+        it a full rebuild has to paint.
+        """
+        start = time.perf_counter()
+
+        if view_key != self.view_key:
+            self.surface.fill(FOG_COLOR)
+            if explored is not None and view_cells is not None:
+                for x, y in explored.iter_region(*view_cells):
+                    self.surface.fill(SEEN_COLOR, cell_rect(x, y))
+            for x, y in visible:
+                self.surface.fill(CLEAR_COLOR, cell_rect(x, y))
+            self.full_rebuilds += 1
+        elif visible is not self.visible and visible != self.visible:
+            hidden = self.visible - visible
+            revealed = set(visible) - self.visible
+            for x, y in hidden:
+                seen = explored is not None and (x, y) in explored
+                self.surface.fill(SEEN_COLOR if seen else FOG_COLOR, cell_rect(x, y))
+            # Cell rects can overlap by a pixel after rounding, so re-clear
+            # visible cells bordering anything that was just fogged.
+            for x, y in hidden:
+                for neighbour in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+                    if neighbour in visible:
+                        revealed.add(neighbour)
+            for x, y in revealed:
+                self.surface.fill(CLEAR_COLOR, cell_rect(x, y))
+            self.partial_updates += 1
+        else:
+            self.idle_frames += 1
+            self.last_update_ms = 0.0
+            return False
+
+        self.visible = frozenset(visible)
+        self.view_key = view_key
+        self.last_update_ms = (time.perf_counter() - start) * 1000.0
+        return True
+
+    def draw(self, screen):
+        """Blit the fog onto the screen, recording the frame's total fog cost."""
+        start = time.perf_counter()
+        screen.blit(self.surface, (0, 0))
+        self.last_frame_ms = self.last_update_ms + (time.perf_counter() - start) * 1000.0
+
+
+class ExploredCells:
+    """Bitset of grid cells that have been seen at least once.
+
+    One bit per cell of a ``width`` x ``height`` grid, row-major.  Cells
+    outside the grid are ignored.
+    """
+
+    def __init__(self, width, height, data=None):
+        self.width = width
+        self.height = height
+        size = (width * height + 7) // 8
+        if data is not None and len(data) == size:
+            self.bits = bytearray(data)
+        else:
+            self.bits = bytearray(size)
+        self.dirty = False
+
+    def __contains__(self, cell):
+        x, y = cell
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        index = y * self.width + x
+        return bool(self.bits[index >> 3] & (1 << (index & 7)))
+
+    def mark(self, cells):
+        """Mark cells as explored; return how many were new."""
+        bits = self.bits
+        width, height = self.width, self.height
+        added = 0
+        for x, y in cells:
+            if 0 <= x < width and 0 <= y < height:
+                index = y * width + x
+                mask = 1 << (index & 7)
+                if not bits[index >> 3] & mask:
+                    bits[index >> 3] |= mask
+                    added += 1
+        if added:
+            self.dirty = True
+        return added
+
+    def iter_region(self, x0, y0, x1, y1):
+        """Yield explored cells with x0 <= x <= x1 and y0 <= y <= y1."""
+        bits = self.bits
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, self.width - 1), min(y1, self.height - 1)
+        for y in range(y0, y1 + 1):
+            row = y * self.width
+            for x in range(x0, x1 + 1):
+                index = row + x
+                if bits[index >> 3] & (1 << (index & 7)):
+                    yield (x, y)
+
+    def clear(self):
+        """Forget all explored cells."""
+        self.bits = bytearray(len(self.bits))
+        self.dirty = True
+
+
+def load_explored(db, map_id, width, height):
+    """Load the explored bitset for a map, or an empty one if none is stored."""
+    ensure_exploration_table(db)
+    db.cursor.execute(
+        "SELECT grid_width, grid_height, cells FROM map_exploration WHERE map_id = ?",
+        (map_id,)
+    )
+    row = db.cursor.fetchone()
+    # A stored bitset for a different grid layout no longer lines up
+    if row and row[0] == width and row[1] == height:
+        return ExploredCells(width, height, row[2])
+    return ExploredCells(width, height)
+
+
+def save_explored(db, map_id, explored):
+    """Persist the explored bitset for a map if it changed."""
+    if not explored.dirty:
+        return
+    ensure_exploration_table(db)
+    db.cursor.execute(
+        "INSERT OR REPLACE INTO map_exploration (map_id, grid_width, grid_height, cells) "
+        "VALUES (?, ?, ?, ?)",
+        (map_id, explored.width, explored.height, bytes(explored.bits))
+    )
+    db.conn.commit()
+    explored.dirty = False
+
+
+def ensure_exploration_table(db):
+    """Create the map_exploration table if this database predates it."""
+    db.cursor.execute(
+        "CREATE TABLE IF NOT EXISTS map_exploration ("
+        "map_id INTEGER PRIMARY KEY, "
+        "grid_width INTEGER NOT NULL, "
+        "grid_height INTEGER NOT NULL, "
+        "cells BLOB NOT NULL)"
+    )
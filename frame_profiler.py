@@ -0,0 +1,195 @@
+# frame_profiler.py
+"""Opt-in per-frame timing for the editor and viewer main loops.
+
+Wrap each phase of a frame in ``with profiler.scope('name'):`` and call
+``begin_frame``/``end_frame`` around the loop body.  While the profiler is
+disabled a scope is a shared no-op context manager, so the instrumentation
+costs next to nothing.  When enabled, each scope's time per frame goes into
+a rolling window that ``stats`` turns into p50/p99, and ``draw`` shows them
+as an on-screen overlay, refreshed a few times a second via ``overlay_due``
+rather than forcing every frame to redraw.  ``start_capture`` records a
+cProfile of the next N frames and writes it to disk (view with
+``python -m pstats`` or snakeviz).
+
+Set ``STORY_BUILDER_PROFILE=1`` to start with profiling on; the apps also
+toggle it with F3 and start a capture with F4.
+"""
+import cProfile
+import os
+import time
+from collections import deque
+
+import pygame
+
+PROFILE_ENV = 'STORY_BUILDER_PROFILE'
+TOGGLE_KEY = pygame.K_F3
+CAPTURE_KEY = pygame.K_F4
+CAPTURE_FRAMES = 120
+CAPTURE_DIR = 'profiles'
+OVERLAY_REFRESH = 0.25  # Seconds between overlay redraws
+
+
+class _NullScope:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SCOPE = _NullScope()
+
+
+class _Scope:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        totals = self.profiler._frame_totals
+        totals[self.name] = totals.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+class FrameProfiler:
+    def __init__(self, window=300, enabled=None):
+        if enabled is None:
+            enabled = os.environ.get(PROFILE_ENV, '') not in ('', '0')
+        self.enabled = enabled
+        self.window = window
+        self.overlay_rect = None  # Screen area the overlay last covered
+        self._overlay_drawn = 0.0
+        self._samples = {}  # scope name -> deque of seconds per frame, in first-seen order
+        self._frame_totals = {}
+        self._frame_start = None
+        self._font = None
+
+        self._capture = None  # cProfile.Profile while capturing
+        self._capture_frames = 0
+        self._capture_path = None
+        self.last_capture_path = None
+
+    def toggle(self):
+        """Turn profiling and its overlay on or off."""
+        self.enabled = not self.enabled
+        if not self.enabled:
+            self._samples.clear()
+            self._frame_totals = {}
+            self._frame_start = None
+            self.overlay_rect = None
+
+    def scope(self, name):
+        """Context manager timing one phase of the current frame."""
+        if not self.enabled:
+            return _NULL_SCOPE
+        return _Scope(self, name)
+
+    def begin_frame(self):
+        self._frame_totals = {}
+        self._frame_start = time.perf_counter() if self.enabled else None
+
+    def end_frame(self):
+        if self._frame_start is not None:
+            self._frame_totals['frame'] = time.perf_counter() - self._frame_start
+            for name, seconds in self._frame_totals.items():
+                samples = self._samples.get(name)
+                if samples is None:
+                    samples = self._samples[name] = deque(maxlen=self.window)
+                samples.append(seconds)
+            self._frame_start = None
+
+        if self._capture is not None:
+            self._capture_frames -= 1
+            if self._capture_frames <= 0:
+                self._finish_capture()
+
+    def stats(self):
+        """Return ``[(name, p50_ms, p99_ms)]`` for every scope seen."""
+        rows = []
+        for name, samples in self._samples.items():
+            ordered = sorted(samples)
+            count = len(ordered)
+            rows.append((
+                name,
+                ordered[count // 2] * 1000.0,
+                ordered[min(count - 1, int(count * 0.99))] * 1000.0
+            ))
+        return rows
+
+    @property
+    def capturing(self):
+        return self._capture is not None
+
+    def start_capture(self, frames=CAPTURE_FRAMES, path=None):
+        """Record a cProfile of the next ``frames`` frames; return the output path."""
+        if self._capture is not None:
+            return self._capture_path
+        if path is None:
+            os.makedirs(CAPTURE_DIR, exist_ok=True)
+            path = os.path.join(CAPTURE_DIR, time.strftime("frames_%Y%m%d_%H%M%S.prof"))
+        self._capture_path = path
+        self._capture_frames = frames
+        self._capture = cProfile.Profile()
+        self._capture.enable()
+        return path
+
+    def _finish_capture(self):
+        self._capture.disable()
+        self._capture.dump_stats(self._capture_path)
+        self.last_capture_path = self._capture_path
+        self._capture = None
+
+    def overlay_due(self):
+        """True when the overlay is showing and its numbers are worth redrawing."""
+        return (self.enabled and self.overlay_rect is not None
+                and time.monotonic() - self._overlay_drawn >= OVERLAY_REFRESH)
+
+    def draw(self, screen, position):
+        """Draw the p50/p99 table with its top-left corner at ``position``."""
+        if not self.enabled:
+            self.overlay_rect = None
+            return
+        if self._font is None:
+            self._font = pygame.font.Font(None, 18)
+
+        color = (255, 255, 0)
+        rows = [("scope", "p50 ms", "p99 ms")]
+        rows += [(name, f"{p50:.2f}", f"{p99:.2f}") for name, p50, p99 in self.stats()]
+        # The default font is proportional, so columns are laid out by pixel:
+        # names left-aligned, numbers right-aligned
+        cells = [[self._font.render(text, True, color) for text in row] for row in rows]
+        widths = [max(row[column].get_width() for row in cells) for column in range(3)]
+        line_height = self._font.get_linesize()
+        footer = None
+        if self._capture is not None:
+            footer = self._font.render(f"capturing {self._capture_frames} frames...", True, color)
+        elif self.last_capture_path:
+            footer = self._font.render(f"saved {self.last_capture_path}", True, color)
+
+        gap = 12
+        p50_right = 4 + widths[0] + gap + widths[1]
+        p99_right = p50_right + gap + widths[2]
+        width = p99_right + 4
+        if footer is not None:
+            width = max(width, footer.get_width() + 8)
+        height = line_height * (len(cells) + (footer is not None)) + 8
+        panel = pygame.Surface((width, height), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 180))
+        right_edges = (None, p50_right, p99_right)
+        y = 4
+        for row in cells:
+            panel.blit(row[0], (4, y))
+            for column in (1, 2):
+                panel.blit(row[column], (right_edges[column] - row[column].get_width(), y))
+            y += line_height
+        if footer is not None:
+            panel.blit(footer, (4, y))
+        screen.blit(panel, position)
+        self._overlay_drawn = time.monotonic()
+        self.overlay_rect = pygame.Rect(position, (width, height))
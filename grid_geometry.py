@@ -0,0 +1,33 @@
+# grid_geometry.py
+"""Rasterizing shapes onto grid cells, shared by the map editor and viewer."""
+
+
+def get_line(x1, y1, x2, y2):
+    """Get all points on a line between (x1,y1) and (x2,y2) using Bresenham's algorithm"""
+    points = []
+    dx = abs(x2 - x1)
+    dy = abs(y2 - y1)
+    sx = 1 if x1 < x2 else -1
+    sy = 1 if y1 < y2 else -1
+    err = dx - dy
+
+    while True:
+        points.append((x1, y1))
+        if x1 == x2 and y1 == y2:
+            break
+        e2 = 2 * err
+        if e2 > -dy:
+            err -= dy
+            x1 += sx
+        if e2 < dx:
+            err += dx
+            y1 += sy
+
+    return points
+
+
+def get_rect_cells(x1, y1, x2, y2):
+    """Get all cells of the filled rectangle with corners (x1,y1) and (x2,y2)."""
+    left, right = min(x1, x2), max(x1, x2)
+    top, bottom = min(y1, y2), max(y1, y2)
+    return [(x, y) for y in range(top, bottom + 1) for x in range(left, right + 1)]
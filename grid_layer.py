@@ -0,0 +1,250 @@
+# grid_layer.py
+"""Occupancy grid for walls, doors and difficult terrain.
+
+``GridLayer`` keeps one byte of flag bits per cell in a 2D NumPy array
+(indexed ``[y, x]``), offset by an origin so cells left of or above (0, 0)
+still fit.  It grows as cells are added outside it.  ``walls``, ``doors``
+and ``difficult`` are ``CellView`` objects that act like sets of ``(x, y)``
+tuples over one bit each, so existing ``(x, y) in walls`` code keeps
+working, while bulk work (fills, region erases, visibility, pathfinding)
+can use ``GridLayer.array`` or ``CellView.mask`` directly.
+
+The array shares memory with a ``bytearray`` that single-cell lookups index
+directly; that is faster than indexing a NumPy array from Python.
+"""
+import numpy as np
+
+WALL = 1
+DOOR = 2
+DIFFICULT = 4
+
+_GROW_MARGIN = 32  # Extra cells added on each side that has to grow
+
+
+class GridLayer:
+    def __init__(self, width=0, height=0, origin=(0, 0)):
+        self.origin_x, self.origin_y = origin
+        self._allocate(width, height)
+        self._counts = {WALL: 0, DOOR: 0, DIFFICULT: 0}
+        self.walls = CellView(self, WALL)
+        self.doors = CellView(self, DOOR)
+        self.difficult = CellView(self, DIFFICULT)
+
+    def __repr__(self):
+        return (f"GridLayer({self.width}x{self.height} at ({self.origin_x}, {self.origin_y}), "
+                f"{self._counts[WALL]} walls, {self._counts[DOOR]} doors)")
+
+    @property
+    def nbytes(self):
+        return self.array.nbytes
+
+    def _allocate(self, width, height):
+        self.width = width
+        self.height = height
+        self._buffer = bytearray(width * height)
+        self.array = np.frombuffer(self._buffer, dtype=np.uint8).reshape(height, width)
+
+    def flags(self, x, y):
+        """Flag bits of a cell (0 outside the grid)."""
+        x -= self.origin_x
+        y -= self.origin_y
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self._buffer[y * self.width + x]
+        return 0
+
+    def bounds(self):
+        """Inclusive (x0, y0, x1, y1) cell range the array covers."""
+        return (self.origin_x, self.origin_y,
+                self.origin_x + self.width - 1, self.origin_y + self.height - 1)
+
+    def region(self, x0, y0, x1, y1):
+        """Copy of the flags in an inclusive cell rectangle, zeros outside the grid."""
+        out = np.zeros((y1 - y0 + 1, x1 - x0 + 1), dtype=np.uint8)
+        gx0, gy0, gx1, gy1 = self.bounds()
+        cx0, cy0 = max(x0, gx0), max(y0, gy0)
+        cx1, cy1 = min(x1, gx1), min(y1, gy1)
+        if cx0 <= cx1 and cy0 <= cy1:
+            out[cy0 - y0:cy1 - y0 + 1, cx0 - x0:cx1 - x0 + 1] = self.array[
+                cy0 - self.origin_y:cy1 - self.origin_y + 1,
+                cx0 - self.origin_x:cx1 - self.origin_x + 1
+            ]
+        return out
+
+    def ensure(self, x0, y0, x1, y1):
+        """Grow the array so the inclusive cell rectangle fits."""
+        gx0, gy0, gx1, gy1 = self.bounds()
+        if self.width and x0 >= gx0 and y0 >= gy0 and x1 <= gx1 and y1 <= gy1:
+            return
+        if not self.width or not self.height:
+            nx0, ny0, nx1, ny1 = x0, y0, x1, y1
+        else:
+            nx0 = x0 - _GROW_MARGIN if x0 < gx0 else gx0
+            ny0 = y0 - _GROW_MARGIN if y0 < gy0 else gy0
+            nx1 = x1 + _GROW_MARGIN if x1 > gx1 else gx1
+            ny1 = y1 + _GROW_MARGIN if y1 > gy1 else gy1
+
+        old = self.array
+        old_x, old_y = self.origin_x, self.origin_y
+        self.origin_x, self.origin_y = nx0, ny0
+        self._allocate(nx1 - nx0 + 1, ny1 - ny0 + 1)
+        if old.size:
+            self.array[old_y - ny0:old_y - ny0 + old.shape[0],
+                       old_x - nx0:old_x - nx0 + old.shape[1]] = old
+
+    def clear(self):
+        """Remove every flag from every cell."""
+        self.array[:] = 0
+        for bit in self._counts:
+            self._counts[bit] = 0
+
+    def _recount(self, bit):
+        self._counts[bit] = int(np.count_nonzero(self.array & bit))
+
+
+class CellView:
+    """Set-like view of the cells in a ``GridLayer`` that have one flag bit."""
+
+    def __init__(self, grid, bit):
+        self.grid = grid
+        self.bit = bit
+
+    def __contains__(self, cell):
+        grid = self.grid
+        x = cell[0] - grid.origin_x
+        y = cell[1] - grid.origin_y
+        return (0 <= x < grid.width and 0 <= y < grid.height
+                and grid._buffer[y * grid.width + x] & self.bit != 0)
+
+    def __iter__(self):
+        grid = self.grid
+        ys, xs = np.nonzero(grid.array & self.bit)
+        return zip((xs + grid.origin_x).tolist(), (ys + grid.origin_y).tolist())
+
+    def __len__(self):
+        return self.grid._counts[self.bit]
+
+    def __bool__(self):
+        return self.grid._counts[self.bit] > 0
+
+    def __repr__(self):
+        return f"CellView(bit={self.bit}, {len(self)} cells)"
+
+    def add(self, cell):
+        grid = self.grid
+        x, y = cell
+        grid.ensure(x, y, x, y)
+        index = (y - grid.origin_y) * grid.width + (x - grid.origin_x)
+        if not grid._buffer[index] & self.bit:
+            grid._buffer[index] |= self.bit
+            grid._counts[self.bit] += 1
+
+    def discard(self, cell):
+        grid = self.grid
+        x = cell[0] - grid.origin_x
+        y = cell[1] - grid.origin_y
+        if 0 <= x < grid.width and 0 <= y < grid.height:
+            index = y * grid.width + x
+            if grid._buffer[index] & self.bit:
+                grid._buffer[index] &= ~self.bit & 0xFF
+                grid._counts[self.bit] -= 1
+
+    def remove(self, cell):
+        if cell not in self:
+            raise KeyError(cell)
+        self.discard(cell)
+
+    def update(self, cells):
+        """Add many cells with one vectorized write."""
+        xs, ys = _coordinates(cells)
+        if not xs.size:
+            return
+        grid = self.grid
+        grid.ensure(int(xs.min()), int(ys.min()), int(xs.max()), int(ys.max()))
+        grid.array[ys - grid.origin_y, xs - grid.origin_x] |= self.bit
+        grid._recount(self.bit)
+
+    def difference_update(self, cells):
+        """Remove many cells with one vectorized write."""
+        xs, ys = _coordinates(cells)
+        grid = self.grid
+        xs = xs - grid.origin_x
+        ys = ys - grid.origin_y
+        inside = (xs >= 0) & (xs < grid.width) & (ys >= 0) & (ys < grid.height)
+        if inside.any():
+            grid.array[ys[inside], xs[inside]] &= ~self.bit & 0xFF
+            grid._recount(self.bit)
+
+    def intersection(self, cells):
+        """Return the given cells that are in this set, as a plain set."""
+        return {cell for cell in cells if cell in self}
+
+    def missing(self, cells):
+        """Return the given cells that are not in this set, as a plain set."""
+        return {cell for cell in cells if cell not in self}
+
+    def clear(self):
+        self.grid.array[:] &= ~self.bit & 0xFF
+        self.grid._counts[self.bit] = 0
+
+    def mask(self, x0, y0, x1, y1):
+        """Boolean array of this flag over an inclusive cell rectangle, indexed [y, x]."""
+        return (self.grid.region(x0, y0, x1, y1) & self.bit) != 0
+
+    def cells_in_rect(self, x0, y0, x1, y1):
+        """Yield stored cells with x0 <= x <= x1 and y0 <= y <= y1."""
+        ys, xs = np.nonzero(self.mask(x0, y0, x1, y1))
+        return zip((xs + x0).tolist(), (ys + y0).tolist())
+
+    def fill_rect(self, x0, y0, x1, y1):
+        """Set the flag on every cell of an inclusive rectangle."""
+        grid = self.grid
+        grid.ensure(x0, y0, x1, y1)
+        grid.array[y0 - grid.origin_y:y1 - grid.origin_y + 1,
+                   x0 - grid.origin_x:x1 - grid.origin_x + 1] |= self.bit
+        grid._recount(self.bit)
+
+    def erase_rect(self, x0, y0, x1, y1):
+        """Clear the flag on every cell of an inclusive rectangle."""
+        grid = self.grid
+        gx0, gy0, gx1, gy1 = grid.bounds()
+        x0, y0, x1, y1 = max(x0, gx0), max(y0, gy0), min(x1, gx1), min(y1, gy1)
+        if x0 <= x1 and y0 <= y1:
+            grid.array[y0 - grid.origin_y:y1 - grid.origin_y + 1,
+                       x0 - grid.origin_x:x1 - grid.origin_x + 1] &= ~self.bit & 0xFF
+            grid._recount(self.bit)
+
+    def paint_bitmap(self, x0, y0, width, height, bits):
+        """Set the flag from a little-endian, row-major bitmap of a width x height box."""
+        if not width or not height:
+            return
+        mask = np.unpackbits(np.frombuffer(bits, dtype=np.uint8), bitorder='little')
+        mask = mask[:width * height].reshape(height, width).astype(bool)
+        grid = self.grid
+        grid.ensure(x0, y0, x0 + width - 1, y0 + height - 1)
+        region = grid.array[y0 - grid.origin_y:y0 - grid.origin_y + height,
+                            x0 - grid.origin_x:x0 - grid.origin_x + width]
+        region[mask] |= self.bit
+        grid._recount(self.bit)
+
+    def erase_bitmap(self, x0, y0, width, height, bits):
+        """Clear the flag from the cells set in a bitmap laid out as for ``paint_bitmap``."""
+        if not width or not height:
+            return
+        mask = np.unpackbits(np.frombuffer(bits, dtype=np.uint8), bitorder='little')
+        mask = mask[:width * height].reshape(height, width).astype(bool)
+        grid = self.grid
+        gx0, gy0, gx1, gy1 = grid.bounds()
+        cx0, cy0 = max(x0, gx0), max(y0, gy0)
+        cx1, cy1 = min(x0 + width - 1, gx1), min(y0 + height - 1, gy1)
+        if cx0 > cx1 or cy0 > cy1:
+            return
+        region = grid.array[cy0 - grid.origin_y:cy1 - grid.origin_y + 1,
+                            cx0 - grid.origin_x:cx1 - grid.origin_x + 1]
+        region[mask[cy0 - y0:cy1 - y0 + 1, cx0 - x0:cx1 - x0 + 1]] &= ~self.bit & 0xFF
+        grid._recount(self.bit)
+
+
+def _coordinates(cells):
+    """Split an iterable of (x, y) cells into x and y integer arrays."""
+    coords = np.array(list(cells), dtype=np.int64).reshape(-1, 2)
+    return coords[:, 0], coords[:, 1]
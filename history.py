@@ -0,0 +1,98 @@
+# history.py
+"""Undo/redo for wall, door and erase strokes in the map editor.
+
+Each mouse stroke becomes one entry holding only the cells it actually added
+or removed per layer (the same ``{layer: (added, removed)}`` shape as a
+``journal`` delta), so undoing is proportional to the stroke, not the map.
+History is bounded by a total cell budget and a stroke count; the oldest
+strokes are evicted first.
+"""
+from collections import deque
+
+from journal import LAYERS, delta_size, empty_delta
+
+
+class EditHistory:
+    def __init__(self, max_cells=250000, max_strokes=1000):
+        self.max_cells = max_cells
+        self.max_strokes = max_strokes
+        self._undo = deque()
+        self._redo = []
+        self._cells = 0  # Cells held across both stacks
+        self._stroke = None
+
+    @property
+    def in_stroke(self):
+        return self._stroke is not None
+
+    def begin_stroke(self):
+        """Start collecting changes into a new stroke.
+
+        A stroke still open (its mouse-up lost, e.g. to a dialog) is pushed
+        first so its changes can still be undone.
+        """
+        if self._stroke is not None:
+            self.end_stroke()
+        self._stroke = empty_delta()
+
+    def record(self, layer, added=(), removed=()):
+        """Add cell changes to the open stroke; ignored when no stroke is open."""
+        if self._stroke is None:
+            return
+        stroke_added, stroke_removed = self._stroke[layer]
+        for cell in added:
+            if cell in stroke_removed:
+                stroke_removed.discard(cell)
+            else:
+                stroke_added.add(cell)
+        for cell in removed:
+            if cell in stroke_added:
+                stroke_added.discard(cell)
+            else:
+                stroke_removed.add(cell)
+
+    def end_stroke(self):
+        """Close the open stroke and push it if it changed anything."""
+        stroke, self._stroke = self._stroke, None
+        if stroke is None:
+            return
+        size = delta_size(stroke)
+        if not size:
+            return
+
+        # A new edit invalidates anything that could be redone
+        self._cells -= sum(delta_size(entry) for entry in self._redo)
+        self._redo.clear()
+
+        self._undo.append(stroke)
+        self._cells += size
+        while self._undo and (self._cells > self.max_cells or len(self._undo) > self.max_strokes):
+            self._cells -= delta_size(self._undo.popleft())
+
+    def undo(self):
+        """Pop the last stroke and return the delta that reverts it, or None."""
+        if self._stroke is not None or not self._undo:
+            return None
+        stroke = self._undo.pop()
+        self._redo.append(stroke)
+        return invert(stroke)
+
+    def redo(self):
+        """Pop the last undone stroke and return the delta that reapplies it, or None."""
+        if self._stroke is not None or not self._redo:
+            return None
+        stroke = self._redo.pop()
+        self._undo.append(stroke)
+        return stroke
+
+    def clear(self):
+        """Drop all history, e.g. when another map is opened."""
+        self._undo.clear()
+        self._redo.clear()
+        self._cells = 0
+        self._stroke = None
+
+
+def invert(delta):
+    """Return the delta that undoes ``delta``."""
+    return {layer: (delta[layer][1], delta[layer][0]) for layer in LAYERS}
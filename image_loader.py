@@ -0,0 +1,71 @@
+# image_loader.py
+"""Background decoding of map images.
+
+``pygame.image.load`` runs on a worker thread so opening a large image does
+not freeze the main loop.  The decoded surface is handed back through
+``poll``; converting it to the display format is left to the main thread,
+which owns the display.  Starting a new load or calling ``cancel`` makes any
+earlier load's result be discarded.
+"""
+import os
+import queue
+import threading
+import time
+
+import pygame
+
+
+class ImageLoader:
+    def __init__(self):
+        self._results = queue.Queue()
+        self._current = 0
+        self.path = None  # File being decoded, None when idle
+        self.started_at = None
+        self.file_size = 0
+
+    @property
+    def loading(self):
+        return self.path is not None
+
+    @property
+    def elapsed(self):
+        """Seconds since the current load started."""
+        return time.monotonic() - self.started_at if self.loading else 0.0
+
+    def load(self, path):
+        """Start decoding ``path`` in the background."""
+        self._current += 1
+        self.path = path
+        self.started_at = time.monotonic()
+        try:
+            self.file_size = os.path.getsize(path)
+        except OSError:
+            self.file_size = 0
+        threading.Thread(
+            target=self._decode,
+            args=(self._current, path),
+            name="map-image-loader",
+            daemon=True
+        ).start()
+
+    def cancel(self):
+        """Forget the current load; its result will be dropped."""
+        self._current += 1
+        self.path = None
+
+    def poll(self):
+        """Return ``(path, surface, error)`` once the current load finishes, else None."""
+        while True:
+            try:
+                request, path, surface, error = self._results.get_nowait()
+            except queue.Empty:
+                return None
+            if request == self._current and self.path is not None:
+                self.path = None
+                return path, surface, error
+
+    def _decode(self, request, path):
+        try:
+            self._results.put((request, path, pygame.image.load(path), None))
+        except Exception as e:
+            self._results.put((request, path, None, e))
@@ -0,0 +1,134 @@
+# image_store.py
+"""Content-addressed storage for map background images.
+
+Images are saved as ``data/images/<sha256 of the pixels>.png`` and recorded
+in the ``map_images`` table with a count of the maps using them.  Saving an
+image that is already stored is a hash and a lookup with no PNG encode, and
+maps that share a background share one file.  A file is deleted once no map
+refers to it any more.
+
+Image files from before this store (``map_<id>.png``) are not in the table
+and are never touched.
+"""
+import hashlib
+import os
+
+import pygame
+
+IMAGE_DIR = os.path.join("data", "images")
+
+
+def ensure_image_table(db):
+    """Create the map_images table if this database predates it."""
+    db.cursor.execute(
+        "CREATE TABLE IF NOT EXISTS map_images ("
+        "hash TEXT PRIMARY KEY, "
+        "path TEXT NOT NULL UNIQUE, "
+        "refcount INTEGER NOT NULL DEFAULT 0)"
+    )
+
+
+def image_digest(surface):
+    """SHA-256 of an image's size, pixel format and pixels.
+
+    Rows are hashed straight from the surface's pixel buffer, skipping any
+    row padding, so no copy of the image is made.
+    """
+    width, height = surface.get_size()
+    bytesize = surface.get_bytesize()
+    pitch = surface.get_pitch()
+    digest = hashlib.sha256()
+    digest.update(f"{width}x{height}x{bytesize}:{surface.get_masks()}".encode())
+    row_bytes = width * bytesize
+    with memoryview(surface.get_buffer()) as pixels:
+        pixels = pixels.cast('B')
+        for row in range(height):
+            start = row * pitch
+            digest.update(pixels[start:start + row_bytes])
+    return digest.hexdigest()
+
+
+def store_image(db, surface, report=None, digest=None):
+    """Return the stored path of an image, encoding it only if it is new.
+
+    ``digest`` is the image's ``image_digest`` if the caller already has it.
+    """
+    report = report or (lambda message: None)
+    ensure_image_table(db)
+
+    if digest is None:
+        report("Hashing image...")
+        digest = image_digest(surface)
+    db.cursor.execute("SELECT path FROM map_images WHERE hash = ?", (digest,))
+    row = db.cursor.fetchone()
+    if row and os.path.exists(row[0]):
+        return row[0]
+
+    report("Encoding image...")
+    os.makedirs(IMAGE_DIR, exist_ok=True)
+    path = os.path.join(IMAGE_DIR, f"{digest}.png")
+    # Write beside the final name so a crash never leaves a truncated image
+    temp_path = path + ".tmp.png"
+    pygame.image.save(surface, temp_path)
+    os.replace(temp_path, path)
+
+    with db.conn:
+        db.cursor.execute(
+            "INSERT OR IGNORE INTO map_images (hash, path, refcount) VALUES (?, ?, 0)",
+            (digest, path)
+        )
+    return path
+
+
+def change_image_reference(db, old_path, new_path):
+    """Move one map's reference from ``old_path`` to ``new_path``.
+
+    Either may be None or a file outside the store.  Files left with no
+    references are deleted.
+    """
+    if old_path == new_path:
+        return
+    ensure_image_table(db)
+
+    unreferenced = []
+    with db.conn:
+        if new_path:
+            db.cursor.execute(
+                "UPDATE map_images SET refcount = refcount + 1 WHERE path = ?", (new_path,)
+            )
+        if old_path:
+            db.cursor.execute(
+                "UPDATE map_images SET refcount = refcount - 1 WHERE path = ?", (old_path,)
+            )
+            db.cursor.execute(
+                "SELECT path FROM map_images WHERE path = ? AND refcount <= 0", (old_path,)
+            )
+            unreferenced = [row[0] for row in db.cursor.fetchall()]
+            db.cursor.execute("DELETE FROM map_images WHERE path = ? AND refcount <= 0", (old_path,))
+
+    # Only remove files once the table no longer points at them
+    _remove_files(unreferenced)
+
+
+def discard_unreferenced(db, path):
+    """Delete a stored image that no map refers to.
+
+    For a save that stored an image but failed before a map referenced it.
+    Files outside the store and images still in use are left alone.
+    """
+    if not path:
+        return
+    ensure_image_table(db)
+    with db.conn:
+        db.cursor.execute("SELECT path FROM map_images WHERE path = ? AND refcount <= 0", (path,))
+        unreferenced = [row[0] for row in db.cursor.fetchall()]
+        db.cursor.execute("DELETE FROM map_images WHERE path = ? AND refcount <= 0", (path,))
+    _remove_files(unreferenced)
+
+
+def _remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,130 @@
+# journal.py
+"""Change tracking for the map editor.
+
+``ChangeJournal`` keeps a version counter that every edit bumps, plus the
+net set of wall/door cells added and removed since the last save.  Saves take
+that delta instead of the whole map, so their cost follows the number of
+edits rather than the size of the map.
+
+A delta is a dict ``{layer: (added, removed)}`` of cell sets for each layer in
+``LAYERS``.
+
+A failed save's delta is put back with ``restore``.  Edits recorded after
+that delta was taken may already have been saved by a later snapshot, so
+the journal keeps the changes made since each save in flight, and
+``restore`` drops the entries those changes undid.  Otherwise a wall added
+by the failed save and removed by the next one would come back.
+"""
+
+LAYERS = ('walls', 'doors')
+
+
+def empty_delta():
+    """Return a delta with no changes."""
+    return {layer: (set(), set()) for layer in LAYERS}
+
+
+def merge_deltas(older, newer):
+    """Combine two consecutive deltas into one, ``newer`` applying last."""
+    merged = {}
+    for layer in LAYERS:
+        old_added, old_removed = older[layer]
+        new_added, new_removed = newer[layer]
+        added = (old_added - new_removed) | (new_added - old_removed)
+        removed = (old_removed - new_added) | (new_removed - old_added)
+        merged[layer] = (added, removed)
+    return merged
+
+
+def delta_size(delta):
+    """Number of cell changes in a delta."""
+    return sum(len(added) + len(removed) for added, removed in delta.values())
+
+
+class ChangeJournal:
+    def __init__(self):
+        self.version = 0
+        self.saved_version = 0
+        self._delta = empty_delta()
+        self._locations_changed = False
+        self._since = {}  # version of each save in flight -> changes recorded after it
+
+    @property
+    def dirty(self):
+        """True if there are edits since the last save."""
+        return self.version != self.saved_version
+
+    def record(self, layer, added=(), removed=()):
+        """Record cells that were actually added to / removed from a layer."""
+        if not added and not removed:
+            return
+        _apply(self._delta[layer], added, removed)
+        for since in self._since.values():
+            _apply(since[layer], added, removed)
+        self.version += 1
+
+    def record_locations(self):
+        """Record a change to the location list."""
+        self._locations_changed = True
+        self.version += 1
+
+    def touch(self):
+        """Record a change that isn't part of the cell layers (grid, name, image)."""
+        self.version += 1
+
+    def take(self):
+        """Return ``(version, delta, locations_changed)`` and start a new delta."""
+        taken = (self.version, self._delta, self._locations_changed)
+        self._delta = empty_delta()
+        self._locations_changed = False
+        self._since.setdefault(self.version, empty_delta())
+        return taken
+
+    def restore(self, version, delta, locations_changed):
+        """Put back the delta taken at ``version`` whose save failed.
+
+        Entries undone by edits recorded since it was taken are dropped; the
+        rest go beneath the edits not yet taken.
+        """
+        since = self._since.get(version) or empty_delta()
+        self._forget(version)
+        kept = {}
+        for layer in LAYERS:
+            added, removed = delta[layer]
+            since_added, since_removed = since[layer]
+            kept[layer] = (added - since_removed, removed - since_added)
+        self._delta = merge_deltas(kept, self._delta)
+        self._locations_changed = self._locations_changed or locations_changed
+
+    def mark_saved(self, version):
+        """Record that everything up to ``version`` has been persisted."""
+        self.saved_version = max(self.saved_version, version)
+        self._forget(version)
+
+    def _forget(self, version):
+        # A save's result also settles any snapshots merged into it
+        for taken in [taken for taken in self._since if taken <= version]:
+            del self._since[taken]
+
+    def reset(self):
+        """Forget all history, e.g. after a map is created or loaded."""
+        self.version = 0
+        self.saved_version = 0
+        self._delta = empty_delta()
+        self._locations_changed = False
+        self._since.clear()
+
+
+def _apply(layer_delta, added, removed):
+    """Fold cells added to / removed from a layer into one layer's (added, removed)."""
+    layer_added, layer_removed = layer_delta
+    for cell in added:
+        if cell in layer_removed:
+            layer_removed.discard(cell)
+        else:
+            layer_added.add(cell)
+    for cell in removed:
+        if cell in layer_added:
+            layer_added.discard(cell)
+        else:
+            layer_removed.add(cell)
@@ -0,0 +1,282 @@
+# layer_store.py
+"""Compact storage of wall/door layers as one bitmap blob per map and layer.
+
+A layer blob is the layer's bounding box plus a zlib-compressed bitmap of
+the cells inside it (one bit per cell, row-major, least significant bit
+first).  Wall maps are long runs of empty and filled cells, which deflate
+packs as tightly as a run-length encoding.  Encoding and decoding go
+through NumPy (``packbits``/``unpackbits``), and ``load_layer_into`` paints
+the bitmap straight into a ``GridLayer``, so no tuple is built per cell.
+
+Blobs replace the one-row-per-cell tables (``map_walls``/``map_doors``).
+A layer still stored as rows moves to a blob the first time it is loaded
+or saved, and its rows are deleted in the same transaction;
+``export_layer_rows`` writes them back for older readers.
+
+Saves stay proportional to the edit: ``apply_layer_delta`` appends the
+added/removed cells to ``map_layer_deltas``.  Loading replays the log over
+the blob, and ``compact_layer`` folds it back in after ``COMPACT_AFTER``
+deltas or when a save asks for it.
+"""
+import struct
+import zlib
+
+import numpy as np
+
+from grid_layer import GridLayer
+
+LAYER_TABLES = {'walls': 'map_walls', 'doors': 'map_doors'}
+COMPACT_AFTER = 32  # Logged deltas per layer before they are folded into the blob
+
+_MAGIC = b'SBLY'
+_VERSION = 1
+_HEADER = struct.Struct('<4sBiiII')  # magic, version, x0, y0, width, height
+_EMPTY = _HEADER.pack(_MAGIC, _VERSION, 0, 0, 0, 0)
+
+
+def encode_mask(x0, y0, mask):
+    """Pack a boolean array (indexed [y, x], origin (x0, y0)) into a layer blob.
+
+    The blob covers only the bounding box of the set cells.
+    """
+    rows = np.flatnonzero(mask.any(axis=1))
+    if not rows.size:
+        return _EMPTY
+    columns = np.flatnonzero(mask.any(axis=0))
+    top, bottom = int(rows[0]), int(rows[-1]) + 1
+    left, right = int(columns[0]), int(columns[-1]) + 1
+    box = np.ascontiguousarray(mask[top:bottom, left:right], dtype=bool)
+    bits = np.packbits(box.reshape(-1), bitorder='little')
+    header = _HEADER.pack(_MAGIC, _VERSION, x0 + left, y0 + top, right - left, bottom - top)
+    return header + zlib.compress(bits.tobytes())
+
+
+def encode_cells(cells):
+    """Pack a collection of (x, y) cells into a layer blob."""
+    coords = np.array(list(cells), dtype=np.int64).reshape(-1, 2)
+    if not coords.size:
+        return _EMPTY
+    x0, y0 = coords.min(axis=0)
+    width, height = coords.max(axis=0) - (x0, y0) + 1
+    mask = np.zeros((int(height), int(width)), dtype=bool)
+    mask[coords[:, 1] - y0, coords[:, 0] - x0] = True
+    return encode_mask(int(x0), int(y0), mask)
+
+
+def decode_bitmap(blob):
+    """Unpack a layer blob into ``(x0, y0, width, height, bits)``."""
+    magic, version, x0, y0, width, height = _HEADER.unpack_from(blob)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError("Not a map layer blob.")
+    if not width or not height:
+        return x0, y0, 0, 0, b''
+    return x0, y0, width, height, zlib.decompress(blob[_HEADER.size:])
+
+
+def decode_mask(blob):
+    """Unpack a layer blob into ``(x0, y0, mask)`` with mask a bool array [y, x]."""
+    x0, y0, width, height, bits = decode_bitmap(blob)
+    mask = np.unpackbits(np.frombuffer(bits, dtype=np.uint8), bitorder='little')
+    return x0, y0, mask[:width * height].reshape(height, width).astype(bool)
+
+
+def decode_coordinates(blob):
+    """Unpack a layer blob into x and y integer arrays of its cells."""
+    x0, y0, mask = decode_mask(blob)
+    ys, xs = np.nonzero(mask)
+    return xs + x0, ys + y0
+
+
+def decode_cells(blob):
+    """Unpack a layer blob into a set of (x, y) cells."""
+    xs, ys = decode_coordinates(blob)
+    return set(zip(xs.tolist(), ys.tolist()))
+
+
+def ensure_layer_table(db):
+    """Create the map_layers and map_layer_deltas tables if this database predates them.
+
+    The statements run once per ``Database``; later calls return at once.
+    """
+    if getattr(db, '_layer_tables_ready', False):
+        return
+    db.cursor.execute(
+        "CREATE TABLE IF NOT EXISTS map_layers ("
+        "map_id INTEGER NOT NULL, "
+        "layer TEXT NOT NULL, "
+        "cells BLOB NOT NULL, "
+        "PRIMARY KEY (map_id, layer))"
+    )
+    db.cursor.execute(
+        "CREATE TABLE IF NOT EXISTS map_layer_deltas ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "map_id INTEGER NOT NULL, "
+        "layer TEXT NOT NULL, "
+        "added BLOB NOT NULL, "
+        "removed BLOB NOT NULL)"
+    )
+    db.cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_map_layer_deltas ON map_layer_deltas (map_id, layer, id)"
+    )
+    db._layer_tables_ready = True
+
+
+def load_layer(db, map_id, layer):
+    """Return the stored cells of a layer as a set."""
+    grid = GridLayer()
+    load_layer_into(db, map_id, layer, grid.walls)
+    x0, y0, x1, y1 = grid.bounds()
+    return set(grid.walls.cells_in_rect(x0, y0, x1, y1))
+
+
+def load_layer_into(db, map_id, layer, view):
+    """Add the stored cells of a layer to a ``grid_layer.CellView``.
+
+    Blobs and their logged deltas are painted as whole bitmaps without
+    building any tuples.  A layer still stored as rows is moved to a blob
+    first, so only its first load pays for reading them.
+    """
+    ensure_layer_table(db)
+    blob = _read_blob(db, map_id, layer)
+    if blob is None:
+        rows = _read_rows(db, map_id, layer)
+        if rows:
+            with db.conn:
+                _replace_rows(db, map_id, layer, rows)
+        view.update(rows)
+        return
+    _paint_layer(db, map_id, layer, view, blob)
+
+
+def apply_layer_delta(db, map_id, layer, added, removed, compact=False):
+    """Write the cells added to and removed from a layer since the last save.
+
+    The delta goes into the layer's delta log, compacted into the blob when
+    ``compact`` is set or the log is long.  A layer still stored as rows is
+    moved to a blob with the delta applied.  Does not commit; call inside
+    the caller's transaction.
+    """
+    ensure_layer_table(db)
+    if not _has_blob(db, map_id, layer):
+        cells = _read_rows(db, map_id, layer)
+        cells.difference_update(removed)
+        cells.update(added)
+        _replace_rows(db, map_id, layer, cells)
+        return
+
+    if added or removed:
+        db.cursor.execute(
+            "INSERT INTO map_layer_deltas (map_id, layer, added, removed) VALUES (?, ?, ?, ?)",
+            (map_id, layer, encode_cells(added), encode_cells(removed))
+        )
+    db.cursor.execute(
+        "SELECT COUNT(*) FROM map_layer_deltas WHERE map_id = ? AND layer = ?", (map_id, layer)
+    )
+    logged = db.cursor.fetchone()[0]
+    if logged and (compact or logged >= COMPACT_AFTER):
+        compact_layer(db, map_id, layer)
+
+
+def compact_layer(db, map_id, layer):
+    """Fold a blob layer's delta log into its blob.  Does not commit."""
+    ensure_layer_table(db)
+    blob = _read_blob(db, map_id, layer)
+    if blob is None:
+        return
+    grid = GridLayer()
+    _paint_layer(db, map_id, layer, grid.walls, blob)
+    x0, y0, x1, y1 = grid.bounds()
+    save_layer(db, map_id, layer, mask=grid.walls.mask(x0, y0, x1, y1), origin=(x0, y0))
+
+
+def save_layer(db, map_id, layer, cells=None, mask=None, origin=(0, 0)):
+    """Store a layer as a blob from ``cells`` or a bool ``mask`` at ``origin``.
+
+    Clears the layer's delta log; per-cell rows are left alone.  Does not
+    commit; call inside the caller's transaction.
+    """
+    ensure_layer_table(db)
+    blob = encode_cells(cells) if mask is None else encode_mask(origin[0], origin[1], mask)
+    db.cursor.execute(
+        "INSERT OR REPLACE INTO map_layers (map_id, layer, cells) VALUES (?, ?, ?)",
+        (map_id, layer, blob)
+    )
+    db.cursor.execute(
+        "DELETE FROM map_layer_deltas WHERE map_id = ? AND layer = ?", (map_id, layer)
+    )
+
+
+def import_layer_rows(db, map_id):
+    """Move all of a map's per-cell rows into layer blobs now."""
+    ensure_layer_table(db)
+    with db.conn:
+        for layer in LAYER_TABLES:
+            if not _has_blob(db, map_id, layer):
+                _replace_rows(db, map_id, layer, _read_rows(db, map_id, layer))
+
+
+def export_layer_rows(db, map_id):
+    """Convert a map's layer blobs back into per-cell rows, for older readers."""
+    ensure_layer_table(db)
+    with db.conn:
+        for layer, table in LAYER_TABLES.items():
+            blob = _read_blob(db, map_id, layer)
+            if blob is None:
+                continue
+            grid = GridLayer()
+            _paint_layer(db, map_id, layer, grid.walls, blob)
+            x0, y0, x1, y1 = grid.bounds()
+            db.cursor.execute(f"DELETE FROM {table} WHERE map_id = ?", (map_id,))
+            db.cursor.executemany(
+                f"INSERT INTO {table} (map_id, grid_x, grid_y) VALUES (?, ?, ?)",
+                ((map_id, x, y) for x, y in grid.walls.cells_in_rect(x0, y0, x1, y1))
+            )
+            db.cursor.execute(
+                "DELETE FROM map_layers WHERE map_id = ? AND layer = ?", (map_id, layer)
+            )
+            db.cursor.execute(
+                "DELETE FROM map_layer_deltas WHERE map_id = ? AND layer = ?", (map_id, layer)
+            )
+
+
+def _replace_rows(db, map_id, layer, cells):
+    """Store ``cells`` as the layer's blob and drop its per-cell rows."""
+    save_layer(db, map_id, layer, cells)
+    db.cursor.execute(f"DELETE FROM {LAYER_TABLES[layer]} WHERE map_id = ?", (map_id,))
+
+
+def _paint_layer(db, map_id, layer, view, blob):
+    view.paint_bitmap(*decode_bitmap(blob))
+    for added, removed in _read_deltas(db, map_id, layer):
+        view.erase_bitmap(*decode_bitmap(removed))
+        view.paint_bitmap(*decode_bitmap(added))
+
+
+def _has_blob(db, map_id, layer):
+    db.cursor.execute(
+        "SELECT 1 FROM map_layers WHERE map_id = ? AND layer = ?", (map_id, layer)
+    )
+    return db.cursor.fetchone() is not None
+
+
+def _read_blob(db, map_id, layer):
+    db.cursor.execute(
+        "SELECT cells FROM map_layers WHERE map_id = ? AND layer = ?", (map_id, layer)
+    )
+    row = db.cursor.fetchone()
+    return row[0] if row else None
+
+
+def _read_deltas(db, map_id, layer):
+    db.cursor.execute(
+        "SELECT added, removed FROM map_layer_deltas WHERE map_id = ? AND layer = ? ORDER BY id",
+        (map_id, layer)
+    )
+    return db.cursor.fetchall()
+
+
+def _read_rows(db, map_id, layer):
+    db.cursor.execute(
+        f"SELECT grid_x, grid_y FROM {LAYER_TABLES[layer]} WHERE map_id = ?", (map_id,)
+    )
+    return set(db.cursor.fetchall())
@@ -5,6 +5,8 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, simpledialog
 import os
 import sys
+import math
+import time
 import uuid
 import shutil
 import json
@@ -15,6 +17,21 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import config
 from database import Database
+from map_store import SaveWorker
+from layer_store import load_layer_into
+from journal import ChangeJournal
+from history import EditHistory
+from grid_geometry import get_line, get_rect_cells
+from grid_layer import GridLayer
+from overlay_cache import OverlayCache, tile_bounds, tile_cells
+from map_pyramid import ImagePyramid
+from image_loader import ImageLoader
+from render_scheduler import RenderScheduler
+from text_cache import TextCache, LocationSpriteCache
+from frame_profiler import FrameProfiler, TOGGLE_KEY, CAPTURE_KEY
+from app_logging import configure as configure_logging, get_logger
+
+log = get_logger('editor')
 
 class StandaloneMapEditor:
     def __init__(self):
@@ -25,6 +42,8 @@ class StandaloneMapEditor:
         pygame.display.set_caption("Gemini TTS - Map Editor")
         self.clock = pygame.time.Clock()
         self.running = True
+        self.scheduler = RenderScheduler()  # Only redraw what changed, idle when quiet
+        self.profiler = FrameProfiler()  # Per-phase timings, F3 to show, F4 to capture
         
         # UI Manager
         self.gui_manager = pygame_gui.UIManager((1200, 800))
@@ -32,12 +51,24 @@ class StandaloneMapEditor:
         # Database connection
         self.db = Database()
         
+        # Saves run on a background thread with their own connection
+        self.save_worker = SaveWorker(Database)
+        
         # Map editor state
         self.current_map = None
         self.map_image = None
-        self.map_surface = None
+        self.map_pyramid = None  # Downscaled levels and scaled tile cache for map_image
+        self.tile_cache_budget = 64 * 1024 * 1024  # Bytes of scaled map tiles to keep
         self.map_name = "Untitled Map"
         self.map_id = None
+        self.image_path = None  # File the current map_image is saved in, None if unsaved
+        self.image_version = 0  # Bumped whenever map_image is replaced
+        self.image_digest = None  # (image_version, sha256) once a save has hashed map_image
+        self.image_in_flight = False  # A queued save is encoding the current image
+        self.map_session = uuid.uuid4().hex  # Identifies this map until New/Load
+        self.image_loader = ImageLoader()  # Decodes map images off the main thread
+        self.image_load_saved = False  # The image being decoded is the map's saved file
+        self.save_after_load = False  # Save was requested while the image was decoding
         
         # Grid settings
         self.grid_size = 50
@@ -53,21 +84,35 @@ class StandaloneMapEditor:
         self.max_zoom = 3.0
         
         # Drawing tools
-        self.current_tool = "select"  # select, wall, door, erase, location
-        self.walls = set()
-        self.doors = set()
+        self.current_tool = "select"  # select, wall, door, erase, location, line, rect
+        self.shape_mode = "wall"  # What the line/rect tools paint: wall, door or erase
+        self.grid_layer = GridLayer()  # Wall/door flags per cell in one array
+        self.walls = self.grid_layer.walls  # Set-like views of the grid layer
+        self.doors = self.grid_layer.doors
         self.locations = []
+        self.overlay_cache = OverlayCache()  # Pre-rendered wall/door/grid tiles
+        self.text_cache = TextCache()  # Fonts loaded once, rendered text kept
+        self.location_sprites = LocationSpriteCache(self.text_cache)  # Marker + label per name
+        
+        # Change tracking, undo history and autosave
+        self.journal = ChangeJournal()
+        self.history = EditHistory()
+        self.autosave_interval = 60.0  # Seconds between autosaves of a saved map
+        self.last_autosave = time.monotonic()
         
         # UI state
         self.is_panning = False
         self.last_mouse_pos = None
         self.drawing = False
+        self.last_draw_cell = None  # Previous grid cell of the current stroke
+        self.shape_anchor = None  # Grid cell where a line/rect drag started
         
         # Define UI areas
         self.toolbar_height = 60
         self.sidebar_width = 250
         self.map_area = pygame.Rect(0, self.toolbar_height, 1200 - self.sidebar_width, 800 - self.toolbar_height)
         self.sidebar_area = pygame.Rect(1200 - self.sidebar_width, self.toolbar_height, self.sidebar_width, 800 - self.toolbar_height)
+        self.toolbar_area = pygame.Rect(0, 0, 1200, self.toolbar_height)
         
         self.create_ui()
         
@@ -151,6 +196,22 @@ class StandaloneMapEditor:
             manager=self.gui_manager,
             object_id='#erase_tool_button'
         )
+        x_pos += button_width + 10
+        
+        self.line_tool_button = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect(x_pos, button_y, button_width, button_height),
+            text='Line',
+            manager=self.gui_manager,
+            object_id='#line_tool_button'
+        )
+        x_pos += button_width + 10
+        
+        self.rect_tool_button = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect(x_pos, button_y, button_width, button_height),
+            text='Rect',
+            manager=self.gui_manager,
+            object_id='#rect_tool_button'
+        )
         
         # Sidebar elements
         sidebar_y = 10
@@ -234,10 +295,27 @@ class StandaloneMapEditor:
             manager=self.gui_manager,
             object_id='#layer_list'
         )
+        sidebar_y += 160
+        
+        # Save status (non-modal, updated by the save worker)
+        self.save_status_label = pygame_gui.elements.UILabel(
+            relative_rect=pygame.Rect(1200 - self.sidebar_width + 10, self.toolbar_height + sidebar_y, 230, 20),
+            text='',
+            manager=self.gui_manager,
+            object_id='#save_status_label'
+        )
         
     def handle_events(self):
         """Handle all pygame events."""
         for event in pygame.event.get():
+            # Plain mouse movement over the map changes nothing unless we're
+            # panning or drawing; pygame_gui hover is tracked in run()
+            if event.type == pygame.MOUSEMOTION:
+                if self.is_panning or self.drawing or self.shape_anchor:
+                    self.scheduler.mark_dirty(self.map_area)
+            else:
+                self.scheduler.mark_dirty()
+                
             if event.type == pygame.QUIT:
                 self.running = False
                 
@@ -250,6 +328,18 @@ class StandaloneMapEditor:
                     self.load_map_dialog()
                 elif event.key == pygame.K_n and pygame.key.get_pressed()[pygame.K_LCTRL]:
                     self.new_map()
+                elif event.key == pygame.K_z and pygame.key.get_pressed()[pygame.K_LCTRL]:
+                    if pygame.key.get_pressed()[pygame.K_LSHIFT]:
+                        self.redo()
+                    else:
+                        self.undo()
+                elif event.key == pygame.K_y and pygame.key.get_pressed()[pygame.K_LCTRL]:
+                    self.redo()
+                elif event.key == TOGGLE_KEY:
+                    self.profiler.toggle()
+                elif event.key == CAPTURE_KEY:
+                    path = self.profiler.start_capture()
+                    log.info("Profiling the next frames to %s", path)
                     
             # Handle mouse events for map interaction
             if event.type == pygame.MOUSEBUTTONDOWN:
@@ -259,8 +349,12 @@ class StandaloneMapEditor:
             elif event.type == pygame.MOUSEBUTTONUP:
                 # Stop panning on any mouse button release
                 if event.button in [1, 2, 3]:  # Left, middle, or right mouse button
+                    if event.button == 1 and self.shape_anchor:
+                        self.commit_shape(event.pos)
                     self.is_panning = False
                     self.drawing = False
+                    self.last_draw_cell = None
+                    self.history.end_stroke()
                     
             elif event.type == pygame.MOUSEMOTION:
                 if self.is_panning and self.map_area.collidepoint(event.pos):
@@ -276,13 +370,14 @@ class StandaloneMapEditor:
                         map_x, map_y = self.screen_to_map_coords(event.pos)
                         grid_x, grid_y = self.map_to_grid_coords(map_x, map_y)
                         
-                        if self.current_tool == "wall":
-                            self.walls.add((grid_x, grid_y))
-                        elif self.current_tool == "door":
-                            self.doors.add((grid_x, grid_y))
-                        elif self.current_tool == "erase":
-                            self.walls.discard((grid_x, grid_y))
-                            self.doors.discard((grid_x, grid_y))
+                        # Fill in every cell between this event and the last one
+                        # so fast strokes don't leave gaps
+                        if self.last_draw_cell:
+                            cells = get_line(self.last_draw_cell[0], self.last_draw_cell[1], grid_x, grid_y)
+                        else:
+                            cells = [(grid_x, grid_y)]
+                        self.paint_cells(self.current_tool, cells)
+                        self.last_draw_cell = (grid_x, grid_y)
                     
             elif event.type == pygame.MOUSEWHEEL:
                 if self.map_area.collidepoint(pygame.mouse.get_pos()):
@@ -307,16 +402,19 @@ class StandaloneMapEditor:
                 self.handle_ui_button(event)
                 
             elif event.type == pygame_gui.UI_HORIZONTAL_SLIDER_MOVED:
-                if event.ui_element == self.grid_size_slider:
+                if event.ui_element == self.grid_size_slider and int(event.value) != self.grid_size:
                     self.grid_size = int(event.value)
+                    self.overlay_cache.clear()
+                    self.journal.touch()
                     # Update label
                     for element in self.gui_manager.get_root_container().elements:
                         if hasattr(element, 'object_id') and element.object_id == '#grid_size_label':
                             element.set_text(f'Grid Size: {self.grid_size}')
                             
             elif event.type == pygame_gui.UI_TEXT_ENTRY_CHANGED:
-                if event.ui_element == self.map_name_input:
+                if event.ui_element == self.map_name_input and event.text != self.map_name:
                     self.map_name = event.text
+                    self.journal.touch()
             
             self.gui_manager.process_events(event)
             
@@ -346,8 +444,15 @@ class StandaloneMapEditor:
         elif event.ui_object_id == '#erase_tool_button':
             self.current_tool = "erase"
             self.update_tool_buttons()
+        elif event.ui_object_id == '#line_tool_button':
+            self.current_tool = "line"
+            self.update_tool_buttons()
+        elif event.ui_object_id == '#rect_tool_button':
+            self.current_tool = "rect"
+            self.update_tool_buttons()
         elif event.ui_object_id == '#grid_toggle_button':
             self.grid_visible = not self.grid_visible
+            self.journal.touch()
             event.ui_element.set_text('Grid: ON' if self.grid_visible else 'Grid: OFF')
             
     def update_tool_buttons(self):
@@ -357,9 +462,15 @@ class StandaloneMapEditor:
             'wall': self.wall_tool_button,
             'door': self.door_tool_button,
             'location': self.location_tool_button,
-            'erase': self.erase_tool_button
+            'erase': self.erase_tool_button,
+            'line': self.line_tool_button,
+            'rect': self.rect_tool_button
         }
         
+        # Line and rect paint with whichever of wall/door/erase was picked last
+        if self.current_tool in ["wall", "door", "erase"]:
+            self.shape_mode = self.current_tool
+        
         for tool_name, button in tools.items():
             if tool_name == self.current_tool:
                 button.background_colour = pygame.Color(100, 150, 200)
@@ -389,21 +500,29 @@ class StandaloneMapEditor:
             map_x, map_y = self.screen_to_map_coords(event.pos)
             grid_x, grid_y = self.map_to_grid_coords(map_x, map_y)
             
+            if self.current_tool in ["wall", "door", "erase", "line", "rect"]:
+                # Everything until the button is released is one undo step
+                self.history.begin_stroke()
+                self.last_draw_cell = (grid_x, grid_y)
+                
+            if self.current_tool in ["line", "rect"]:
+                self.shape_anchor = (grid_x, grid_y)
+                
             if self.current_tool == "wall":
                 self.drawing = True
                 wall_pos = (grid_x, grid_y)
                 if wall_pos in self.walls:
-                    self.walls.remove(wall_pos)
+                    self.remove_cells('walls', [wall_pos])
                 else:
-                    self.walls.add(wall_pos)
+                    self.add_cells('walls', [wall_pos])
                     
             elif self.current_tool == "door":
                 self.drawing = True
                 door_pos = (grid_x, grid_y)
                 if door_pos in self.doors:
-                    self.doors.remove(door_pos)
+                    self.remove_cells('doors', [door_pos])
                 else:
-                    self.doors.add(door_pos)
+                    self.add_cells('doors', [door_pos])
                     
             elif self.current_tool == "location":
                 self.create_location(map_x, map_y)
@@ -411,9 +530,72 @@ class StandaloneMapEditor:
             elif self.current_tool == "erase":
                 self.drawing = True
                 # Remove both walls and doors at this position
-                self.walls.discard((grid_x, grid_y))
-                self.doors.discard((grid_x, grid_y))
+                self.paint_cells("erase", [(grid_x, grid_y)])
                 
+    def shape_cells(self, screen_pos):
+        """Cells covered by the line/rect tool from its anchor to a screen position."""
+        map_x, map_y = self.screen_to_map_coords(screen_pos)
+        grid_x, grid_y = self.map_to_grid_coords(map_x, map_y)
+        anchor_x, anchor_y = self.shape_anchor
+        if self.current_tool == "line":
+            return get_line(anchor_x, anchor_y, grid_x, grid_y)
+        return get_rect_cells(anchor_x, anchor_y, grid_x, grid_y)
+        
+    def commit_shape(self, screen_pos):
+        """Apply the line/rect being dragged as a single batch."""
+        self.paint_cells(self.shape_mode, self.shape_cells(screen_pos))
+        self.shape_anchor = None
+        
+    def paint_cells(self, mode, cells):
+        """Apply a wall, door or erase brush to a batch of cells."""
+        if mode == "wall":
+            self.add_cells('walls', cells)
+        elif mode == "door":
+            self.add_cells('doors', cells)
+        elif mode == "erase":
+            self.remove_cells('walls', cells)
+            self.remove_cells('doors', cells)
+                
+    def add_cells(self, layer, cells):
+        """Add grid cells to the 'walls' or 'doors' layer; return the cells that were new."""
+        target = getattr(self, layer)
+        added = target.missing(cells)
+        if added:
+            target.update(added)
+            self.overlay_cache.invalidate_cells(added)
+            self.journal.record(layer, added=added)
+            self.history.record(layer, added=added)
+        return added
+        
+    def remove_cells(self, layer, cells):
+        """Remove grid cells from the 'walls' or 'doors' layer; return the cells that were there."""
+        target = getattr(self, layer)
+        removed = target.intersection(cells)
+        if removed:
+            target.difference_update(removed)
+            self.overlay_cache.invalidate_cells(removed)
+            self.journal.record(layer, removed=removed)
+            self.history.record(layer, removed=removed)
+        return removed
+        
+    def apply_delta(self, delta):
+        """Apply a {layer: (added, removed)} delta to the walls and doors."""
+        for layer, (added, removed) in delta.items():
+            self.remove_cells(layer, removed)
+            self.add_cells(layer, added)
+            
+    def undo(self):
+        """Revert the last wall/door/erase stroke."""
+        delta = self.history.undo()
+        if delta:
+            self.apply_delta(delta)
+            
+    def redo(self):
+        """Reapply the last undone stroke."""
+        delta = self.history.redo()
+        if delta:
+            self.apply_delta(delta)
+        
     def screen_to_map_coords(self, screen_pos):
         """Convert screen coordinates to map coordinates."""
         map_x = (screen_pos[0] - self.map_area.left) / self.zoom_level + self.camera_x
@@ -447,6 +629,7 @@ class StandaloneMapEditor:
             }
             
             self.locations.append(location)
+            self.journal.record_locations()
             
         root.destroy()
         
@@ -457,13 +640,21 @@ class StandaloneMapEditor:
                 return
                 
         self.current_map = None
+        self.image_loader.cancel()
+        self.save_after_load = False
         self.map_image = None
-        self.map_surface = None
+        self.map_pyramid = None
         self.map_name = "Untitled Map"
         self.map_id = None
-        self.walls.clear()
-        self.doors.clear()
+        self.image_path = None
+        self.image_version += 1
+        self.image_in_flight = False
+        self.map_session = uuid.uuid4().hex
+        self.grid_layer.clear()
         self.locations.clear()
+        self.overlay_cache.clear()
+        self.journal.reset()
+        self.history.clear()
         self.camera_x = 0
         self.camera_y = 0
         self.zoom_level = 1.0
@@ -487,21 +678,87 @@ class StandaloneMapEditor:
         root.destroy()
         
         if file_path:
-            try:
-                self.map_image = pygame.image.load(file_path).convert_alpha()
-                self.map_surface = self.map_image.copy()
-                
-                # Center the camera on the image
-                self.camera_x = 0
-                self.camera_y = 0
-                
-                print(f"Loaded image: {file_path}")
-                
-            except pygame.error as e:
-                messagebox.showerror("Error", f"Could not load image: {e}")
-                
+            # Decoded in the background; set_map_image installs it when done
+            self.start_image_load(file_path, saved=False)
+            
+            # Center the camera on the image
+            self.camera_x = 0
+            self.camera_y = 0
+            
+    def start_image_load(self, file_path, saved):
+        """Start decoding a map image; ``saved`` means it is already the map's stored file."""
+        self.image_loader.load(file_path)
+        self.image_load_saved = saved
+        self.save_after_load = False  # A queued save was for the previous image
+        self.save_status_label.set_text("Loading image...")
+        self.scheduler.mark_dirty()
+        
+    def process_image_load(self):
+        """Install a finished background image decode, or update its progress."""
+        if not self.image_loader.loading:
+            return
+            
+        result = self.image_loader.poll()
+        if result is None:
+            # Tick the progress text a few times a second
+            elapsed = self.image_loader.elapsed
+            size_mb = self.image_loader.file_size / (1024 * 1024)
+            text = f"Loading image ({size_mb:.1f} MB)... {elapsed:.1f}s"
+            if self.save_after_load:
+                text += " (save queued)"
+            if text != self.save_status_label.text:
+                self.save_status_label.set_text(text)
+                self.scheduler.mark_dirty(self.sidebar_area)
+                self.scheduler.mark_dirty(self.map_area)
+            return
+            
+        file_path, surface, error = result
+        self.scheduler.mark_dirty()
+        if error is not None:
+            self.save_after_load = False
+            self.save_status_label.set_text("Image failed to load")
+            messagebox.showerror("Error", f"Could not load image: {error}")
+            return
+            
+        # Converting needs the display, so it happens here rather than on the loader thread
+        self.set_map_image(surface.convert_alpha(), file_path if self.image_load_saved else None)
+        self.save_status_label.set_text("")
+        log.info("Loaded image: %s", file_path)
+        
+        if self.save_after_load:
+            self.save_after_load = False
+            self.save_map()
+        
+    def set_map_image(self, image, image_path):
+        """Replace the map image; ``image_path`` is its saved file, None if unsaved."""
+        self.map_image = image
+        self.map_pyramid = ImagePyramid(self.map_image, self.tile_cache_budget)
+        self.image_path = image_path
+        self.image_version += 1
+        self.image_in_flight = False
+        if image_path is None:
+            self.journal.touch()
+            
+    def cached_image_digest(self):
+        """The saved hash of the current map_image, or None until a save computes it."""
+        if self.image_digest and self.image_digest[0] == self.image_version:
+            return self.image_digest[1]
+        return None
+            
+    def map_open(self):
+        """True once there is a map to edit, even if its image is still loading."""
+        return self.map_image is not None or self.image_loader.loading
+        
+
     def save_map(self):
-        """Save the current map to the database."""
+        """Save the current map to the database in the background."""
+        if self.image_loader.loading:
+            # Saved by process_image_load once the image is decoded
+            self.save_after_load = True
+            self.save_status_label.set_text("Save queued until the image loads...")
+            self.scheduler.mark_dirty(self.sidebar_area)
+            return
+            
         if not self.map_image:
             messagebox.showwarning("No Image", "Please load an image first.")
             return
@@ -510,23 +767,52 @@ class StandaloneMapEditor:
             messagebox.showwarning("No Name", "Please enter a map name.")
             return
             
-        try:
-            # Save image to data directory
-            os.makedirs("data/images", exist_ok=True)
-            
-            if self.map_id:
-                image_filename = f"map_{self.map_id}.png"
-            else:
-                image_filename = f"map_{uuid.uuid4().hex[:8]}.png"
-                
-            image_path = os.path.join("data/images", image_filename)
-            pygame.image.save(self.map_image, image_path)
+        busy = not self.save_worker.idle
+        # Explicit saves also fold any logged layer deltas into the stored blobs
+        self.submit_save(compact=True)
+        self.save_status_label.set_text("Save queued..." if busy else "Saving...")
+        
+    def autosave(self):
+        """Save changes to an already-saved map in the background."""
+        self.last_autosave = time.monotonic()
+        if not self.journal.dirty or not self.map_image or self.map_id is None:
+            return
+        if not self.map_name.strip() or not self.save_worker.idle:
+            return
             
-            # Prepare map data
-            map_data = {
+        self.submit_save()
+        self.save_status_label.set_text("Autosaving...")
+        self.scheduler.mark_dirty(self.sidebar_area)
+        
+    def submit_save(self, compact=False):
+        """Hand a snapshot of the current map to the save worker."""
+        snapshot = self.snapshot_map()
+        snapshot['compact'] = compact
+        self.save_worker.submit(snapshot)
+        if snapshot['image'] is not None:
+            self.image_in_flight = True
+        
+    def snapshot_map(self):
+        """Copy the state a save needs so editing can continue while it runs.
+        
+        Walls and doors are taken as the journal's delta since the last
+        snapshot rather than copies of the full sets.
+        """
+        # Only encode the image if it isn't already on disk or being saved
+        image_saved = self.image_path and os.path.exists(self.image_path)
+        needs_image = not image_saved and not self.image_in_flight
+        version, delta, locations_changed = self.journal.take()
+        
+        return {
+            'session': self.map_session,
+            'image_version': self.image_version,
+            'version': version,
+            'image': self.map_image.copy() if needs_image else None,
+            'image_digest': self.cached_image_digest() if needs_image else None,
+            'map_data': {
                 'id': self.map_id,
                 'name': self.map_name.strip(),
-                'image_path': image_path,
+                'image_path': self.image_path if image_saved else None,
                 'grid_size': self.grid_size,
                 'grid_enabled': self.grid_visible,
                 'width': self.map_image.get_width(),
@@ -535,47 +821,41 @@ class StandaloneMapEditor:
                 'map_scale': 1.0,
                 'grid_style': 'solid',
                 'grid_opacity': self.grid_opacity / 255.0
-            }
-            
-            # Save to database
-            saved_id = self.db.save_or_update_map(map_data)
+            },
+            'delta': delta,
+            'locations': [dict(location) for location in self.locations] if locations_changed else None
+        }
+        
+    def process_save_messages(self):
+        """Apply progress and results posted by the save worker."""
+        messages = self.save_worker.poll()
+        if messages:
+            self.scheduler.mark_dirty(self.sidebar_area)
             
-            if saved_id:
-                self.map_id = saved_id
-                
-                # Save walls
-                self.db.cursor.execute("DELETE FROM map_walls WHERE map_id = ?", (self.map_id,))
-                for wall_x, wall_y in self.walls:
-                    self.db.cursor.execute(
-                        "INSERT INTO map_walls (map_id, grid_x, grid_y) VALUES (?, ?, ?)",
-                        (self.map_id, wall_x, wall_y)
-                    )
-                
-                # Save doors
-                self.db.cursor.execute("DELETE FROM map_doors WHERE map_id = ?", (self.map_id,))
-                for door_x, door_y in self.doors:
-                    self.db.cursor.execute(
-                        "INSERT INTO map_doors (map_id, grid_x, grid_y) VALUES (?, ?, ?)",
-                        (self.map_id, door_x, door_y)
-                    )
-                
-                # Save locations
-                self.db.cursor.execute("DELETE FROM map_locations WHERE map_id = ?", (self.map_id,))
-                for location in self.locations:
-                    self.db.cursor.execute(
-                        "INSERT INTO map_locations (map_id, x, y, name) VALUES (?, ?, ?, ?)",
-                        (self.map_id, location['x'], location['y'], location['name'])
-                    )
-                
-                self.db.conn.commit()
-                
-                messagebox.showinfo("Success", f"Map '{self.map_name}' saved successfully!")
+        for kind, payload in messages:
+            if kind == 'progress':
+                self.save_status_label.set_text(payload)
+                continue
                 
+            # Results for a map or image we've since replaced only update the status
+            if payload['session'] == self.map_session:
+                if payload['ok']:
+                    self.map_id = payload['map_id']
+                    self.journal.mark_saved(payload['version'])
+                else:
+                    # Put the unsaved changes back so the next save retries them
+                    self.journal.restore(payload['version'], payload['delta'], payload['locations_changed'])
+                if payload['image_version'] == self.image_version:
+                    self.image_in_flight = False
+                    if payload['image_digest']:
+                        self.image_digest = (self.image_version, payload['image_digest'])
+                    if payload['ok']:
+                        self.image_path = payload['image_path']
+                    
+            if payload['ok']:
+                self.save_status_label.set_text(f"Saved '{payload['name']}'")
             else:
-                messagebox.showerror("Error", "Failed to save map to database.")
-                
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save map: {e}")
+                self.save_status_label.set_text(f"Save failed: {payload['error']}")
             
     def load_map_dialog(self):
         """Show dialog to load a map from the database."""
@@ -641,8 +921,14 @@ class StandaloneMapEditor:
                 messagebox.showerror("Error", f"Map image not found: {image_path}")
                 return
                 
-            self.map_image = pygame.image.load(image_path).convert_alpha()
-            self.map_surface = self.map_image.copy()
+            # The grid, walls and locations are usable while the image decodes
+            self.map_image = None
+            self.map_pyramid = None
+            self.image_path = None
+            self.image_version += 1
+            self.image_in_flight = False
+            self.map_session = uuid.uuid4().hex
+            self.start_image_load(image_path, saved=True)
             
             # Set map properties
             self.map_id = map_data['id']
@@ -655,17 +941,10 @@ class StandaloneMapEditor:
             self.grid_size_slider.set_current_value(self.grid_size)
             self.grid_toggle.set_text('Grid: ON' if self.grid_visible else 'Grid: OFF')
             
-            # Load walls
-            self.walls.clear()
-            walls = self.db.get_map_walls(map_id)
-            for wall_x, wall_y in walls:
-                self.walls.add((wall_x, wall_y))
-                
-            # Load doors
-            self.doors.clear()
-            doors = self.db.get_map_doors(map_id)
-            for door_x, door_y in doors:
-                self.doors.add((door_x, door_y))
+            # Load walls and doors
+            self.grid_layer.clear()
+            load_layer_into(self.db, map_id, 'walls', self.walls)
+            load_layer_into(self.db, map_id, 'doors', self.doors)
                 
             # Load locations
             self.locations.clear()
@@ -682,109 +961,108 @@ class StandaloneMapEditor:
                     'sub_map_id': None
                 })
             
+            # Loaded state is the saved state
+            self.overlay_cache.clear()
+            self.journal.reset()
+            self.history.clear()
+            
             # Reset camera
             self.camera_x = 0
             self.camera_y = 0
             self.zoom_level = 1.0
             
-            print(f"Loaded map: {self.map_name}")
+            log.info("Loaded map: %s", self.map_name)
             
         except Exception as e:
+            log.exception("Failed to load map")
             messagebox.showerror("Error", f"Failed to load map: {e}")
             
     def has_unsaved_changes(self):
         """Check if there are unsaved changes."""
-        # This is a simplified check - in a real application you'd track changes more precisely
-        return self.map_image is not None
+        return self.journal.dirty
         
     def draw(self):
-        """Draw the map editor interface."""
-        # Clear screen
-        self.screen.fill((40, 40, 40))
-        
-        # Draw map area background
-        pygame.draw.rect(self.screen, (50, 50, 50), self.map_area)
-        pygame.draw.rect(self.screen, (100, 100, 100), self.map_area, 2)
+        """Draw the parts of the map editor interface that changed."""
+        # The map area is the expensive part; skip it when only the UI changed
+        map_dirty = self.scheduler.is_dirty(self.map_area)
         
-        # Draw map if loaded
-        if self.map_image:
-            self.draw_map()
+        if map_dirty:
+            # Draw map area background
+            pygame.draw.rect(self.screen, (50, 50, 50), self.map_area)
+            pygame.draw.rect(self.screen, (100, 100, 100), self.map_area, 2)
+            
+            # Draw map if loaded (or still loading its image)
+            if self.map_open():
+                self.draw_map()
             
         # Draw sidebar background
         pygame.draw.rect(self.screen, (60, 60, 60), self.sidebar_area)
         pygame.draw.rect(self.screen, (100, 100, 100), self.sidebar_area, 2)
         
         # Draw toolbar background
-        toolbar_rect = pygame.Rect(0, 0, 1200, self.toolbar_height)
-        pygame.draw.rect(self.screen, (70, 70, 70), toolbar_rect)
-        pygame.draw.rect(self.screen, (100, 100, 100), toolbar_rect, 2)
+        pygame.draw.rect(self.screen, (70, 70, 70), self.toolbar_area)
+        pygame.draw.rect(self.screen, (100, 100, 100), self.toolbar_area, 2)
         
         # Draw UI elements
-        self.gui_manager.draw_ui(self.screen)
+        with self.profiler.scope('ui draw'):
+            self.gui_manager.draw_ui(self.screen)
         
-        # Draw current tool indicator
-        font = pygame.font.Font(None, 24)
-        tool_text = font.render(f"Tool: {self.current_tool.capitalize()}", True, (255, 255, 255))
-        self.screen.blit(tool_text, (10, 770))
+        # Draw current tool indicator (it sits over the map area)
+        if map_dirty:
+            tool_name = self.current_tool.capitalize()
+            if self.current_tool in ["line", "rect"]:
+                tool_name += f" ({self.shape_mode})"
+            tool_text = self.text_cache.render(f"Tool: {tool_name}", 24, (255, 255, 255))
+            self.screen.blit(tool_text, (10, 770))
+            
+            self.profiler.draw(self.screen, (self.map_area.left + 8, self.map_area.top + 8))
         
-        pygame.display.flip()
+        with self.profiler.scope('flip'):
+            self.scheduler.present()
         
     def draw_map(self):
         """Draw the map with all its elements."""
-        if not self.map_image:
-            return
-            
-        # Calculate visible area
-        visible_rect = pygame.Rect(
-            self.camera_x,
-            self.camera_y,
-            self.map_area.width / self.zoom_level,
-            self.map_area.height / self.zoom_level
-        )
-        
-        # Clip to image bounds
-        image_rect = self.map_image.get_rect()
-        visible_rect = visible_rect.clip(image_rect)
-        
-        if visible_rect.width <= 0 or visible_rect.height <= 0:
+        if not self.map_open():
             return
             
-        # Get the portion of the image to draw
-        map_portion = self.map_image.subsurface(visible_rect)
-        
-        # Scale the portion
-        scaled_size = (
-            int(visible_rect.width * self.zoom_level),
-            int(visible_rect.height * self.zoom_level)
-        )
+        if self.map_pyramid:
+            # Draw the visible part of the image from cached, pre-scaled tiles
+            previous_clip = self.screen.get_clip()
+            self.screen.set_clip(self.map_area)
+            with self.profiler.scope('map draw'):
+                in_view = self.map_pyramid.draw(
+                    self.screen,
+                    self.map_area,
+                    self.camera_x,
+                    self.camera_y,
+                    self.zoom_level
+                )
+            self.screen.set_clip(previous_clip)
+        else:
+            # Image still decoding: overlays go on the plain background
+            in_view = True
+            # The timer changes every frame, so only the font is cached
+            font = self.text_cache.font(24)
+            text = font.render(f"Loading image... {self.image_loader.elapsed:.1f}s", True, (200, 200, 200))
+            self.screen.blit(text, text.get_rect(center=self.map_area.center))
         
-        if scaled_size[0] > 0 and scaled_size[1] > 0:
-            scaled_portion = pygame.transform.scale(map_portion, scaled_size)
-            
-            # Calculate position to draw
-            draw_x = self.map_area.left
-            draw_y = self.map_area.top
-            
-            # Adjust for partial visibility
-            if self.camera_x < 0:
-                draw_x -= self.camera_x * self.zoom_level
-            if self.camera_y < 0:
-                draw_y -= self.camera_y * self.zoom_level
+        if in_view:
+            with self.profiler.scope('overlays'):
+                # Draw grid
+                if self.grid_visible:
+                    self.draw_grid()
+                    
+                # Draw walls and doors
+                self.draw_walls_and_doors()
                 
-            self.screen.blit(scaled_portion, (draw_x, draw_y))
-            
-            # Draw grid
-            if self.grid_visible:
-                self.draw_grid()
+                # Draw locations
+                self.draw_locations()
                 
-            # Draw walls and doors
-            self.draw_walls_and_doors()
-            
-            # Draw locations
-            self.draw_locations()
+                # Draw line/rect preview while dragging
+                self.draw_shape_preview()
             
     def draw_grid(self):
-        """Draw the grid overlay."""
+        """Draw the grid overlay from a cached tile of grid lines."""
         if not self.grid_visible or self.grid_size <= 0:
             return
             
@@ -793,74 +1071,89 @@ class StandaloneMapEditor:
         if grid_size_scaled < 2:  # Don't draw if too small
             return
             
-        # Calculate grid starting positions
-        start_x = self.map_area.left - (self.camera_x * self.zoom_level) % grid_size_scaled
-        start_y = self.map_area.top - (self.camera_y * self.zoom_level) % grid_size_scaled
-        
-        # Draw vertical lines
-        x = start_x
-        while x < self.map_area.right:
-            if x >= self.map_area.left:
-                pygame.draw.line(
-                    self.screen, 
-                    self.grid_color, 
-                    (x, self.map_area.top), 
-                    (x, self.map_area.bottom), 
-                    1
-                )
-            x += grid_size_scaled
-            
-        # Draw horizontal lines
-        y = start_y
-        while y < self.map_area.bottom:
-            if y >= self.map_area.top:
-                pygame.draw.line(
-                    self.screen, 
-                    self.grid_color, 
-                    (self.map_area.left, y), 
-                    (self.map_area.right, y), 
-                    1
-                )
-            y += grid_size_scaled
+        previous_clip = self.screen.get_clip()
+        self.screen.set_clip(self.map_area)
+        for tile_x, tile_y, screen_pos in self.overlay_tiles(grid_size_scaled):
+            grid_tile = self.overlay_cache.get_grid_tile(grid_size_scaled, tile_x, tile_y, self.grid_color)
+            self.screen.blit(grid_tile, screen_pos)
+        self.screen.set_clip(previous_clip)
             
+    def visible_grid_rect(self):
+        """Inclusive (x0, y0, x1, y1) range of grid cells inside the map area."""
+        x0 = int(self.camera_x // self.grid_size)
+        y0 = int(self.camera_y // self.grid_size)
+        x1 = int((self.camera_x + self.map_area.width / self.zoom_level) // self.grid_size)
+        y1 = int((self.camera_y + self.map_area.height / self.zoom_level) // self.grid_size)
+        return x0, y0, x1, y1
+        
+    def overlay_tiles(self, grid_size_scaled):
+        """Yield (tile_x, tile_y, screen_pos) for overlay tiles covering the map area.
+        
+        Positions are rounded from the map origin the way the tiles' own
+        edges are (see overlay_cache), so neighbouring tiles meet exactly.
+        """
+        size = tile_cells(grid_size_scaled)
+        x0, y0, x1, y1 = self.visible_grid_rect()
+        origin_x = self.map_area.left - round(self.camera_x * self.zoom_level)
+        origin_y = self.map_area.top - round(self.camera_y * self.zoom_level)
+        for tile_y in range(y0 // size, y1 // size + 1):
+            screen_y = origin_y + tile_bounds(tile_y, size, grid_size_scaled)[0]
+            for tile_x in range(x0 // size, x1 // size + 1):
+                screen_x = origin_x + tile_bounds(tile_x, size, grid_size_scaled)[0]
+                yield tile_x, tile_y, (screen_x, screen_y)
+        
     def draw_walls_and_doors(self):
-        """Draw walls and doors on the map."""
-        if not self.map_image:
+        """Draw walls and doors on the map from cached overlay tiles."""
+        if not self.map_open():
             return
             
         grid_size_scaled = self.grid_size * self.zoom_level
         
-        # Draw walls (red squares)
-        for wall_x, wall_y in self.walls:
-            screen_x = self.map_area.left + (wall_x * self.grid_size - self.camera_x) * self.zoom_level
-            screen_y = self.map_area.top + (wall_y * self.grid_size - self.camera_y) * self.zoom_level
-            
-            if (self.map_area.left <= screen_x < self.map_area.right and 
-                self.map_area.top <= screen_y < self.map_area.bottom):
-                
-                wall_rect = pygame.Rect(screen_x, screen_y, grid_size_scaled, grid_size_scaled)
-                pygame.draw.rect(self.screen, (255, 0, 0, 128), wall_rect)
-                pygame.draw.rect(self.screen, (200, 0, 0), wall_rect, 2)
+        previous_clip = self.screen.get_clip()
+        self.screen.set_clip(self.map_area)
+        for tile_x, tile_y, screen_pos in self.overlay_tiles(grid_size_scaled):
+            tile = self.overlay_cache.get_tile(grid_size_scaled, tile_x, tile_y, self.walls, self.doors)
+            if tile:
+                self.screen.blit(tile, screen_pos)
+        self.screen.set_clip(previous_clip)
                 
-        # Draw doors (blue squares)
-        for door_x, door_y in self.doors:
-            screen_x = self.map_area.left + (door_x * self.grid_size - self.camera_x) * self.zoom_level
-            screen_y = self.map_area.top + (door_y * self.grid_size - self.camera_y) * self.zoom_level
+    def draw_shape_preview(self):
+        """Outline the line or rectangle being dragged."""
+        if not self.shape_anchor:
+            return
+            
+        mouse_pos = pygame.mouse.get_pos()
+        map_x, map_y = self.screen_to_map_coords(mouse_pos)
+        grid_x, grid_y = self.map_to_grid_coords(map_x, map_y)
+        anchor_x, anchor_y = self.shape_anchor
+        grid_size_scaled = self.grid_size * self.zoom_level
+        color = (255, 255, 0)
+        
+        def cell_center(x, y):
+            return (
+                self.map_area.left + ((x + 0.5) * self.grid_size - self.camera_x) * self.zoom_level,
+                self.map_area.top + ((y + 0.5) * self.grid_size - self.camera_y) * self.zoom_level
+            )
+        
+        if self.current_tool == "line":
+            pygame.draw.line(self.screen, color, cell_center(anchor_x, anchor_y), cell_center(grid_x, grid_y), 2)
+        else:
+            left, top = min(anchor_x, grid_x), min(anchor_y, grid_y)
+            width = abs(grid_x - anchor_x) + 1
+            height = abs(grid_y - anchor_y) + 1
+            preview_rect = pygame.Rect(
+                self.map_area.left + (left * self.grid_size - self.camera_x) * self.zoom_level,
+                self.map_area.top + (top * self.grid_size - self.camera_y) * self.zoom_level,
+                width * grid_size_scaled,
+                height * grid_size_scaled
+            )
+            pygame.draw.rect(self.screen, color, preview_rect.clip(self.map_area), 2)
             
-            if (self.map_area.left <= screen_x < self.map_area.right and 
-                self.map_area.top <= screen_y < self.map_area.bottom):
-                
-                door_rect = pygame.Rect(screen_x, screen_y, grid_size_scaled, grid_size_scaled)
-                pygame.draw.rect(self.screen, (0, 0, 255, 128), door_rect)
-                pygame.draw.rect(self.screen, (0, 0, 200), door_rect, 2)
-                
     def draw_locations(self):
         """Draw location markers on the map."""
-        if not self.map_image:
+        if not self.map_open():
             return
             
-        font = pygame.font.Font(None, 20)
-        
         for location in self.locations:
             screen_x = self.map_area.left + (location['x'] - self.camera_x) * self.zoom_level
             screen_y = self.map_area.top + (location['y'] - self.camera_y) * self.zoom_level
@@ -868,39 +1161,52 @@ class StandaloneMapEditor:
             if (self.map_area.left <= screen_x < self.map_area.right and 
                 self.map_area.top <= screen_y < self.map_area.bottom):
                 
-                # Draw location marker (green circle)
-                pygame.draw.circle(self.screen, (0, 255, 0), (int(screen_x), int(screen_y)), 8)
-                pygame.draw.circle(self.screen, (0, 200, 0), (int(screen_x), int(screen_y)), 8, 2)
-                
-                # Draw location name
-                text_surface = font.render(location['name'], True, (255, 255, 255))
-                text_rect = text_surface.get_rect()
-                text_rect.center = (screen_x, screen_y - 15)
-                
-                # Draw text background
-                bg_rect = text_rect.inflate(4, 2)
-                pygame.draw.rect(self.screen, (0, 0, 0, 180), bg_rect)
-                
-                self.screen.blit(text_surface, text_rect)
+                # Marker and name label, composited once per name
+                sprite, (anchor_x, anchor_y) = self.location_sprites.get(location['name'])
+                self.screen.blit(sprite, (int(screen_x) - anchor_x, int(screen_y) - anchor_y))
                 
     def run(self):
         """Main editor loop."""
         while self.running:
-            time_delta = self.clock.tick(60) / 1000.0
+            time_delta = self.scheduler.tick(self.clock)
+            self.profiler.begin_frame()
             
-            self.handle_events()
-            self.gui_manager.update(time_delta)
-            self.draw()
+            with self.profiler.scope('events'):
+                self.handle_events()
+            with self.profiler.scope('background'):
+                self.process_save_messages()
+                self.process_image_load()
+                if time.monotonic() - self.last_autosave >= self.autosave_interval:
+                    self.autosave()
+            with self.profiler.scope('ui update'):
+                self.gui_manager.update(time_delta)
+            
+            # Hovered or focused widgets animate (highlights, text cursor)
+            if self.gui_manager.get_hovering_any_element() or self.gui_manager.get_focus_set():
+                self.scheduler.mark_dirty(self.toolbar_area)
+                self.scheduler.mark_dirty(self.sidebar_area)
+            if self.profiler.overlay_due():
+                self.scheduler.mark_dirty(self.profiler.overlay_rect)
+                
+            if self.scheduler.dirty:
+                self.draw()
+            else:
+                self.scheduler.skip()
+            self.profiler.end_frame()
             
         self.cleanup()
         
     def cleanup(self):
         """Clean up resources."""
+        if hasattr(self, 'save_worker'):
+            # Let any pending save finish before exiting
+            self.save_worker.stop()
         if hasattr(self, 'db'):
             self.db.close()
         pygame.quit()
 
 
 if __name__ == "__main__":
+    configure_logging()
     editor = StandaloneMapEditor()
     editor.run()
@@ -0,0 +1,124 @@
+# map_pyramid.py
+"""Zoom pyramid and scaled tile cache for drawing large map images.
+
+The image is kept at power-of-two downscales (level 0 is the original,
+level n is 1/2**n of it).  Each frame draws from the smallest level that is
+still at least as detailed as the screen, split into fixed-size tiles that
+are scaled once and cached.  Panning only scales the newly exposed tiles and
+an idle frame is nothing but blits.  The cache is LRU, bounded by a byte
+budget.
+"""
+import math
+from collections import OrderedDict
+
+import pygame
+
+TILE_SIZE = 256  # Tile edge in level pixels
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024  # Bytes of scaled tiles to keep
+
+
+class ImagePyramid:
+    def __init__(self, image, memory_budget=DEFAULT_MEMORY_BUDGET):
+        self.memory_budget = memory_budget
+        self._levels = [image]
+        self._tiles = OrderedDict()  # (scale bucket, level, tile_x, tile_y) -> surface
+        self._tile_bytes = 0
+
+        # Counters for profiling
+        self.tiles_scaled = 0
+        self.tiles_evicted = 0
+
+    @property
+    def cached_bytes(self):
+        return self._tile_bytes
+
+    def get_rect(self):
+        return self._levels[0].get_rect()
+
+    def level_for_zoom(self, zoom):
+        """Smallest level that still has at least one pixel per screen pixel."""
+        if zoom >= 1.0:
+            return 0
+        level = int(math.floor(math.log2(1.0 / zoom)))
+        # Don't go below a single tile
+        width, height = self._levels[0].get_size()
+        max_level = max(0, int(math.log2(max(width, height, 1) / TILE_SIZE)) + 1)
+        return min(level, max_level)
+
+    def level(self, index):
+        """Return the image at a level, building missing levels by halving."""
+        while len(self._levels) <= index:
+            previous = self._levels[-1]
+            size = (max(1, previous.get_width() // 2), max(1, previous.get_height() // 2))
+            self._levels.append(pygame.transform.smoothscale(previous, size))
+        return self._levels[index]
+
+    def clear_tiles(self):
+        """Drop all scaled tiles (levels are kept)."""
+        self._tiles.clear()
+        self._tile_bytes = 0
+
+    def draw(self, screen, area, camera_x, camera_y, zoom):
+        """Draw the part of the image under the camera into ``area``.
+
+        Returns False if no part of the image is in view.
+        """
+        level_index = self.level_for_zoom(zoom)
+        level_image = self.level(level_index)
+        factor = 1 << level_index
+        scale = zoom * factor  # Level pixels -> screen pixels
+
+        # Visible range in level pixels, clipped to the level image
+        left = max(camera_x / factor, 0)
+        top = max(camera_y / factor, 0)
+        right = min((camera_x + area.width / zoom) / factor, level_image.get_width())
+        bottom = min((camera_y + area.height / zoom) / factor, level_image.get_height())
+        if right <= left or bottom <= top:
+            return False
+
+        origin_x = area.left - round(camera_x * zoom)
+        origin_y = area.top - round(camera_y * zoom)
+        for tile_y in range(int(top) // TILE_SIZE, int(math.ceil(bottom)) // TILE_SIZE + 1):
+            for tile_x in range(int(left) // TILE_SIZE, int(math.ceil(right)) // TILE_SIZE + 1):
+                tile = self._get_tile(level_index, level_image, tile_x, tile_y, scale)
+                if tile is not None:
+                    screen.blit(tile, (
+                        origin_x + round(tile_x * TILE_SIZE * scale),
+                        origin_y + round(tile_y * TILE_SIZE * scale)
+                    ))
+        return True
+
+    def _get_tile(self, level_index, level_image, tile_x, tile_y, scale):
+        key = (round(scale, 4), level_index, tile_x, tile_y)
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            return tile
+
+        source = pygame.Rect(tile_x * TILE_SIZE, tile_y * TILE_SIZE, TILE_SIZE, TILE_SIZE)
+        source = source.clip(level_image.get_rect())
+        if source.width <= 0 or source.height <= 0:
+            return None
+
+        # Size tiles from rounded edges in zoomed map space so neighbours meet exactly
+        size = (
+            round(source.right * scale) - round(source.left * scale),
+            round(source.bottom * scale) - round(source.top * scale)
+        )
+        if size[0] <= 0 or size[1] <= 0:
+            return None
+
+        portion = level_image.subsurface(source)
+        if size == source.size:
+            tile = portion.copy()
+        else:
+            tile = pygame.transform.scale(portion, size)
+        self.tiles_scaled += 1
+
+        self._tiles[key] = tile
+        self._tile_bytes += tile.get_width() * tile.get_height() * tile.get_bytesize()
+        while self._tile_bytes > self.memory_budget and len(self._tiles) > 1:
+            _, evicted = self._tiles.popitem(last=False)
+            self._tile_bytes -= evicted.get_width() * evicted.get_height() * evicted.get_bytesize()
+            self.tiles_evicted += 1
+        return tile
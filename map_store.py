@@ -0,0 +1,212 @@
+# map_store.py
+"""Persistence of map layers (walls, doors, locations) for the map editor.
+
+Saves write only the cells added and removed since the last save (a
+``journal`` delta), as changed rows or as an entry in a blob layer's delta
+log (see ``layer_store``), inside a single transaction, so a failed save
+leaves the previously stored layers intact.
+
+``SaveWorker`` runs saves on a background thread with its own ``Database``
+connection.  The editor hands it a snapshot (see
+``StandaloneMapEditor.snapshot_map``) and polls for progress and results
+from its main loop.
+"""
+import queue
+import threading
+
+from image_store import change_image_reference, discard_unreferenced, image_digest, store_image
+from journal import delta_size, merge_deltas
+from layer_store import LAYER_TABLES, apply_layer_delta
+
+
+def write_map_changes(db, map_id, delta, locations=None, compact=False):
+    """Apply a delta of wall/door cells to a stored map.
+
+    ``locations`` replaces the stored locations when given; None leaves them.
+    ``compact`` folds blob layers' delta logs into their blobs.
+    """
+    with db.conn:
+        for layer in LAYER_TABLES:
+            added, removed = delta[layer]
+            apply_layer_delta(db, map_id, layer, added, removed, compact)
+
+        if locations is not None:
+            db.cursor.execute("DELETE FROM map_locations WHERE map_id = ?", (map_id,))
+            db.cursor.executemany(
+                "INSERT INTO map_locations (map_id, x, y, name) VALUES (?, ?, ?, ?)",
+                [(map_id, location['x'], location['y'], location['name']) for location in locations]
+            )
+
+
+def save_snapshot(db, snapshot, report=None):
+    """Save a map snapshot and return ``(map_id, image_path)``.
+
+    ``snapshot['image']`` is a surface to store, or None when
+    ``snapshot['map_data']['image_path']`` already holds the image.  Images
+    go through the content-addressed ``image_store``, so an image that is
+    already on disk is not encoded again.  If writing the map fails before
+    it refers to a newly stored image, the image is deleted again.
+    """
+    report = report or (lambda message: None)
+    map_data = dict(snapshot['map_data'])
+
+    if snapshot['image'] is not None:
+        # Kept on the snapshot so the editor can reuse it for this image
+        if not snapshot.get('image_digest'):
+            report("Hashing image...")
+            snapshot['image_digest'] = image_digest(snapshot['image'])
+        map_data['image_path'] = store_image(db, snapshot['image'], report, snapshot['image_digest'])
+
+    previous_path = None
+    if map_data['id']:
+        stored = db.get_map_by_id(map_data['id'])
+        previous_path = stored['image_path'] if stored else None
+
+    report("Writing map...")
+    try:
+        saved_id = db.save_or_update_map(map_data)
+        if not saved_id:
+            raise RuntimeError("Failed to save map to database.")
+    except Exception:
+        # No map row points at the image yet; don't leave its file behind
+        if snapshot['image'] is not None:
+            discard_unreferenced(db, map_data['image_path'])
+        raise
+    change_image_reference(db, previous_path, map_data['image_path'])
+
+    report(f"Writing {delta_size(snapshot['delta'])} cell changes...")
+    write_map_changes(db, saved_id, snapshot['delta'], snapshot['locations'],
+                      snapshot.get('compact', False))
+
+    return saved_id, map_data['image_path']
+
+
+class SaveWorker:
+    """Background thread that saves map snapshots.
+
+    Submitting while a save for the same map is still waiting merges the
+    two, so repeated saves coalesce into one save of the combined changes.
+    Messages for the main loop are read with ``poll``: ``('progress', text)``
+    and ``('done', result)`` where result is a dict with ``ok``, ``session``,
+    ``image_version``, ``version``, ``map_id``, ``image_path``, ``name``,
+    ``image_digest`` and ``error``.  Failed results also carry the ``delta``
+    and ``locations_changed`` they tried to write, so the editor can retry
+    them.
+    """
+
+    def __init__(self, db_factory):
+        self._db_factory = db_factory
+        self._condition = threading.Condition()
+        self._pending = []
+        self._stopping = False
+        self._messages = queue.Queue()
+        self.busy = False
+
+        # Results of earlier saves, so snapshots taken before a save finished
+        # still reuse its map id and image file
+        self._map_ids = {}  # session -> map_id
+        self._image_paths = {}  # (session, image_version) -> image_path
+
+        self._thread = threading.Thread(target=self._run, name="map-save-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, snapshot):
+        """Queue a snapshot for saving; return True if it merged with a waiting one."""
+        with self._condition:
+            previous = self._pending[-1] if self._pending else None
+            coalesced = previous is not None and previous['session'] == snapshot['session']
+            if coalesced:
+                self._pending.pop()
+                snapshot['delta'] = merge_deltas(previous['delta'], snapshot['delta'])
+                if snapshot['locations'] is None:
+                    snapshot['locations'] = previous['locations']
+                snapshot['compact'] = snapshot.get('compact') or previous.get('compact')
+                if snapshot['image'] is None and previous['image'] is not None \
+                        and previous['image_version'] == snapshot['image_version']:
+                    # Don't drop an image encode the newer snapshot relies on
+                    snapshot['image'] = previous['image']
+                    snapshot['image_digest'] = previous.get('image_digest')
+            self._pending.append(snapshot)
+            self._condition.notify()
+        return coalesced
+
+    @property
+    def idle(self):
+        """True when no save is running or waiting."""
+        with self._condition:
+            return not self.busy and not self._pending
+
+    def poll(self):
+        """Return all messages posted since the last poll."""
+        messages = []
+        while True:
+            try:
+                messages.append(self._messages.get_nowait())
+            except queue.Empty:
+                return messages
+
+    def stop(self):
+        """Finish any in-flight or waiting save, then stop the thread."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _run(self):
+        db = self._db_factory()
+        try:
+            while True:
+                with self._condition:
+                    while not self._pending and not self._stopping:
+                        self._condition.wait()
+                    if not self._pending:
+                        return
+                    snapshot = self._pending.pop(0)
+                    self.busy = True
+
+                self._messages.put(('done', self._save(db, snapshot)))
+
+                with self._condition:
+                    self.busy = False
+        finally:
+            db.close()
+
+    def _save(self, db, snapshot):
+        session = snapshot['session']
+        image_key = (session, snapshot['image_version'])
+        map_data = snapshot['map_data']
+        result = {
+            'ok': False,
+            'session': session,
+            'image_version': snapshot['image_version'],
+            'version': snapshot['version'],
+            'map_id': None,
+            'image_path': None,
+            'name': map_data['name'],
+            'image_digest': None,
+            'error': None
+        }
+
+        try:
+            if map_data['id'] is None:
+                map_data['id'] = self._map_ids.get(session)
+            if snapshot['image'] is None and not map_data['image_path']:
+                map_data['image_path'] = self._image_paths.get(image_key)
+                if not map_data['image_path']:
+                    raise RuntimeError("No saved image for this map.")
+
+            map_id, image_path = save_snapshot(
+                db, snapshot, lambda message: self._messages.put(('progress', message))
+            )
+            self._map_ids[session] = map_id
+            self._image_paths[image_key] = image_path
+            result.update(ok=True, map_id=map_id, image_path=image_path)
+        except Exception as e:
+            result.update(
+                error=str(e),
+                delta=snapshot['delta'],
+                locations_changed=snapshot['locations'] is not None
+            )
+        # A failed save may still have hashed the image; don't hash it again
+        result['image_digest'] = snapshot.get('image_digest')
+        return result
@@ -0,0 +1,134 @@
+# overlay_cache.py
+"""Cached overlay tiles for the map editor.
+
+Walls, doors and the grid are baked into transparent tile surfaces, one set
+per zoom bucket (the on-screen cell size), so a steady-state frame is a few
+blits regardless of how many walls are visible.  Edits invalidate only the
+tiles containing the touched cells.  Tiles are evicted least recently used
+first once ``max_tiles`` is reached.
+
+Pixel edges are rounded from absolute positions (``round(index *
+cell_size)``), as ``map_pyramid`` does for image tiles, so at fractional
+zoom neighbouring tiles meet exactly instead of leaving 1px seams or
+overlaps.  Tiles therefore differ in size by a pixel, and grid tiles are
+cached per tile rather than one repeated across the view.
+"""
+from collections import OrderedDict
+
+import pygame
+
+TILE_PIXELS = 256  # Target tile edge in screen pixels
+WALL_FILL = (255, 0, 0)
+WALL_BORDER = (200, 0, 0)
+DOOR_FILL = (0, 0, 255)
+DOOR_BORDER = (0, 0, 200)
+
+_EMPTY = object()  # Cached marker for tiles with nothing to draw
+
+
+def zoom_bucket(cell_size):
+    """Cache key for an on-screen cell size, stable against float noise."""
+    return round(cell_size, 2)
+
+
+def tile_cells(cell_size):
+    """Number of grid cells along a tile edge at this cell size."""
+    return max(1, int(TILE_PIXELS // cell_size))
+
+
+def cell_offset(index, cell_size):
+    """Pixel position of the left/top edge of the index-th cell from the map origin."""
+    return round(index * cell_size)
+
+
+def tile_bounds(tile_index, size, cell_size):
+    """Pixel ``(start, end)`` of a tile along one axis, from the map origin."""
+    return (cell_offset(tile_index * size, cell_size),
+            cell_offset((tile_index + 1) * size, cell_size))
+
+
+class OverlayCache:
+    def __init__(self, max_tiles=200):
+        self.max_tiles = max_tiles
+        self._tiles = OrderedDict()  # (bucket, tile_x, tile_y) -> surface or _EMPTY
+        self._buckets = {}  # bucket -> cells per tile edge
+        self._grid_tiles = OrderedDict()  # (bucket, color, tile_x, tile_y) -> surface
+
+    def clear(self):
+        """Drop every cached tile, e.g. after a load or grid size change."""
+        self._tiles.clear()
+        self._buckets.clear()
+        self._grid_tiles.clear()
+
+    def invalidate_cells(self, cells):
+        """Drop the wall/door tiles containing any of the given cells."""
+        if not self._tiles:
+            return
+        for bucket, size in self._buckets.items():
+            for x, y in cells:
+                self._tiles.pop((bucket, x // size, y // size), None)
+
+    def get_tile(self, cell_size, tile_x, tile_y, walls, doors):
+        """Return the wall/door tile surface at (tile_x, tile_y), or None if empty."""
+        bucket = zoom_bucket(cell_size)
+        key = (bucket, tile_x, tile_y)
+        tile = self._tiles.get(key)
+        if tile is None:
+            size = self._buckets.setdefault(bucket, tile_cells(cell_size))
+            tile = self._render_tile(cell_size, size, tile_x, tile_y, walls, doors)
+            self._tiles[key] = tile
+            if len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+        else:
+            self._tiles.move_to_end(key)
+        return None if tile is _EMPTY else tile
+
+    def get_grid_tile(self, cell_size, tile_x, tile_y, color):
+        """Return the tile of grid lines at (tile_x, tile_y)."""
+        key = (zoom_bucket(cell_size), tuple(color), tile_x, tile_y)
+        tile = self._grid_tiles.get(key)
+        if tile is None:
+            size = tile_cells(cell_size)
+            left, right = tile_bounds(tile_x, size, cell_size)
+            top, bottom = tile_bounds(tile_y, size, cell_size)
+            width, height = right - left, bottom - top
+            tile = pygame.Surface((width, height), pygame.SRCALPHA)
+            for i in range(size):
+                x = cell_offset(tile_x * size + i, cell_size) - left
+                y = cell_offset(tile_y * size + i, cell_size) - top
+                pygame.draw.line(tile, color, (x, 0), (x, height - 1), 1)
+                pygame.draw.line(tile, color, (0, y), (width - 1, y), 1)
+            self._grid_tiles[key] = tile
+            if len(self._grid_tiles) > self.max_tiles:
+                self._grid_tiles.popitem(last=False)
+        else:
+            self._grid_tiles.move_to_end(key)
+        return tile
+
+    def _render_tile(self, cell_size, size, tile_x, tile_y, walls, doors):
+        left, top = tile_x * size, tile_y * size
+        right, bottom = left + size - 1, top + size - 1
+        tile_walls = list(walls.cells_in_rect(left, top, right, bottom))
+        tile_doors = list(doors.cells_in_rect(left, top, right, bottom))
+        if not tile_walls and not tile_doors:
+            return _EMPTY
+
+        pixel_left, pixel_right = tile_bounds(tile_x, size, cell_size)
+        pixel_top, pixel_bottom = tile_bounds(tile_y, size, cell_size)
+        tile = pygame.Surface((pixel_right - pixel_left, pixel_bottom - pixel_top), pygame.SRCALPHA)
+
+        def cell_rect(x, y):
+            x0, y0 = cell_offset(x, cell_size), cell_offset(y, cell_size)
+            x1, y1 = cell_offset(x + 1, cell_size), cell_offset(y + 1, cell_size)
+            return pygame.Rect(x0 - pixel_left, y0 - pixel_top, x1 - x0, y1 - y0)
+
+        # Walls (red squares), then doors (blue squares) on top
+        for x, y in tile_walls:
+            rect = cell_rect(x, y)
+            tile.fill(WALL_FILL, rect)
+            pygame.draw.rect(tile, WALL_BORDER, rect, 2)
+        for x, y in tile_doors:
+            rect = cell_rect(x, y)
+            tile.fill(DOOR_FILL, rect)
+            pygame.draw.rect(tile, DOOR_BORDER, rect, 2)
+        return tile
@@ -0,0 +1,292 @@
+# pathfinding.py
+"""Grid pathfinding for token movement.
+
+``find_path`` is A* over a flat ``blocked`` byte grid (one byte per cell,
+row-major, nonzero means impassable) using a binary heap.  Movement is
+4-connected by default.  With ``diagonal=True`` it is 8-connected and
+diagonal steps are charged by one of three rules:
+
+- ``'uniform'``: every diagonal step costs 1
+- ``'alternating'``: diagonals cost 1, 2, 1, 2, ... along the path
+- ``'euclidean'``: every diagonal step costs sqrt(2)
+
+Diagonal steps may never cut the corner of a wall.
+
+``movement_range`` is the matching Dijkstra flood fill: the cost to reach
+every cell within a movement budget, stored in a distance array around the
+start so "can the token get there?" is one index.
+
+``Pathfinder`` builds the blocked grid from a set of walls and caches
+results per start, goal and wall version, so re-clicking the same cell or
+redrawing a preview costs a dict lookup.
+"""
+import heapq
+import math
+from collections import OrderedDict
+
+from grid_layer import CellView
+
+UNIFORM = 'uniform'
+ALTERNATING = 'alternating'
+EUCLIDEAN = 'euclidean'
+
+_SQRT2 = math.sqrt(2)
+_ORTHOGONAL = ((1, 0), (-1, 0), (0, 1), (0, -1))
+_DIAGONAL = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+
+
+def build_blocked(walls, width, height):
+    """Return a width*height bytearray with 1 for every wall cell."""
+    if isinstance(walls, CellView):
+        if not width or not height:
+            return bytearray()
+        return bytearray(walls.mask(0, 0, width - 1, height - 1).tobytes())
+    blocked = bytearray(width * height)
+    for x, y in walls:
+        if 0 <= x < width and 0 <= y < height:
+            blocked[y * width + x] = 1
+    return blocked
+
+
+def path_cost(path, diagonal_rule=ALTERNATING):
+    """Movement cost of walking a path of adjacent cells."""
+    cost = 0
+    diagonals = 0
+    for (x1, y1), (x2, y2) in zip(path, path[1:]):
+        if x1 != x2 and y1 != y2:
+            if diagonal_rule == EUCLIDEAN:
+                cost += _SQRT2
+            elif diagonal_rule == ALTERNATING:
+                cost += 2 if diagonals % 2 else 1
+            else:
+                cost += 1
+            diagonals += 1
+        else:
+            cost += 1
+    return cost
+
+
+def find_path(start, goal, blocked, width, height, diagonal=False,
+              diagonal_rule=ALTERNATING, max_cost=None):
+    """Return ``(path, cost)`` for the cheapest route, or None if there is none.
+
+    ``path`` lists the cells from ``start`` to ``goal`` inclusive.  Routes
+    costing more than ``max_cost`` are not explored.
+    """
+    start_x, start_y = start
+    goal_x, goal_y = goal
+    if not (0 <= goal_x < width and 0 <= goal_y < height) or blocked[goal_y * width + goal_x]:
+        return None
+    if start == goal:
+        return [start], 0
+
+    alternating = diagonal and diagonal_rule == ALTERNATING
+    diagonal_cost = _SQRT2 if diagonal_rule == EUCLIDEAN else 1
+    steps = _ORTHOGONAL + _DIAGONAL if diagonal else _ORTHOGONAL
+
+    def heuristic(x, y):
+        dx = abs(x - goal_x)
+        dy = abs(y - goal_y)
+        if not diagonal:
+            return dx + dy
+        low, high = (dx, dy) if dx < dy else (dy, dx)
+        if diagonal_rule == EUCLIDEAN:
+            return high - low + low * _SQRT2
+        if alternating:
+            return high + low // 2
+        return high
+
+    # States are cell index * 2 + parity of diagonals taken (alternating rule only)
+    start_state = (start_y * width + start_x) * 2
+    best = {start_state: 0}
+    came_from = {start_state: None}
+    h = heuristic(start_x, start_y)
+    heap = [(h, h, 0, start_state)]
+
+    while heap:
+        _, _, cost, state = heapq.heappop(heap)
+        if cost > best[state]:
+            continue  # Stale heap entry
+        index, parity = divmod(state, 2)
+        y, x = divmod(index, width)
+        if x == goal_x and y == goal_y:
+            return _reconstruct(came_from, state, width), cost
+
+        for dx, dy in steps:
+            nx, ny = x + dx, y + dy
+            if not (0 <= nx < width and 0 <= ny < height) or blocked[ny * width + nx]:
+                continue
+            next_parity = parity
+            if dx and dy:
+                # No squeezing diagonally past a wall corner
+                if blocked[y * width + nx] or blocked[ny * width + x]:
+                    continue
+                if alternating:
+                    step_cost = 2 if parity else 1
+                    next_parity = parity ^ 1
+                else:
+                    step_cost = diagonal_cost
+            else:
+                step_cost = 1
+
+            next_cost = cost + step_cost
+            if max_cost is not None and next_cost > max_cost:
+                continue
+            next_state = (ny * width + nx) * 2 + next_parity
+            if next_cost < best.get(next_state, math.inf):
+                best[next_state] = next_cost
+                came_from[next_state] = state
+                h = heuristic(nx, ny)
+                heapq.heappush(heap, (next_cost + h, h, next_cost, next_state))
+    return None
+
+
+class MovementRange:
+    """Costs to reach the cells around ``origin`` within ``max_cost``.
+
+    ``distances`` is a row-major array over the square window of cells that
+    could possibly be in range, with ``math.inf`` for unreachable cells.
+    """
+
+    def __init__(self, origin, max_cost, left, top, side, distances):
+        self.origin = origin
+        self.max_cost = max_cost
+        self.left = left
+        self.top = top
+        self.side = side
+        self.distances = distances
+
+    def cost(self, x, y):
+        """Cost to reach a cell, or None if it is out of range."""
+        x -= self.left
+        y -= self.top
+        if 0 <= x < self.side and 0 <= y < self.side:
+            cost = self.distances[y * self.side + x]
+            if cost != math.inf:
+                return cost
+        return None
+
+    def __contains__(self, cell):
+        return self.cost(cell[0], cell[1]) is not None
+
+    def __iter__(self):
+        """Yield every reachable cell."""
+        side = self.side
+        for index, cost in enumerate(self.distances):
+            if cost != math.inf:
+                y, x = divmod(index, side)
+                yield self.left + x, self.top + y
+
+
+def movement_range(start, blocked, width, height, max_cost, diagonal=False,
+                   diagonal_rule=ALTERNATING):
+    """Flood fill the cells reachable from ``start`` for at most ``max_cost``."""
+    start_x, start_y = start
+    reach = max(0, int(math.floor(max_cost)))
+    side = 2 * reach + 1
+    left, top = start_x - reach, start_y - reach
+    distances = [math.inf] * (side * side)
+    if not (0 <= start_x < width and 0 <= start_y < height) or max_cost < 0:
+        return MovementRange(start, max_cost, left, top, side, distances)
+
+    alternating = diagonal and diagonal_rule == ALTERNATING
+    diagonal_cost = _SQRT2 if diagonal_rule == EUCLIDEAN else 1
+    steps = _ORTHOGONAL + _DIAGONAL if diagonal else _ORTHOGONAL
+
+    # Same state encoding as find_path: cell index * 2 + diagonal parity
+    start_state = (start_y * width + start_x) * 2
+    best = {start_state: 0}
+    heap = [(0, start_state)]
+    while heap:
+        cost, state = heapq.heappop(heap)
+        if cost > best[state]:
+            continue
+        index, parity = divmod(state, 2)
+        y, x = divmod(index, width)
+        window_index = (y - top) * side + (x - left)
+        if cost < distances[window_index]:
+            distances[window_index] = cost
+
+        for dx, dy in steps:
+            nx, ny = x + dx, y + dy
+            if not (0 <= nx < width and 0 <= ny < height) or blocked[ny * width + nx]:
+                continue
+            next_parity = parity
+            if dx and dy:
+                if blocked[y * width + nx] or blocked[ny * width + x]:
+                    continue
+                if alternating:
+                    step_cost = 2 if parity else 1
+                    next_parity = parity ^ 1
+                else:
+                    step_cost = diagonal_cost
+            else:
+                step_cost = 1
+
+            next_cost = cost + step_cost
+            if next_cost > max_cost:
+                continue
+            next_state = (ny * width + nx) * 2 + next_parity
+            if next_cost < best.get(next_state, math.inf):
+                best[next_state] = next_cost
+                heapq.heappush(heap, (next_cost, next_state))
+    return MovementRange(start, max_cost, left, top, side, distances)
+
+
+def _reconstruct(came_from, state, width):
+    path = []
+    while state is not None:
+        y, x = divmod(state // 2, width)
+        path.append((x, y))
+        state = came_from[state]
+    path.reverse()
+    return path
+
+
+class Pathfinder:
+    """``find_path`` with a cached blocked grid and an LRU cache of results."""
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._paths = OrderedDict()
+        self._blocked = None
+        self._blocked_key = None
+
+        # Counters for profiling
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self._paths.clear()
+        self._blocked = None
+        self._blocked_key = None
+
+    def _blocked_grid(self, walls, width, height, walls_version):
+        blocked_key = (walls_version, width, height)
+        if blocked_key != self._blocked_key:
+            self._blocked = build_blocked(walls, width, height)
+            self._blocked_key = blocked_key
+        return self._blocked
+
+    def reach(self, start, walls, width, height, walls_version, max_cost,
+              diagonal=False, diagonal_rule=ALTERNATING):
+        """``movement_range`` sharing this pathfinder's blocked grid."""
+        blocked = self._blocked_grid(walls, width, height, walls_version)
+        return movement_range(start, blocked, width, height, max_cost, diagonal, diagonal_rule)
+
+    def find(self, start, goal, walls, width, height, walls_version,
+             diagonal=False, diagonal_rule=ALTERNATING, max_cost=None):
+        """Cached ``find_path``; ``walls_version`` must change whenever ``walls`` does."""
+        key = (start, goal, walls_version, width, height, diagonal, diagonal_rule, max_cost)
+        if key in self._paths:
+            self._paths.move_to_end(key)
+            self.hits += 1
+            return self._paths[key]
+
+        self.misses += 1
+        blocked = self._blocked_grid(walls, width, height, walls_version)
+        result = find_path(start, goal, blocked, width, height, diagonal, diagonal_rule, max_cost)
+        self._paths[key] = result
+        if len(self._paths) > self.max_entries:
+            self._paths.popitem(last=False)
+        return result
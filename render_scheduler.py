@@ -0,0 +1,87 @@
+# render_scheduler.py
+"""Damage tracking and frame pacing for the editor and viewer main loops.
+
+Anything that changes what is on screen (input, token animation, camera
+moves, pygame_gui activity, background results) marks the screen or a region
+of it dirty.  Frames are only drawn while something is dirty and are
+presented with ``pygame.display.update(rects)`` when only part of the screen
+changed.  Overlapping dirty regions are merged as they are marked, so
+repeated events in one frame (a stroke's motion events, say) don't hand the
+display the same pixels several times.  After ``idle_after`` seconds
+without damage the loop ticks at ``idle_fps`` instead of ``active_fps``.
+"""
+import time
+
+import pygame
+
+
+class RenderScheduler:
+    def __init__(self, active_fps=60, idle_fps=15, idle_after=1.0):
+        self.active_fps = active_fps
+        self.idle_fps = idle_fps
+        self.idle_after = idle_after
+        self._full = True  # First frame draws everything
+        self._rects = []
+        self._last_activity = time.monotonic()
+
+        # Counters for profiling
+        self.frames_drawn = 0
+        self.frames_skipped = 0
+
+    @property
+    def dirty(self):
+        """True if anything needs drawing this frame."""
+        return self._full or bool(self._rects)
+
+    @property
+    def idle(self):
+        return time.monotonic() - self._last_activity > self.idle_after
+
+    def mark_dirty(self, rect=None):
+        """Mark a screen region as changed; None means the whole screen."""
+        if rect is None:
+            self._full = True
+            self._rects = []
+        elif not self._full:
+            self._add_rect(pygame.Rect(rect))
+        self._last_activity = time.monotonic()
+
+    def _add_rect(self, rect):
+        """Add a dirty rect, merging it with any it overlaps."""
+        rects = self._rects
+        index = 0
+        while index < len(rects):
+            other = rects[index]
+            if other.contains(rect):
+                return
+            if other.colliderect(rect):
+                # The union may now overlap rects already checked
+                rect.union_ip(other)
+                del rects[index]
+                index = 0
+                continue
+            index += 1
+        rects.append(rect)
+
+    def is_dirty(self, rect):
+        """True if the given screen region needs redrawing this frame."""
+        return self._full or rect.collidelist(self._rects) != -1
+
+    def tick(self, clock):
+        """Wait for the next frame at the active or idle rate; return seconds elapsed."""
+        fps = self.idle_fps if self.idle else self.active_fps
+        return clock.tick(fps) / 1000.0
+
+    def present(self):
+        """Push the dirty regions to the display and reset the damage."""
+        if self._full:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self._rects)
+        self._full = False
+        self._rects = []
+        self.frames_drawn += 1
+
+    def skip(self):
+        """Record a frame with nothing to draw."""
+        self.frames_skipped += 1
@@ -2,13 +2,24 @@ import pygame
 import pygame_gui
 import os
 import sys
-import traceback
+import time
 
 # Add the parent directory to sys.path to import our modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from database import Database
 from map_veiwer import EnhancedMapViewer # Corrected typo from map_veiwer.py to map_viewer.py if that's the case
+import visibility
+from grid_geometry import get_line
+from render_scheduler import RenderScheduler
+from fog import FogLayer, load_explored, save_explored
+from layer_store import load_layer_into
+from grid_layer import GridLayer
+from pathfinding import Pathfinder, UNIFORM, ALTERNATING, EUCLIDEAN
+from token_registry import TokenRegistry
+from token_animation import TokenAnimator
+from frame_profiler import FrameProfiler, TOGGLE_KEY, CAPTURE_KEY
+from app_logging import configure as configure_logging, get_logger, RateLimitedLog
 import config # Import the config module # Corrected typo from map_veiwer.py to map_viewer.py if that's the case
 
 # Configuration constants (since they are not in config.py for map area)
@@ -22,6 +33,20 @@ MAP_AREA_TOP = TOOLBAR_HEIGHT
 MAP_AREA_WIDTH = SCREEN_WIDTH - SIDEBAR_WIDTH
 MAP_AREA_HEIGHT = SCREEN_HEIGHT - TOOLBAR_HEIGHT
 
+# Movement modes the Diagonal button cycles through: (label, diagonal, rule)
+DIAGONAL_MODES = (
+    ('Off', False, ALTERNATING),
+    ('Uniform', True, UNIFORM),
+    ('Alternating', True, ALTERNATING),
+    ('Euclidean', True, EUCLIDEAN),
+)
+
+log = get_logger('viewer')
+maps_log = get_logger('viewer.maps')
+walls_log = get_logger('viewer.walls')
+visibility_log = get_logger('viewer.visibility')
+tokens_log = get_logger('viewer.tokens')
+
 class StandaloneMapViewerApp:
     def __init__(self):
         pygame.init()
@@ -29,6 +54,8 @@ class StandaloneMapViewerApp:
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         self.clock = pygame.time.Clock()
         self.running = True
+        self.scheduler = RenderScheduler()  # Only redraw when something changed
+        self.profiler = FrameProfiler()  # Per-phase timings, F3 to show, F4 to capture
 
         self.gui_manager = pygame_gui.UIManager((SCREEN_WIDTH, SCREEN_HEIGHT), 'theme.json') # Assuming a theme.json might exist or be created
         self.db = Database()
@@ -61,7 +88,8 @@ class StandaloneMapViewerApp:
             'target_x': 5,  # Target position for animation
             'target_y': 5,  # Target position for animation
             'is_moving': False,  # Whether token is currently moving
-            'move_speed': 0.1,  # Speed of movement (grid cells per frame)
+            'move_speed': 6.0,  # Speed of movement (grid cells per second)
+            'path': [],  # Remaining cells to walk through after the target
             'selected': True  # Whether token is selected
         }
         
@@ -75,28 +103,53 @@ class StandaloneMapViewerApp:
             'target_x': 7,  # Target position for animation
             'target_y': 7,  # Target position for animation
             'is_moving': False,  # Whether token is currently moving
-            'move_speed': 0.1,  # Speed of movement (grid cells per frame)
+            'move_speed': 6.0,  # Speed of movement (grid cells per second)
+            'path': [],  # Remaining cells to walk through after the target
             'selected': False  # Whether token is selected
         }
         
-        self.tokens = [self.player_token, self.ally_token]
+        # Id lookup and a cell hash for hit-testing; self.tokens is its draw-order list
+        self.token_registry = TokenRegistry([self.player_token, self.ally_token])
+        self.token_trace = RateLimitedLog(tokens_log)  # Held arrow keys repeat moves and wall bumps
+        self.token_animator = TokenAnimator(self.token_registry)  # Fixed-step movement, eased for click/drag routes
+        self.tokens = self.token_registry.tokens
         self.selected_token_id = 'player_1'
 
         # Movement state
         self.keys_pressed = set()
         self.movement_points = 5  # Default movement points
         self.movement_used = 0    # Movement points used in current turn
+        # 8-way paths and how diagonal steps are charged (see pathfinding);
+        # config can set the starting mode, the Diagonal button cycles it
+        self.diagonal_movement = getattr(config, 'DIAGONAL_MOVEMENT', False)
+        self.diagonal_rule = getattr(config, 'DIAGONAL_RULE', ALTERNATING)
+        self.pathfinder = Pathfinder()  # Routes around walls, cached per wall version
+        self.movement_range = None  # MovementRange of the token being moved
+        self.movement_range_key = None  # (token, cell, walls_version, budget, rules) it was built for
+        self.range_overlay = None  # Shaded reachable cells, in map area coordinates
+        self.range_overlay_key = None  # (movement_range_key, camera/zoom) of range_overlay
         
         # Mouse drag state
         self.dragging_token = False
         self.dragged_token = None
         self.drag_offset_x = 0
         self.drag_offset_y = 0
+        self.drag_preview = None  # (grid_x, grid_y, is_valid) of the ghost token
         
         # Wall data
-        self.walls = set()  # Set of (x, y) tuples for wall locations
+        self.grid_layer = GridLayer()  # Wall flags per cell in one array
+        self.walls = self.grid_layer.walls  # Set-like view: (x, y) in self.walls
         self.visible_area = set()  # Set of (x, y) tuples for visible grid cells
         self.visibility_radius = 10  # Default visibility radius
+        self.walls_version = 0  # Bumped whenever self.walls is edited
+        self.visibility_key = None  # (cell, walls_version, radius, grid size) of visible_area
+        self.visibility_cache = visibility.VisibilityCache(max_entries=64)
+        self.visibility_trace = RateLimitedLog(visibility_log)  # Fires every step of a player move
+        self.fog_layer = FogLayer((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.explored = None  # ExploredCells bitset for the current map
+        self.explored_map_id = None
+        self.exploration_save_delay = 5.0  # Seconds after new cells are seen before they are saved
+        self.exploration_dirty_since = None  # When unsaved exploration started, None if saved
         
         # Display options
         self.show_grid = True  # Whether to show the grid or not
@@ -170,10 +223,18 @@ class StandaloneMapViewerApp:
             tool_tip_text='Toggle token centering in grid squares'
         )
         
+        # Diagonal movement mode
+        self.diagonal_button = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((1060, 80), (130, 30)),
+            text=self.diagonal_button_text(),
+            manager=self.gui_manager,
+            tool_tip_text='Diagonal moves: off, or charged 1 each, alternately 1 and 2, or 1.41 each'
+        )
+        
         # Movement used counter
         self.movement_used_label = pygame_gui.elements.UILabel(
             relative_rect=pygame.Rect((850, 45), (190, 30)),
-            text=f'Used: {self.movement_used}/{self.movement_points}',
+            text=self.movement_used_text(),
             manager=self.gui_manager
         )
         
@@ -183,9 +244,9 @@ class StandaloneMapViewerApp:
 
     def show_load_map_dialog(self):
         try:
-            print("DEBUG: Getting maps from database")
+            maps_log.debug("Getting maps from database")
             maps = self.db.get_all_maps()
-            print(f"DEBUG: Found {len(maps)} maps: {maps}")
+            maps_log.debug("Found %d maps: %r", len(maps), maps)
             
             if not maps:
                 self.show_message("No Maps", "No maps found in the database.")
@@ -200,7 +261,7 @@ class StandaloneMapViewerApp:
                 display_name = f"{name} (ID: {map_id})"
                 self.map_options.append(display_name)
                 self.map_ids[display_name] = map_id
-                print(f"DEBUG: Added map to list: {display_name}")
+                maps_log.debug("Added map to list: %s", display_name)
             
             # Create map selection dropdown
             self.map_dropdown = pygame_gui.elements.UIDropDownMenu(
@@ -221,8 +282,7 @@ class StandaloneMapViewerApp:
             self.dialog_active = True
             
         except Exception as e:
-            print(f"DEBUG ERROR: {e}")
-            print(traceback.format_exc())
+            maps_log.exception("Failed to load map list")
             self.show_message("Error", f"Failed to load map list: {e}")
     
     def handle_dialog_events(self, event):
@@ -241,7 +301,7 @@ class StandaloneMapViewerApp:
         """Load the map selected in the dropdown"""
         try:
             selected_map = self.map_dropdown.selected_option
-            print(f"DEBUG: Selected map: {selected_map} (type: {type(selected_map)})")
+            maps_log.debug("Selected map: %r", selected_map)
             
             # Handle case where selected_map is a tuple
             if isinstance(selected_map, tuple):
@@ -249,17 +309,17 @@ class StandaloneMapViewerApp:
             
             # Fallback solution if the key isn't found
             if selected_map not in self.map_ids:
-                print(f"DEBUG: Map not found in dictionary. Keys: {list(self.map_ids.keys())}")
+                maps_log.debug("Map not found in dictionary. Keys: %r", list(self.map_ids))
                 # Extract ID from the display name
                 if "(ID:" in selected_map:
                     map_id = int(selected_map.split("(ID: ")[1].split(")")[0])
-                    print(f"DEBUG: Extracted map_id from string: {map_id}")
+                    maps_log.debug("Extracted map_id from string: %d", map_id)
                 else:
                     raise ValueError(f"Could not determine map ID from {selected_map}")
             else:
                 map_id = self.map_ids[selected_map]
             
-            print(f"DEBUG: Loading map with ID: {map_id}")
+            maps_log.debug("Loading map with ID: %s", map_id)
             
             # Make sure map_id is an integer
             if isinstance(map_id, tuple):
@@ -267,24 +327,28 @@ class StandaloneMapViewerApp:
             map_id = int(map_id)  # Ensure it's an integer
             
             map_data = self.db.get_map_by_id(map_id)
-            print(f"DEBUG: Map data: {map_data}")
+            maps_log.debug("Map data: %r", map_data)
             
             if map_data:
-                print(f"DEBUG: Loading map data into viewer")
+                maps_log.debug("Loading map data into viewer")
                 try:
+                    # Keep exploration of the map we are leaving
+                    self.save_exploration()
+                    
                     self.map_viewer.load_map_data(map_data)
-                    print(f"DEBUG: Map loaded successfully")
+                    maps_log.info("Loaded map %d", map_id)
                     
-                    # Load walls for the map
+                    # Load walls and exploration state for the map
                     self.load_walls(map_id)
+                    self.load_exploration(map_id)
+                    self.fog_layer.invalidate()
                     
                     # Calculate initial visibility
                     self.update_visibility()
                     
                     self.show_message("Success", f"Map '{selected_map.split(' (ID:')[0]}' loaded successfully!")
                 except Exception as e:
-                    print(f"DEBUG ERROR: Error loading map data: {e}")
-                    print(traceback.format_exc())
+                    maps_log.exception("Error loading map data for map %d", map_id)
                     self.show_message("Error", f"Error loading map: {e}")
             else:
                 self.show_message("Error", f"Could not load map data for ID: {map_id}")
@@ -295,13 +359,12 @@ class StandaloneMapViewerApp:
             self.dialog_active = False
             
         except Exception as e:
-            print(f"DEBUG ERROR: {e}")
-            print(traceback.format_exc())
+            maps_log.exception("Failed to load map")
             self.show_message("Error", f"Failed to load map: {e}")
             
     def show_message(self, title, message):
         """Show a message box using pygame_gui"""
-        print(f"MESSAGE: {title} - {message}")
+        log.info("%s - %s", title, message)
         
         # Create message box
         self.message_box = pygame_gui.windows.UIMessageWindow(
@@ -311,17 +374,12 @@ class StandaloneMapViewerApp:
         )
 
     def handle_token_movement(self):
-        """Handle keyboard input for token movement and animate tokens"""
+        """Handle keyboard input for token movement"""
         if not self.selected_token_id or not self.map_viewer.current_map_id:
             return
             
         # Find the selected token
-        token = None
-        for t in self.tokens:
-            if t['id'] == self.selected_token_id:
-                token = t
-                break
-                
+        token = self.token_registry.get(self.selected_token_id)
         if not token:
             return
             
@@ -339,27 +397,30 @@ class StandaloneMapViewerApp:
         elif keys[pygame.K_DOWN]:
             dy = 1
             
-        # Apply movement with bounds checking
-        if dx != 0 or dy != 0:
-            new_x = token['x'] + dx
-            new_y = token['y'] + dy
+        # Walk one cell at a time; while a key is held the next cell is queued
+        # as the token enters its last one, so it keeps moving without stopping
+        if (dx != 0 or dy != 0) and not token['path']:
+            if token['is_moving']:
+                if token.get('route_eased', True):
+                    return  # Let a click or drag route finish first
+                from_x, from_y = token['target_x'], token['target_y']
+            else:
+                from_x, from_y = int(round(token['x'])), int(round(token['y']))
             
             # Set target position instead of moving immediately
-            self.set_token_target(token, new_x, new_y)
-        
-        # Animate all tokens that are moving
-        self.animate_tokens()
+            self.set_token_target(token, from_x + dx, from_y + dy)
     
     def load_walls(self, map_id):
         """Load wall data for the map"""
         try:
-            wall_data = self.db.get_map_walls(map_id)
-            self.walls = set(wall_data)  # Convert list of tuples to set for faster lookup
-            print(f"DEBUG: Loaded {len(self.walls)} walls for map {map_id}")
+            self.grid_layer.clear()
+            load_layer_into(self.db, map_id, 'walls', self.walls)
+            self.walls_version += 1
+            walls_log.debug("Loaded %d walls for map %s", len(self.walls), map_id)
             
             # If no walls found, create some test walls
             if not self.walls:
-                print("DEBUG: No walls found, creating test walls")
+                walls_log.info("No walls found for map %s, creating test walls", map_id)
                 # Create a simple test room with walls
                 for x in range(3, 15):
                     # Top and bottom walls
@@ -375,112 +436,114 @@ class StandaloneMapViewerApp:
                 for y in range(3, 8):
                     self.walls.add((8, y))
                 
-                print(f"DEBUG: Created {len(self.walls)} test walls")
+                walls_log.debug("Created %d test walls", len(self.walls))
                 
         except Exception as e:
-            print(f"DEBUG ERROR: Error loading walls: {e}")
-            self.walls = set()
+            walls_log.error("Error loading walls for map %s: %s", map_id, e)
+            self.grid_layer.clear()
+            self.walls_version += 1
+    
+    def load_exploration(self, map_id):
+        """Load the explored-area bitset for a map"""
+        self.explored = None
+        self.explored_map_id = None
+        if self.map_viewer.grid_size <= 0:
+            return
+            
+        grid_width = self.map_viewer.map_width // self.map_viewer.grid_size
+        grid_height = self.map_viewer.map_height // self.map_viewer.grid_size
+        try:
+            self.explored = load_explored(self.db, map_id, grid_width, grid_height)
+            self.explored_map_id = map_id
+        except Exception as e:
+            visibility_log.error("Error loading exploration for map %s: %s", map_id, e)
+    
+    def save_exploration(self):
+        """Persist the explored-area bitset for the current map"""
+        if self.explored is None or self.explored_map_id is None:
+            return
+        try:
+            save_explored(self.db, self.explored_map_id, self.explored)
+        except Exception as e:
+            visibility_log.error("Error saving exploration for map %s: %s", self.explored_map_id, e)
+        self.exploration_dirty_since = None
+    
+    def autosave_exploration(self):
+        """Save newly explored cells ``exploration_save_delay`` seconds after they were first seen.
+        
+        Called every frame.  A walk keeps marking cells, so this writes at
+        most once per delay, and a crash loses at most that much exploration.
+        """
+        if self.explored is None or not self.explored.dirty:
+            self.exploration_dirty_since = None
+            return
+        now = time.monotonic()
+        if self.exploration_dirty_since is None:
+            self.exploration_dirty_since = now
+        elif now - self.exploration_dirty_since >= self.exploration_save_delay:
+            self.save_exploration()
     
     def update_visibility(self):
-        """Update visibility based on player position and walls"""
+        """Update visibility based on player position and walls.
+        
+        Visibility only changes when the player's rounded cell, the walls or the
+        radius change, so results are keyed on those and recent ones are kept in
+        an LRU cache. Returns True if the visible area changed.
+        """
         if not self.map_viewer.current_map_id:
             self.visible_area = set()
-            return
+            self.visibility_key = None
+            return False
         
         # Find the player token (always use player token for visibility, even if ally is selected)
-        player_token = None
-        for token in self.tokens:
-            if token['id'] == 'player_1':
-                player_token = token
-                break
-                
+        player_token = self.token_registry.get('player_1')
+
         if not player_token:
             self.visible_area = set()
-            return
+            self.visibility_key = None
+            return False
         
-        # Clear visibility
-        self.visible_area = set()
+        # Get player cell (position is fractional while animating)
+        player_x, player_y = int(round(player_token['x'])), int(round(player_token['y']))
+        
+        # Bound the scan to the map when a grid is set
+        grid_width = grid_height = None
+        if self.map_viewer.grid_size > 0:
+            grid_width = self.map_viewer.map_width // self.map_viewer.grid_size
+            grid_height = self.map_viewer.map_height // self.map_viewer.grid_size
         
-        # Get player position
-        player_x, player_y = player_token['x'], player_token['y']
-        print(f"DEBUG: Updating visibility for player at ({player_x}, {player_y})")
+        key = ((player_x, player_y), self.walls_version, self.visibility_radius, grid_width, grid_height)
+        if key == self.visibility_key:
+            return False
         
-        # Use the current visibility radius setting
-        visibility_range = self.visibility_radius
+        # Shadowcast from the player's cell using the current visibility radius
+        def compute():
+            self.visibility_trace.debug("Updating visibility for player at (%d, %d)", player_x, player_y)
+            return visibility.compute_visible_cells(
+                (player_x, player_y),
+                self.visibility_radius,
+                self.walls,
+                grid_width,
+                grid_height
+            )
         
-        # Always see your own cell
-        self.visible_area.add((player_x, player_y))
+        self.visible_area = self.visibility_cache.get(key, compute)
+        self.visibility_key = key
         
-        # Start with all cells in range being potentially visible
-        for dx in range(-visibility_range, visibility_range + 1):
-            for dy in range(-visibility_range, visibility_range + 1):
-                x, y = player_x + dx, player_y + dy
-                
-                # Check if cell is in bounds
-                if self.map_viewer.grid_size > 0:
-                    grid_width = self.map_viewer.map_width // self.map_viewer.grid_size
-                    grid_height = self.map_viewer.map_height // self.map_viewer.grid_size
-                    if not (0 <= x < grid_width and 0 <= y < grid_height):
-                        continue
-                
-                # Check if cell is within visibility radius
-                distance = (dx*dx + dy*dy) ** 0.5
-                if distance > visibility_range:
-                    continue
-                
-                # Use line of sight algorithm to check if this cell is visible
-                if self.has_line_of_sight(player_x, player_y, x, y):
-                    self.visible_area.add((x, y))
+        # Merge into the explored-area memory
+        if self.explored is not None:
+            self.explored.mark(self.visible_area)
         
-        print(f"DEBUG: Updated visibility, {len(self.visible_area)} cells visible")
+        self.visibility_trace.debug("Updated visibility, %d cells visible", len(self.visible_area))
+        return True
     
     def has_line_of_sight(self, x1, y1, x2, y2):
         """Check if there's a clear line of sight between two points"""
-        # Always see your own cell
-        if (x1, y1) == (x2, y2):
-            return True
-        
-        # Use Bresenham's line algorithm to check for walls
-        points = self.get_line(x1, y1, x2, y2)
-        
-        # Check all points except the start and end
-        for i, (x, y) in enumerate(points):
-            # Skip the starting point
-            if i == 0:
-                continue
-                
-            # If we hit a wall before reaching the end, there's no line of sight
-            if (x, y) in self.walls:
-                return False
-                
-            # If we reached the destination, there is line of sight
-            if (x, y) == (x2, y2):
-                return True
-        
-        return True
+        return visibility.has_line_of_sight(self.walls, x1, y1, x2, y2)
     
     def get_line(self, x1, y1, x2, y2):
         """Get all points on a line between (x1,y1) and (x2,y2) using Bresenham's algorithm"""
-        points = []
-        dx = abs(x2 - x1)
-        dy = abs(y2 - y1)
-        sx = 1 if x1 < x2 else -1
-        sy = 1 if y1 < y2 else -1
-        err = dx - dy
-        
-        while True:
-            points.append((x1, y1))
-            if x1 == x2 and y1 == y2:
-                break
-            e2 = 2 * err
-            if e2 > -dy:
-                err -= dy
-                x1 += sx
-            if e2 < dx:
-                err += dx
-                y1 += sy
-                
-        return points
+        return get_line(x1, y1, x2, y2)
     
     def is_cell_visible(self, x, y):
         """Check if a cell is visible"""
@@ -497,14 +560,15 @@ class StandaloneMapViewerApp:
             if 0 <= grid_x < grid_width and 0 <= grid_y < grid_height:
                 # Check if destination is a wall
                 if (grid_x, grid_y) in self.walls:
-                    print(f"DEBUG: Cannot move to wall at ({grid_x}, {grid_y})")
+                    self.token_trace.debug("Cannot move to wall at (%d, %d)", grid_x, grid_y)
                     return False
                     
                 # Move token
                 old_x, old_y = token['x'], token['y']
                 token['x'] = grid_x
                 token['y'] = grid_y
-                print(f"DEBUG: Moved token to ({grid_x}, {grid_y})")
+                self.token_registry.moved(token)
+                tokens_log.debug("Moved token %s to (%d, %d)", token['id'], grid_x, grid_y)
                 
                 # If this is the player token, update visibility
                 if token['id'] == 'player_1':
@@ -516,6 +580,7 @@ class StandaloneMapViewerApp:
             if 0 <= grid_x < 100 and 0 <= grid_y < 100:
                 token['x'] = grid_x
                 token['y'] = grid_y
+                self.token_registry.moved(token)
                 return True
                 
         return False
@@ -544,13 +609,16 @@ class StandaloneMapViewerApp:
         # Check if point is within circle
         dx = screen_x - token_screen_pos[0]
         dy = screen_y - token_screen_pos[1]
-        distance = (dx*dx + dy*dy) ** 0.5
-        
-        return distance <= token_radius
+        return dx*dx + dy*dy <= token_radius*token_radius
     
     def get_token_at_position(self, screen_x, screen_y):
         """Get token at the given screen position"""
-        for token in self.tokens:
+        if not self.map_viewer.map_surface or not self.map_viewer.grid_size:
+            return None
+            
+        # Tokens are smaller than a cell, so only those hashed next to this cell can be hit
+        grid_x, grid_y = self.screen_to_grid_position(screen_x, screen_y)
+        for token in self.token_registry.near(grid_x, grid_y):
             if self.is_point_over_token(screen_x, screen_y, token):
                 return token
         return None
@@ -571,282 +639,406 @@ class StandaloneMapViewerApp:
 
     def run(self):
         while self.running:
-            time_delta = self.clock.tick(60) / 1000.0
+            time_delta = self.scheduler.tick(self.clock)
+            self.profiler.begin_frame()
 
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.running = False
+            with self.profiler.scope('events'):
+                for event in pygame.event.get():
+                    # Plain mouse movement changes nothing unless a token is being
+                    # dragged or a held button pans the map; pygame_gui hover is
+                    # tracked below
+                    if event.type == pygame.MOUSEMOTION:
+                        if self.dragging_token or any(event.buttons):
+                            self.scheduler.mark_dirty(self.map_viewer.map_area_rect)
+                    else:
+                        # Any other input may change the view, the tokens or the UI
+                        self.scheduler.mark_dirty()
                 
-                # ESC key to exit application
-                if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
-                    self.running = False
+                    if event.type == pygame.QUIT:
+                        self.running = False
                 
-                # Handle map dialog events if active
-                if self.dialog_active:
-                    if self.handle_dialog_events(event):
-                        continue
+                    # ESC key to exit application
+                    if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                        self.running = False
+                    
+                    # Frame profiler overlay and cProfile capture
+                    if event.type == pygame.KEYDOWN and event.key == TOGGLE_KEY:
+                        self.profiler.toggle()
+                    elif event.type == pygame.KEYDOWN and event.key == CAPTURE_KEY:
+                        path = self.profiler.start_capture()
+                        log.info("Profiling the next frames to %s", path)
                 
-                if event.type == pygame_gui.UI_BUTTON_PRESSED:
-                    if event.ui_element == self.load_map_button:
-                        self.show_load_map_dialog()
-                    elif event.ui_element == self.reset_movement_button:
-                        # Reset movement points used
-                        self.movement_used = 0
-                        self.movement_used_label.set_text(f'Used: {self.movement_used}/{self.movement_points}')
-                    elif event.ui_element == self.grid_checkbox:
-                        # Toggle grid visibility
-                        self.show_grid = not self.show_grid
-                        self.grid_checkbox.set_text('Grid: On' if self.show_grid else 'Grid: Off')
-                    elif event.ui_element == self.center_checkbox:
-                        # Toggle token centering
-                        self.center_tokens = not self.center_tokens
-                        self.center_checkbox.set_text('Center: On' if self.center_tokens else 'Center: Off')
+                    # Handle map dialog events if active
+                    if self.dialog_active:
+                        if self.handle_dialog_events(event):
+                            continue
                 
-                # Handle slider movement
-                if event.type == pygame_gui.UI_HORIZONTAL_SLIDER_MOVED:
-                    if event.ui_element == self.visibility_slider:
-                        # Update visibility radius
-                        new_radius = int(event.value)
-                        if new_radius != self.visibility_radius:
-                            self.visibility_radius = new_radius
-                            self.visibility_label.set_text(f'Vision: {self.visibility_radius}')
-                            # Update visibility with new radius
-                            self.update_visibility()
-                    elif event.ui_element == self.movement_slider:
-                        # Update movement points
-                        new_movement = int(event.value)
-                        if new_movement != self.movement_points:
-                            self.movement_points = new_movement
-                            self.movement_label.set_text(f'Move: {self.movement_points}')
-                            self.movement_used_label.set_text(f'Used: {self.movement_used}/{self.movement_points}')
-                            # Reset movement used if we reduce max below current used
-                            if self.movement_used > self.movement_points:
-                                self.movement_used = 0
-                                self.movement_used_label.set_text(f'Used: {self.movement_used}/{self.movement_points}')
+                    if event.type == pygame_gui.UI_BUTTON_PRESSED:
+                        if event.ui_element == self.load_map_button:
+                            self.show_load_map_dialog()
+                        elif event.ui_element == self.reset_movement_button:
+                            # Reset movement points used
+                            self.movement_used = 0
+                            self.movement_used_label.set_text(self.movement_used_text())
+                        elif event.ui_element == self.grid_checkbox:
+                            # Toggle grid visibility
+                            self.show_grid = not self.show_grid
+                            self.grid_checkbox.set_text('Grid: On' if self.show_grid else 'Grid: Off')
+                        elif event.ui_element == self.center_checkbox:
+                            # Toggle token centering
+                            self.center_tokens = not self.center_tokens
+                            self.center_checkbox.set_text('Center: On' if self.center_tokens else 'Center: Off')
+                        elif event.ui_element == self.diagonal_button:
+                            self.cycle_diagonal_mode()
                 
-                # These button handlers are now in the section above
+                    # Handle slider movement
+                    if event.type == pygame_gui.UI_HORIZONTAL_SLIDER_MOVED:
+                        if event.ui_element == self.visibility_slider:
+                            # Update visibility radius
+                            new_radius = int(event.value)
+                            if new_radius != self.visibility_radius:
+                                self.visibility_radius = new_radius
+                                self.visibility_label.set_text(f'Vision: {self.visibility_radius}')
+                                # Update visibility with new radius
+                                self.update_visibility()
+                        elif event.ui_element == self.movement_slider:
+                            # Update movement points
+                            new_movement = int(event.value)
+                            if new_movement != self.movement_points:
+                                self.movement_points = new_movement
+                                self.movement_label.set_text(f'Move: {self.movement_points}')
+                                self.movement_used_label.set_text(self.movement_used_text())
+                                # Reset movement used if we reduce max below current used
+                                if self.movement_used > self.movement_points:
+                                    self.movement_used = 0
+                                    self.movement_used_label.set_text(self.movement_used_text())
                 
-                # Handle keyboard events for smoother movement
-                if event.type == pygame.KEYDOWN:
-                    if event.key in [pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN]:
-                        self.keys_pressed.add(event.key)
+                    # These button handlers are now in the section above
+                
+                    # Handle keyboard events for smoother movement
+                    if event.type == pygame.KEYDOWN:
+                        if event.key in [pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN]:
+                            self.keys_pressed.add(event.key)
                         
-                if event.type == pygame.KEYUP:
-                    if event.key in [pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN]:
-                        self.keys_pressed.discard(event.key)
+                    if event.type == pygame.KEYUP:
+                        if event.key in [pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN]:
+                            self.keys_pressed.discard(event.key)
                 
-                # Handle mouse events for token dragging
-                if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:  # Left mouse button
-                    if not self.dialog_active and self.map_viewer.current_map_id:
-                        mouse_pos = pygame.mouse.get_pos()
-                        token = self.get_token_at_position(mouse_pos[0], mouse_pos[1])
-                        if token:
-                            # Select the token
-                            self.select_token(token)
-                            self.dragging_token = True
-                            self.dragged_token = token
-                            self.selected_token_id = token['id']
-                            # Calculate drag offset (accounting for centering)
-                            if self.center_tokens:
-                                # Center in grid cell
-                                token_map_x = (token['x'] + 0.5) * self.map_viewer.grid_size
-                                token_map_y = (token['y'] + 0.5) * self.map_viewer.grid_size
-                            else:
-                                # Corner of grid cell
-                                token_map_x = token['x'] * self.map_viewer.grid_size
-                                token_map_y = token['y'] * self.map_viewer.grid_size
+                    # Handle mouse events for token dragging
+                    if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:  # Left mouse button
+                        if not self.dialog_active and self.map_viewer.current_map_id:
+                            mouse_pos = pygame.mouse.get_pos()
+                            token = self.get_token_at_position(mouse_pos[0], mouse_pos[1])
+                            if token:
+                                # Select the token
+                                self.select_token(token)
+                                self.dragging_token = True
+                                self.dragged_token = token
+                                self.selected_token_id = token['id']
+                                # Calculate drag offset (accounting for centering)
+                                if self.center_tokens:
+                                    # Center in grid cell
+                                    token_map_x = (token['x'] + 0.5) * self.map_viewer.grid_size
+                                    token_map_y = (token['y'] + 0.5) * self.map_viewer.grid_size
+                                else:
+                                    # Corner of grid cell
+                                    token_map_x = token['x'] * self.map_viewer.grid_size
+                                    token_map_y = token['y'] * self.map_viewer.grid_size
                                 
-                            token_screen_pos = self.map_viewer.map_to_screen_coords((token_map_x, token_map_y))
-                            self.drag_offset_x = token_screen_pos[0] - mouse_pos[0]
-                            self.drag_offset_y = token_screen_pos[1] - mouse_pos[1]
-                            print(f"DEBUG: Started dragging token at ({token['x']}, {token['y']})")
+                                token_screen_pos = self.map_viewer.map_to_screen_coords((token_map_x, token_map_y))
+                                self.drag_offset_x = token_screen_pos[0] - mouse_pos[0]
+                                self.drag_offset_y = token_screen_pos[1] - mouse_pos[1]
+                                # Flood fill the reachable cells once, up front
+                                self.get_movement_range(token)
+                                tokens_log.debug("Started dragging token %s at (%s, %s)", token['id'], token['x'], token['y'])
                 
-                if event.type == pygame.MOUSEBUTTONUP and event.button == 1:  # Left mouse button
-                    # Handle regular map clicks (not drag ends)
-                    if not self.dragging_token and not self.dialog_active and self.map_viewer.current_map_id:
-                        if self.map_viewer.map_area_rect.collidepoint(event.pos):
-                            # Get the selected token
-                            selected_token = None
-                            for token in self.tokens:
-                                if token['id'] == self.selected_token_id:
-                                    selected_token = token
-                                    break
-                            
-                            if selected_token:
-                                # Convert click position to grid coordinates
-                                grid_x, grid_y = self.screen_to_grid_position(event.pos[0], event.pos[1])
-                                
-                                # Calculate distance
-                                old_x, old_y = selected_token['x'], selected_token['y']
-                                distance = abs(grid_x - old_x) + abs(grid_y - old_y)  # Manhattan distance
+                    if event.type == pygame.MOUSEBUTTONUP and event.button == 1:  # Left mouse button
+                        # Handle regular map clicks (not drag ends)
+                        if not self.dragging_token and not self.dialog_active and self.map_viewer.current_map_id:
+                            if self.map_viewer.map_area_rect.collidepoint(event.pos):
+                                # Get the selected token
+                                selected_token = self.token_registry.get(self.selected_token_id)
+
+                                if selected_token:
+                                    # Convert click position to grid coordinates
+                                    grid_x, grid_y = self.screen_to_grid_position(event.pos[0], event.pos[1])
                                 
-                                # Check if we have enough movement points
-                                remaining_movement = self.movement_points - self.movement_used
+                                    # Walk around walls, paying for the route actually taken
+                                    remaining_movement = round(self.movement_points - self.movement_used, 2)
+                                    route = self.find_token_path(selected_token, grid_x, grid_y, remaining_movement)
                                 
-                                if distance <= remaining_movement:
-                                    # Check validity of move
-                                    if self.set_token_target(selected_token, grid_x, grid_y):
-                                        # Update movement points used
-                                        self.movement_used += distance
-                                        self.movement_used_label.set_text(f'Used: {self.movement_used}/{self.movement_points}')
-                                        print(f"DEBUG: Click-moving token to ({grid_x}, {grid_y})")
-                                else:
-                                    print(f"DEBUG: Not enough movement points for click move. Need {distance}, have {remaining_movement}")
+                                    if route:
+                                        path, cost = route
+                                        if self.set_token_path(selected_token, path):
+                                            # Update movement points used
+                                            self.spend_movement(cost)
+                                            self.movement_used_label.set_text(self.movement_used_text())
+                                            tokens_log.debug("Click-moving token to (%d, %d)", grid_x, grid_y)
+                                    else:
+                                        tokens_log.debug("No path to (%d, %d) within %s movement", grid_x, grid_y, remaining_movement)
                     
-                    # Handle drag ends
-                    elif self.dragging_token and self.dragged_token:
-                        # Get final position and convert to grid coordinates
-                        mouse_pos = pygame.mouse.get_pos()
-                        adjusted_pos = (mouse_pos[0] + self.drag_offset_x, mouse_pos[1] + self.drag_offset_y)
-                        grid_x, grid_y = self.screen_to_grid_position(adjusted_pos[0], adjusted_pos[1])
+                        # Handle drag ends
+                        elif self.dragging_token and self.dragged_token:
+                            # Get final position and convert to grid coordinates
+                            mouse_pos = pygame.mouse.get_pos()
+                            adjusted_pos = (mouse_pos[0] + self.drag_offset_x, mouse_pos[1] + self.drag_offset_y)
+                            grid_x, grid_y = self.screen_to_grid_position(adjusted_pos[0], adjusted_pos[1])
                         
-                                # Calculate distance from original position
-                        old_x, old_y = self.dragged_token['x'], self.dragged_token['y']
-                        distance = abs(grid_x - old_x) + abs(grid_y - old_y)  # Manhattan distance
+                            # Walk around walls, paying for the route actually taken
+                            remaining_movement = round(self.movement_points - self.movement_used, 2)
+                            reach = self.get_movement_range(self.dragged_token)
+                            route = None
+                            if reach is not None and (grid_x, grid_y) in reach:
+                                route = self.find_token_path(self.dragged_token, grid_x, grid_y, remaining_movement)
                         
-                        # Check if we have enough movement points
-                        remaining_movement = self.movement_points - self.movement_used
-                        
-                        if distance <= remaining_movement:
-                            # Set target position for smooth animation
-                            if self.set_token_target(self.dragged_token, grid_x, grid_y):
-                                # Update movement points used
-                                self.movement_used += distance
-                                self.movement_used_label.set_text(f'Used: {self.movement_used}/{self.movement_points}')
-                        else:
-                            # Not enough movement points
-                            print(f"DEBUG: Not enough movement points. Need {distance}, have {remaining_movement}")
+                            if route:
+                                path, cost = route
+                                # Animate along the route
+                                if self.set_token_path(self.dragged_token, path):
+                                    # Update movement points used
+                                    self.spend_movement(cost)
+                                    self.movement_used_label.set_text(self.movement_used_text())
+                            else:
+                                # No route within the remaining movement points
+                                tokens_log.debug("No path to (%d, %d) within %s movement", grid_x, grid_y, remaining_movement)
                         
-                        # Reset drag state
-                        self.dragging_token = False
-                        self.dragged_token = None
-                        print("DEBUG: Finished dragging token")
+                            # Reset drag state
+                            self.dragging_token = False
+                            self.dragged_token = None
+                            self.drag_preview = None
+                            tokens_log.debug("Finished dragging token")
                 
-                if event.type == pygame.MOUSEMOTION:
-                    # Update token position during drag
-                    if self.dragging_token and self.dragged_token and self.map_viewer.current_map_id:
-                        # Show visual preview of where token will be placed
-                        mouse_pos = pygame.mouse.get_pos()
-                        adjusted_pos = (mouse_pos[0] + self.drag_offset_x, mouse_pos[1] + self.drag_offset_y)
-                        
-                        # Calculate grid position
-                        new_grid_x, new_grid_y = self.screen_to_grid_position(adjusted_pos[0], adjusted_pos[1])
-                        
-                        # Calculate distance from original position
-                        old_x, old_y = self.dragged_token['x'], self.dragged_token['y']
-                        distance = abs(new_grid_x - old_x) + abs(new_grid_y - old_y)  # Manhattan distance
-                        
-                        # Get movement allowance
-                        remaining_movement = self.movement_points - self.movement_used
-                        
-                        # Preview color based on whether move is valid
-                        is_valid = (distance <= remaining_movement) and (new_grid_x, new_grid_y) not in self.walls
-                        color = (0, 255, 0, 128) if is_valid else (255, 0, 0, 128)  # Green if valid, red if not
-                        
-                        # Draw preview at new position
-                        if self.center_tokens:
-                            # Center of grid cell
-                            map_x = (new_grid_x + 0.5) * self.map_viewer.grid_size
-                            map_y = (new_grid_y + 0.5) * self.map_viewer.grid_size
-                        else:
-                            # Corner of grid cell (original behavior)
-                            map_x = new_grid_x * self.map_viewer.grid_size
-                            map_y = new_grid_y * self.map_viewer.grid_size
-                        
-                        screen_pos = self.map_viewer.map_to_screen_coords((map_x, map_y))
-                        token_size = int(self.map_viewer.grid_size * self.map_viewer.zoom_level * 0.8)
+                    if event.type == pygame.MOUSEMOTION:
+                        # Update token position during drag
+                        if self.dragging_token and self.dragged_token and self.map_viewer.current_map_id:
+                            # Show visual preview of where token will be placed
+                            mouse_pos = pygame.mouse.get_pos()
+                            adjusted_pos = (mouse_pos[0] + self.drag_offset_x, mouse_pos[1] + self.drag_offset_y)
                         
-                        # Create ghost token surface
-                        ghost_surface = pygame.Surface((token_size, token_size), pygame.SRCALPHA)
-                        pygame.draw.circle(ghost_surface, color, (token_size//2, token_size//2), token_size//2)
+                            # Calculate grid position
+                            new_grid_x, new_grid_y = self.screen_to_grid_position(adjusted_pos[0], adjusted_pos[1])
                         
-                        # Draw ghost token
-                        ghost_rect = ghost_surface.get_rect(center=screen_pos)
-                        self.screen.blit(ghost_surface, ghost_rect)
+                            # Valid drops are cells the flood fill reached: one lookup per event
+                            reach = self.get_movement_range(self.dragged_token)
+                            is_valid = reach is not None and (new_grid_x, new_grid_y) in reach
+                            self.drag_preview = (new_grid_x, new_grid_y, is_valid)
                 
-                self.gui_manager.process_events(event)
-                if not self.dialog_active:  # Only handle map viewer events when dialog is not active
-                    self.map_viewer.handle_event(event) # Pass events to EnhancedMapViewer
+                    self.gui_manager.process_events(event)
+                    if not self.dialog_active:  # Only handle map viewer events when dialog is not active
+                        self.map_viewer.handle_event(event) # Pass events to EnhancedMapViewer
 
-            # Handle continuous token movement
-            self.handle_token_movement()
+            # Keyboard movement, then the one animation update of the frame
+            with self.profiler.scope('tokens'):
+                self.handle_token_movement()
+                animated = self.animate_tokens(time_delta)
+            if animated:
+                self.scheduler.mark_dirty(self.map_viewer.map_area_rect)
+            self.autosave_exploration()
 
-            self.gui_manager.update(time_delta)
-            self.map_viewer.update(time_delta) # Update EnhancedMapViewer
+            with self.profiler.scope('ui update'):
+                self.gui_manager.update(time_delta)
+                self.map_viewer.update(time_delta) # Update EnhancedMapViewer
+                
+            # Hovered or focused widgets animate (highlights, tooltips, text cursor)
+            if self.gui_manager.get_hovering_any_element() or self.gui_manager.get_focus_set():
+                self.scheduler.mark_dirty()
+            if self.profiler.overlay_due():
+                self.scheduler.mark_dirty(self.profiler.overlay_rect)
+                
+            # Nothing changed: keep the last frame on screen
+            if not self.scheduler.dirty:
+                self.scheduler.skip()
+                self.profiler.end_frame()
+                continue
 
             self.screen.fill((config.UI_PANEL_COLOR if hasattr(config, 'UI_PANEL_COLOR') else (50,50,50))) # Background color
             # Pass display options to map viewer
             self.map_viewer.show_grid = self.show_grid
             self.map_viewer.center_tokens = self.center_tokens
             
-            # Handle token animation - returns True if any animation occurred
-            animation_occurred = self.animate_tokens()
-            
             # Draw map viewer elements first
-            self.map_viewer.draw(
-                self.screen, 
-                tokens=self.tokens,
-                notes=None, 
-                locations=self.map_viewer.location_icons if hasattr(self.map_viewer, 'location_icons') else [], 
-                selected_token_id=self.selected_token_id
-            ) # Draw EnhancedMapViewer
-            
-            # Then draw fog of war on top
+            with self.profiler.scope('map draw'):
+                self.map_viewer.draw(
+                    self.screen, 
+                    tokens=self.tokens,
+                    notes=None, 
+                    locations=self.map_viewer.location_icons if hasattr(self.map_viewer, 'location_icons') else [], 
+                    selected_token_id=self.selected_token_id
+                ) # Draw EnhancedMapViewer
+            
+            # Movement range under the fog, drag preview over it
             if self.map_viewer.current_map_id:
+                with self.profiler.scope('overlays'):
+                    self.draw_movement_range()
+                
                 # Always draw fog of war if animation is happening or normally
-                self.draw_fog_of_war()
-            self.gui_manager.draw_ui(self.screen)
+                with self.profiler.scope('fog'):
+                    self.draw_fog_of_war()
+                with self.profiler.scope('overlays'):
+                    self.draw_drag_preview()
+            with self.profiler.scope('ui draw'):
+                self.gui_manager.draw_ui(self.screen)
+            self.profiler.draw(self.screen, (self.map_viewer.map_area_rect.left + 8, self.map_viewer.map_area_rect.top + 8))
 
-            pygame.display.flip()
+            with self.profiler.scope('flip'):
+                self.scheduler.present()
+            self.profiler.end_frame()
 
+        self.save_exploration()
         self.db.close()
         pygame.quit()
 
     def draw_fog_of_war(self):
-        """Draw a simple fog of war overlay"""
+        """Draw the fog of war overlay.
+        
+        Cells never seen are dark and explored cells out of view are dimmed.
+        The fog layer is persistent: it is only repainted when the visible set,
+        camera or zoom changes, otherwise this is a single blit.
+        """
         if not self.map_viewer.current_map_id or not self.map_viewer.grid_size:
             return
             
-        # Create a full-screen fog surface
-        fog = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        fog.fill((0, 0, 0, 220))  # Very dark fog
-            
-        # Create a mask to remove fog from visible areas
-        for x, y in self.visible_area:
-            # Calculate grid cell position in map coordinates
-            map_x = x * self.map_viewer.grid_size
-            map_y = y * self.map_viewer.grid_size
-            
-            # Convert to screen coordinates
-            screen_pos = self.map_viewer.map_to_screen_coords((map_x, map_y))
-            
-            # Calculate cell size in screen coordinates
-            cell_size = int(self.map_viewer.grid_size * self.map_viewer.zoom_level)
-            
-            # Create rectangle for this cell
-            rect = pygame.Rect(
+        grid_size = self.map_viewer.grid_size
+        
+        # Calculate cell size in screen coordinates
+        cell_size = int(grid_size * self.map_viewer.zoom_level)
+        
+        # The screen position of the map origin captures both camera and zoom
+        origin = self.map_viewer.map_to_screen_coords((0, 0))
+        view_key = (tuple(origin), self.map_viewer.zoom_level, grid_size)
+        
+        def cell_rect(x, y):
+            screen_pos = self.map_viewer.map_to_screen_coords((x * grid_size, y * grid_size))
+            return pygame.Rect(
                 screen_pos[0] - cell_size//2,
                 screen_pos[1] - cell_size//2,
                 cell_size,
                 cell_size
             )
-            
-            # Clear this area from fog - no yellow borders
-            pygame.draw.rect(fog, (0, 0, 0, 0), rect)
         
-        # Draw the fog overlay directly on screen
-        self.screen.blit(fog, (0, 0))
+        # Grid cells covered by the screen, padded for the half-cell offset
+        top_left = self.map_viewer.screen_to_map_coords((0, 0))
+        bottom_right = self.map_viewer.screen_to_map_coords((SCREEN_WIDTH, SCREEN_HEIGHT))
+        view_cells = (
+            int(top_left[0] // grid_size) - 1,
+            int(top_left[1] // grid_size) - 1,
+            int(bottom_right[0] // grid_size) + 1,
+            int(bottom_right[1] // grid_size) + 1
+        )
         
-        # Print debug info
-        print(f"DEBUG: Drew fog of war with {len(self.visible_area)} visible cells")
+        self.fog_layer.update(self.visible_area, view_key, cell_rect, self.explored, view_cells)
+        self.fog_layer.draw(self.screen)
 
+    def movement_used_text(self):
+        return f'Used: {self.movement_used:g}/{self.movement_points}'
+    
+    def spend_movement(self, cost):
+        """Charge a route's cost; Euclidean diagonals make it fractional, so keep two decimals."""
+        self.movement_used = round(self.movement_used + cost, 2)
+        self.movement_used_label.set_text(self.movement_used_text())
+    
+    def diagonal_button_text(self):
+        for label, diagonal, rule in DIAGONAL_MODES:
+            if diagonal == self.diagonal_movement and (rule == self.diagonal_rule or not diagonal):
+                return f'Diagonal: {label}'
+        return 'Diagonal: Custom'
+    
+    def cycle_diagonal_mode(self):
+        """Switch to the next of DIAGONAL_MODES; ranges and paths are cached per mode."""
+        modes = [(diagonal, rule) for _, diagonal, rule in DIAGONAL_MODES]
+        current = (self.diagonal_movement, self.diagonal_rule if self.diagonal_movement else ALTERNATING)
+        index = modes.index(current) + 1 if current in modes else 0
+        self.diagonal_movement, self.diagonal_rule = modes[index % len(modes)]
+        self.diagonal_button.set_text(self.diagonal_button_text())
+        tokens_log.debug("Diagonal movement %s, %s rule", self.diagonal_movement, self.diagonal_rule)
+    
+    def get_movement_range(self, token):
+        """Cells the token can still reach this turn, flood filled once per change."""
+        if self.map_viewer.grid_size <= 0:
+            return None
+            
+        grid_width = self.map_viewer.map_width // self.map_viewer.grid_size
+        grid_height = self.map_viewer.map_height // self.map_viewer.grid_size
+        start = (int(round(token['x'])), int(round(token['y'])))
+        remaining_movement = round(self.movement_points - self.movement_used, 2)
+        key = (token['id'], start, self.walls_version, remaining_movement, grid_width, grid_height,
+               self.diagonal_movement, self.diagonal_rule)
+        
+        if key != self.movement_range_key:
+            self.movement_range = self.pathfinder.reach(
+                start, self.walls, grid_width, grid_height, self.walls_version,
+                remaining_movement, self.diagonal_movement, self.diagonal_rule
+            )
+            self.movement_range_key = key
+        return self.movement_range
+        
+    def draw_movement_range(self):
+        """Shade the cells the dragged token can reach.
+        
+        The shading is rendered into a cached surface and only rebuilt when
+        the range, camera or zoom changes.
+        """
+        if not (self.dragging_token and self.dragged_token) or not self.map_viewer.grid_size:
+            return
+            
+        reach = self.get_movement_range(self.dragged_token)
+        if reach is None:
+            return
+            
+        grid_size = self.map_viewer.grid_size
+        area = self.map_viewer.map_area_rect
+        origin = self.map_viewer.map_to_screen_coords((0, 0))
+        key = (self.movement_range_key, tuple(origin), self.map_viewer.zoom_level, grid_size)
+        
+        if key != self.range_overlay_key:
+            self.range_overlay = pygame.Surface(area.size, pygame.SRCALPHA)
+            for x, y in reach:
+                left, top = self.map_viewer.map_to_screen_coords((x * grid_size, y * grid_size))
+                right, bottom = self.map_viewer.map_to_screen_coords(((x + 1) * grid_size, (y + 1) * grid_size))
+                self.range_overlay.fill(
+                    (0, 120, 255, 60),
+                    pygame.Rect(left - area.left, top - area.top, right - left, bottom - top)
+                )
+            self.range_overlay_key = key
+            
+        self.screen.blit(self.range_overlay, area.topleft)
+        
+    def draw_drag_preview(self):
+        """Draw a ghost of the dragged token where it would be dropped."""
+        if not self.dragging_token or not self.drag_preview:
+            return
+            
+        grid_x, grid_y, is_valid = self.drag_preview
+        color = (0, 255, 0, 128) if is_valid else (255, 0, 0, 128)  # Green if valid, red if not
+        
+        if self.center_tokens:
+            # Center of grid cell
+            map_x = (grid_x + 0.5) * self.map_viewer.grid_size
+            map_y = (grid_y + 0.5) * self.map_viewer.grid_size
+        else:
+            # Corner of grid cell (original behavior)
+            map_x = grid_x * self.map_viewer.grid_size
+            map_y = grid_y * self.map_viewer.grid_size
+            
+        screen_pos = self.map_viewer.map_to_screen_coords((map_x, map_y))
+        token_size = int(self.map_viewer.grid_size * self.map_viewer.zoom_level * 0.8)
+        
+        # Create ghost token surface
+        ghost_surface = pygame.Surface((token_size, token_size), pygame.SRCALPHA)
+        pygame.draw.circle(ghost_surface, color, (token_size//2, token_size//2), token_size//2)
+        
+        # Draw ghost token
+        ghost_rect = ghost_surface.get_rect(center=screen_pos)
+        self.screen.blit(ghost_surface, ghost_rect)
+        
     def select_token(self, token):
         """Select a token and deselect all others"""
         # Only change selection if not already selected
         if self.selected_token_id != token['id']:
-            # Deselect all tokens
-            for t in self.tokens:
-                t['selected'] = False
+            # Deselect the previous token
+            previous = self.token_registry.get(self.selected_token_id)
+            if previous:
+                previous['selected'] = False
                 
             # Select the new token
             token['selected'] = True
@@ -857,7 +1049,7 @@ class StandaloneMapViewerApp:
             if token['id'] == 'player_1':
                 self.update_visibility()
             
-            print(f"DEBUG: Selected token {token['id']}")
+            tokens_log.debug("Selected token %s", token['id'])
     
     def set_token_target(self, token, target_x, target_y):
         """Set a target position for a token to move to"""
@@ -865,11 +1057,36 @@ class StandaloneMapViewerApp:
         if not self.is_valid_move(token, target_x, target_y):
             return False
             
-        # Set the target position
-        token['target_x'] = target_x
-        token['target_y'] = target_y
-        token['is_moving'] = True
-        print(f"DEBUG: Set target position ({target_x}, {target_y}) for token {token['id']}")
+        # Animate towards the target position, continuing a keyboard walk
+        if not self.token_animator.extend(token, [(target_x, target_y)]):
+            self.token_animator.start(token, [(target_x, target_y)], eased=False)
+        self.token_trace.debug("Set target position (%s, %s) for token %s", target_x, target_y, token['id'])
+        return True
+    
+    def find_token_path(self, token, target_x, target_y, max_cost=None):
+        """Cheapest walkable route for a token as ``(path, cost)``, or None."""
+        if self.map_viewer.grid_size <= 0:
+            return None
+            
+        grid_width = self.map_viewer.map_width // self.map_viewer.grid_size
+        grid_height = self.map_viewer.map_height // self.map_viewer.grid_size
+        
+        # A token part way through a step starts from its nearest cell
+        start = (int(round(token['x'])), int(round(token['y'])))
+        return self.pathfinder.find(
+            start, (target_x, target_y), self.walls, grid_width, grid_height,
+            self.walls_version, self.diagonal_movement, self.diagonal_rule, max_cost
+        )
+    
+    def set_token_path(self, token, path):
+        """Animate a token cell by cell along a path from ``find_token_path``."""
+        target_x, target_y = path[-1]
+        if not self.is_valid_move(token, target_x, target_y):
+            return False
+            
+        steps = path[1:] or path
+        self.token_animator.start(token, steps)
+        tokens_log.debug("Set path of %d steps to (%d, %d) for token %s", len(steps), target_x, target_y, token['id'])
         return True
     
     def is_valid_move(self, token, target_x, target_y):
@@ -890,46 +1107,24 @@ class StandaloneMapViewerApp:
             
         return True
     
-    def animate_tokens(self):
-        """Animate all tokens that are moving"""
-        animation_occurred = False
+    def animate_tokens(self, time_delta):
+        """Advance moving tokens by ``time_delta`` seconds; True if any moved.
         
-        for token in self.tokens:
-            if token['is_moving']:
-                animation_occurred = True
-                # Calculate direction vector
-                dx = token['target_x'] - token['x']
-                dy = token['target_y'] - token['y']
-                
-                # Calculate distance
-                distance = (dx*dx + dy*dy) ** 0.5
-                
-                if distance < token['move_speed']:
-                    # We've reached the target
-                    token['x'] = token['target_x']
-                    token['y'] = token['target_y']
-                    token['is_moving'] = False
-                    
-                    # Update visibility if this is the player
-                    if token['id'] == 'player_1':
-                        self.update_visibility()
-                        
-                    print(f"DEBUG: Token {token['id']} reached target position ({token['x']}, {token['y']})")
-                else:
-                    # Move towards target
-                    if distance > 0:
-                        move_x = dx * token['move_speed'] / distance
-                        move_y = dy * token['move_speed'] / distance
-                        
-                        token['x'] += move_x
-                        token['y'] += move_y
-                        
-                        # Update visibility for player even during movement
-                        if token['id'] == 'player_1':
-                            self.update_visibility()
+        Simulation runs in fixed steps (see token_animation), so movement is
+        the same at any frame rate. Visibility is recomputed at most once per
+        frame, and only does work when the player enters a new cell.
+        """
+        moved, arrived = self.token_animator.update(time_delta)
+        
+        for token in arrived:
+            tokens_log.debug("Token %s reached target position (%s, %s)", token['id'], token['x'], token['y'])
+            
+        # Update visibility for the player even during movement
+        if any(token['id'] == 'player_1' for token in moved):
+            self.update_visibility()
         
         # Return whether any token was animated - used to trigger fog of war redraw
-        return animation_occurred
+        return bool(moved)
 
 if __name__ == '__main__':
     # Ensure config attributes are available for EnhancedMapViewer
@@ -955,5 +1150,6 @@ if __name__ == '__main__':
     if not hasattr(global_config_module, 'UI_PANEL_COLOR'): # Add if not present
         global_config_module.UI_PANEL_COLOR = (40,40,40)
 
+    configure_logging()
     app = StandaloneMapViewerApp()
     app.run()
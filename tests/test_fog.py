@@ -0,0 +1,78 @@
+# test_fog.py
+import sqlite3
+
+import pytest
+
+pytest.importorskip('pygame')
+
+from fog import ExploredCells, load_explored, save_explored
+
+
+class ExplorationDatabase:
+    def __init__(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.cursor = self.conn.cursor()
+
+
+@pytest.fixture
+def db():
+    database = ExplorationDatabase()
+    yield database
+    database.conn.close()
+
+
+def test_mark_counts_new_cells_and_ignores_outside_the_grid():
+    explored = ExploredCells(10, 7)
+    assert explored.mark({(0, 0), (9, 6), (3, 4)}) == 3
+    assert explored.mark({(3, 4), (5, 5), (-1, 0), (10, 0), (0, 7)}) == 1
+    assert (9, 6) in explored
+    assert (5, 5) in explored
+    assert (4, 3) not in explored
+    assert (-1, 0) not in explored
+    assert explored.dirty
+
+
+def test_marking_nothing_new_leaves_it_clean():
+    explored = ExploredCells(4, 4)
+    assert explored.mark({(9, 9)}) == 0
+    assert not explored.dirty
+
+
+def test_iter_region_is_clipped_to_the_grid():
+    explored = ExploredCells(6, 6)
+    explored.mark({(0, 0), (2, 3), (5, 5), (4, 1)})
+    assert set(explored.iter_region(-5, -5, 20, 20)) == {(0, 0), (2, 3), (5, 5), (4, 1)}
+    assert set(explored.iter_region(1, 1, 4, 4)) == {(2, 3), (4, 1)}
+
+
+def test_clear_forgets_every_cell():
+    explored = ExploredCells(5, 5)
+    explored.mark({(1, 1)})
+    explored.dirty = False
+    explored.clear()
+    assert (1, 1) not in explored
+    assert explored.dirty
+
+
+def test_data_of_the_wrong_size_is_ignored():
+    assert (0, 0) not in ExploredCells(8, 8, b'\xff')
+
+
+def test_save_and_load_round_trip(db):
+    explored = ExploredCells(13, 5)
+    cells = {(0, 0), (12, 4), (6, 2), (7, 3)}
+    explored.mark(cells)
+    save_explored(db, 1, explored)
+    assert not explored.dirty
+
+    loaded = load_explored(db, 1, 13, 5)
+    assert set(loaded.iter_region(0, 0, 12, 4)) == cells
+    assert not loaded.dirty
+
+
+def test_a_different_grid_layout_starts_empty(db):
+    explored = ExploredCells(13, 5)
+    explored.mark({(1, 1)})
+    save_explored(db, 1, explored)
+    assert (1, 1) not in load_explored(db, 1, 5, 13)
+    assert (1, 1) not in load_explored(db, 2, 13, 5)
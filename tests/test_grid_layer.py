@@ -0,0 +1,129 @@
+# test_grid_layer.py
+import random
+
+import numpy as np
+
+from grid_layer import GridLayer
+
+
+def bitmap(mask):
+    """Pack a bool array [y, x] the way paint_bitmap expects."""
+    return np.packbits(mask.reshape(-1), bitorder='little').tobytes()
+
+
+def test_views_behave_like_sets():
+    grid = GridLayer()
+    grid.walls.add((3, 4))
+    grid.walls.add((3, 4))
+    grid.doors.add((3, 4))
+    assert (3, 4) in grid.walls
+    assert (4, 3) not in grid.walls
+    assert len(grid.walls) == 1
+    assert set(grid.doors) == {(3, 4)}
+
+    grid.walls.discard((3, 4))
+    grid.walls.discard((99, 99))
+    assert not grid.walls
+    assert (3, 4) in grid.doors
+
+
+def test_growing_past_the_origin_keeps_existing_cells():
+    grid = GridLayer()
+    grid.walls.add((0, 0))
+    grid.walls.add((5, 2))
+    grid.walls.add((-3, -7))
+    grid.doors.add((-40, 100))
+    assert set(grid.walls) == {(0, 0), (5, 2), (-3, -7)}
+    assert set(grid.doors) == {(-40, 100)}
+    x0, y0, x1, y1 = grid.bounds()
+    assert x0 <= -40 and y0 <= -7 and x1 >= 5 and y1 >= 100
+    assert grid.flags(-3, -7) and not grid.flags(-1000, 0)
+
+
+def test_bulk_update_and_difference_update():
+    rng = random.Random(4)
+    cells = {(rng.randrange(-30, 30), rng.randrange(-30, 30)) for _ in range(300)}
+    grid = GridLayer()
+    grid.walls.update(cells)
+    assert set(grid.walls) == cells
+    assert len(grid.walls) == len(cells)
+
+    removed = set(rng.sample(sorted(cells), 100)) | {(500, 500)}
+    grid.walls.difference_update(removed)
+    assert set(grid.walls) == cells - removed
+    assert len(grid.walls) == len(cells - removed)
+
+
+def test_intersection_and_missing():
+    grid = GridLayer()
+    grid.walls.update({(1, 1), (2, 2)})
+    assert grid.walls.intersection({(1, 1), (3, 3)}) == {(1, 1)}
+    assert grid.walls.missing({(1, 1), (3, 3)}) == {(3, 3)}
+
+
+def test_fill_and_erase_rect_count_cells_once():
+    grid = GridLayer()
+    grid.walls.add((0, 0))
+    grid.walls.fill_rect(-2, -1, 2, 1)
+    assert len(grid.walls) == 15
+    assert set(grid.walls) == {(x, y) for x in range(-2, 3) for y in range(-1, 2)}
+
+    grid.walls.erase_rect(0, -10, 10, 0)
+    assert set(grid.walls) == {(x, y) for x in range(-2, 0) for y in range(-1, 2)} | {(0, 1), (1, 1), (2, 1)}
+    assert len(grid.walls) == 9
+
+    grid.walls.erase_rect(100, 100, 200, 200)  # Outside the grid: no-op
+    assert len(grid.walls) == 9
+
+
+def test_rect_operations_only_touch_their_bit():
+    grid = GridLayer()
+    grid.doors.fill_rect(0, 0, 3, 3)
+    grid.walls.fill_rect(2, 2, 5, 5)
+    grid.walls.erase_rect(0, 0, 5, 5)
+    assert not grid.walls
+    assert len(grid.doors) == 16
+
+
+def test_cells_in_rect_and_mask():
+    grid = GridLayer()
+    grid.walls.update({(-1, -1), (0, 0), (3, 2), (10, 10)})
+    assert set(grid.walls.cells_in_rect(-1, -1, 3, 2)) == {(-1, -1), (0, 0), (3, 2)}
+    mask = grid.walls.mask(-2, -2, 0, 0)
+    assert mask.shape == (3, 3)
+    assert mask[1, 1] and mask[2, 2] and mask.sum() == 2
+
+
+def test_paint_and_erase_bitmap():
+    rng = np.random.default_rng(7)
+    mask = rng.random((5, 11)) < 0.4
+    expected = {(int(x) - 4, int(y) + 3) for y, x in zip(*np.nonzero(mask))}
+
+    grid = GridLayer()
+    grid.walls.add((-4, 3))
+    grid.walls.paint_bitmap(-4, 3, 11, 5, bitmap(mask))
+    assert set(grid.walls) == expected | {(-4, 3)}
+    assert len(grid.walls) == len(expected | {(-4, 3)})
+
+    grid.walls.erase_bitmap(-4, 3, 11, 5, bitmap(mask))
+    assert set(grid.walls) == {(-4, 3)} - expected
+
+
+def test_erase_bitmap_partly_outside_the_grid():
+    grid = GridLayer()
+    grid.walls.fill_rect(0, 0, 3, 3)
+    mask = np.ones((4, 4), dtype=bool)
+    grid.walls.erase_bitmap(-2, -2, 4, 4, bitmap(mask))
+    assert (0, 0) not in grid.walls and (1, 1) not in grid.walls
+    assert (2, 2) in grid.walls
+    assert len(grid.walls) == 12
+
+
+def test_clear_resets_counts():
+    grid = GridLayer()
+    grid.walls.fill_rect(0, 0, 4, 4)
+    grid.doors.add((1, 1))
+    grid.walls.clear()
+    assert not grid.walls and len(grid.doors) == 1
+    grid.clear()
+    assert not grid.doors
@@ -0,0 +1,98 @@
+# test_history.py
+from history import EditHistory, invert
+
+
+def stroke(history, layer='walls', added=(), removed=()):
+    history.begin_stroke()
+    history.record(layer, added=set(added), removed=set(removed))
+    history.end_stroke()
+
+
+def test_undo_and_redo_return_inverse_and_original_deltas():
+    history = EditHistory()
+    stroke(history, added={(1, 1), (2, 1)}, removed={(5, 5)})
+    undo = history.undo()
+    assert undo['walls'] == ({(5, 5)}, {(1, 1), (2, 1)})
+    assert undo['doors'] == (set(), set())
+    redo = history.redo()
+    assert redo['walls'] == ({(1, 1), (2, 1)}, {(5, 5)})
+    assert history.redo() is None
+
+
+def test_a_stroke_nets_out_its_own_changes():
+    history = EditHistory()
+    history.begin_stroke()
+    history.record('doors', added={(1, 1)})
+    history.record('doors', removed={(1, 1), (2, 2)})
+    history.end_stroke()
+    assert history.undo()['doors'] == ({(2, 2)}, set())
+
+
+def test_empty_strokes_and_records_outside_a_stroke_are_dropped():
+    history = EditHistory()
+    history.record('walls', added={(1, 1)})
+    stroke(history)
+    assert history.undo() is None
+
+
+def test_a_new_stroke_clears_redo():
+    history = EditHistory()
+    stroke(history, added={(1, 1)})
+    history.undo()
+    stroke(history, added={(2, 2)})
+    assert history.redo() is None
+    assert history.undo()['walls'] == (set(), {(2, 2)})
+    assert history.undo() is None
+
+
+def test_begin_stroke_keeps_a_stroke_left_open():
+    history = EditHistory()
+    history.begin_stroke()
+    history.record('walls', added={(1, 1)})
+    # Mouse-up lost: the next stroke begins without end_stroke
+    stroke(history, added={(2, 2)})
+    assert history.undo()['walls'] == (set(), {(2, 2)})
+    assert history.undo()['walls'] == (set(), {(1, 1)})
+
+
+def test_undo_waits_for_the_open_stroke():
+    history = EditHistory()
+    stroke(history, added={(1, 1)})
+    history.begin_stroke()
+    assert history.in_stroke
+    assert history.undo() is None
+    history.end_stroke()
+    assert history.undo() is not None
+
+
+def test_oldest_strokes_are_evicted_past_the_stroke_cap():
+    history = EditHistory(max_strokes=3)
+    for x in range(5):
+        stroke(history, added={(x, 0)})
+    undone = [history.undo() for _ in range(4)]
+    assert [delta['walls'][1] for delta in undone[:3]] == [{(4, 0)}, {(3, 0)}, {(2, 0)}]
+    assert undone[3] is None
+
+
+def test_oldest_strokes_are_evicted_past_the_cell_budget():
+    history = EditHistory(max_cells=10)
+    stroke(history, added={(x, 0) for x in range(4)})
+    stroke(history, added={(x, 1) for x in range(4)})
+    stroke(history, added={(x, 2) for x in range(4)})
+    assert history.undo()['walls'][1] == {(x, 2) for x in range(4)}
+    assert history.undo()['walls'][1] == {(x, 1) for x in range(4)}
+    assert history.undo() is None
+
+
+def test_clear_drops_everything():
+    history = EditHistory()
+    stroke(history, added={(1, 1)})
+    history.begin_stroke()
+    history.clear()
+    assert not history.in_stroke
+    assert history.undo() is None
+
+
+def test_invert_swaps_added_and_removed():
+    delta = {'walls': ({(1, 1)}, {(2, 2)}), 'doors': (set(), {(3, 3)})}
+    assert invert(delta) == {'walls': ({(2, 2)}, {(1, 1)}), 'doors': ({(3, 3)}, set())}
@@ -0,0 +1,106 @@
+# test_journal.py
+from journal import ChangeJournal, delta_size, empty_delta, merge_deltas
+
+
+def stored_after(stored, delta, layer='walls'):
+    """Apply a saved delta to a set of stored cells, as the database would."""
+    added, removed = delta[layer]
+    return (stored - removed) | added
+
+
+def test_record_nets_out_opposite_edits():
+    journal = ChangeJournal()
+    journal.record('walls', added={(1, 1), (2, 2)})
+    journal.record('walls', removed={(1, 1), (3, 3)})
+    version, delta, locations_changed = journal.take()
+    assert version == 2
+    assert delta['walls'] == ({(2, 2)}, {(3, 3)})
+    assert delta['doors'] == (set(), set())
+    assert not locations_changed
+
+
+def test_empty_records_do_not_bump_the_version():
+    journal = ChangeJournal()
+    journal.record('walls')
+    assert journal.version == 0
+    assert not journal.dirty
+
+
+def test_merge_deltas_applies_newer_last():
+    older = empty_delta()
+    older['walls'] = ({(1, 1), (2, 2)}, {(5, 5)})
+    newer = empty_delta()
+    newer['walls'] = ({(5, 5), (3, 3)}, {(1, 1)})
+    merged = merge_deltas(older, newer)
+    assert merged['walls'] == ({(2, 2), (3, 3)}, set())
+    assert delta_size(merged) == 2
+
+
+def test_dirty_until_the_latest_version_is_saved():
+    journal = ChangeJournal()
+    journal.record('doors', added={(0, 0)})
+    version, _, _ = journal.take()
+    journal.record('doors', added={(1, 0)})
+    journal.mark_saved(version)
+    assert journal.dirty
+    journal.mark_saved(journal.take()[0])
+    assert not journal.dirty
+
+
+def test_failed_save_is_retried_with_later_edits_on_top():
+    journal = ChangeJournal()
+    journal.record('walls', added={(1, 1), (2, 2)})
+    version, delta, _ = journal.take()
+    journal.record('walls', removed={(2, 2)})
+    journal.record_locations()
+    journal.restore(version, delta, False)
+    _, retried, locations_changed = journal.take()
+    assert stored_after(set(), retried) == {(1, 1)}
+    assert locations_changed
+
+
+def test_restore_drops_cells_a_later_save_already_undid():
+    stored = set()
+    journal = ChangeJournal()
+
+    # Save A adds a wall and fails
+    journal.record('walls', added={(4, 4), (5, 5)})
+    version_a, delta_a, _ = journal.take()
+
+    # Save B removes that wall and succeeds before A's failure is seen
+    journal.record('walls', removed={(4, 4)})
+    version_b, delta_b, _ = journal.take()
+    journal.restore(version_a, delta_a, False)
+    stored = stored_after(stored, delta_b)
+    journal.mark_saved(version_b)
+
+    # Autosave C must not bring the wall back
+    _, delta_c, _ = journal.take()
+    stored = stored_after(stored, delta_c)
+    assert stored == {(5, 5)}
+
+
+def test_restore_keeps_cells_a_later_save_put_back():
+    stored = set()
+    journal = ChangeJournal()
+    journal.record('walls', added={(4, 4)})
+    version_a, delta_a, _ = journal.take()
+    journal.record('walls', removed={(4, 4)})
+    journal.record('walls', added={(4, 4)})
+    version_b, delta_b, _ = journal.take()
+
+    journal.restore(version_a, delta_a, False)
+    stored = stored_after(stored, delta_b)
+    journal.mark_saved(version_b)
+    stored = stored_after(stored, journal.take()[1])
+    assert stored == {(4, 4)}
+
+
+def test_reset_forgets_everything():
+    journal = ChangeJournal()
+    journal.record('walls', added={(1, 1)})
+    journal.take()
+    journal.reset()
+    assert journal.version == 0
+    assert not journal.dirty
+    assert journal.take()[1] == empty_delta()
@@ -0,0 +1,183 @@
+# test_layer_store.py
+import random
+import sqlite3
+
+import pytest
+
+import layer_store
+from grid_layer import GridLayer
+from layer_store import (
+    apply_layer_delta, compact_layer, decode_cells, encode_cells, export_layer_rows,
+    import_layer_rows, load_layer, load_layer_into
+)
+
+
+class LayerDatabase:
+    """Just the ``conn``/``cursor`` pair and row tables layer_store uses."""
+
+    def __init__(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.cursor = self.conn.cursor()
+        for table in layer_store.LAYER_TABLES.values():
+            self.cursor.execute(f"CREATE TABLE {table} (map_id INTEGER, grid_x INTEGER, grid_y INTEGER)")
+
+    def rows(self, layer, map_id=1):
+        self.cursor.execute(
+            f"SELECT grid_x, grid_y FROM {layer_store.LAYER_TABLES[layer]} WHERE map_id = ?", (map_id,)
+        )
+        return set(self.cursor.fetchall())
+
+    def count(self, table):
+        self.cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        return self.cursor.fetchone()[0]
+
+
+@pytest.fixture
+def db():
+    database = LayerDatabase()
+    yield database
+    database.conn.close()
+
+
+@pytest.mark.parametrize('cells', [
+    set(),
+    {(0, 0)},
+    {(-5, -3), (-1, 0), (4, -7)},
+    {(-1000, 5), (1000, -5)},  # Sparse: a wide, nearly empty box
+    {(x, y) for x in range(-20, 20) for y in range(-10, 30) if (x * 7 + y * 3) % 5 == 0},
+])
+def test_encode_decode_round_trip(cells):
+    assert decode_cells(encode_cells(cells)) == cells
+
+
+def test_decoded_blob_paints_a_grid_layer():
+    cells = {(-3, 2), (5, -1), (0, 0)}
+    grid = GridLayer()
+    grid.walls.paint_bitmap(*layer_store.decode_bitmap(encode_cells(cells)))
+    assert set(grid.walls) == cells
+
+
+def test_bad_blob_is_rejected():
+    with pytest.raises(ValueError):
+        decode_cells(b'XXXX' + encode_cells({(1, 1)})[4:])
+
+
+def add_rows(db, layer, cells, map_id=1):
+    with db.conn:
+        db.cursor.executemany(
+            f"INSERT INTO {layer_store.LAYER_TABLES[layer]} (map_id, grid_x, grid_y) VALUES (?, ?, ?)",
+            [(map_id, x, y) for x, y in cells]
+        )
+
+
+def test_first_save_moves_rows_to_a_blob(db):
+    add_rows(db, 'walls', {(1, 1), (2, 2)})
+    with db.conn:
+        apply_layer_delta(db, 1, 'walls', {(3, 3)}, {(1, 1)})
+    assert db.rows('walls') == set()
+    assert db.count('map_layers') == 1
+    assert db.count('map_layer_deltas') == 0
+    assert load_layer(db, 1, 'walls') == {(2, 2), (3, 3)}
+
+    with db.conn:
+        apply_layer_delta(db, 1, 'walls', {(4, 4)}, set())
+    assert db.count('map_layer_deltas') == 1
+    assert load_layer(db, 1, 'walls') == {(2, 2), (3, 3), (4, 4)}
+
+
+def test_first_load_moves_rows_to_a_blob(db):
+    add_rows(db, 'walls', {(-1, 5), (6, 0)})
+    grid = GridLayer()
+    load_layer_into(db, 1, 'walls', grid.walls)
+    load_layer_into(db, 1, 'doors', grid.doors)
+    assert set(grid.walls) == {(-1, 5), (6, 0)}
+    assert db.rows('walls') == set()
+    # Nothing is written for a layer with nothing stored
+    assert db.count('map_layers') == 1
+
+    grid = GridLayer()
+    load_layer_into(db, 1, 'walls', grid.walls)
+    assert set(grid.walls) == {(-1, 5), (6, 0)}
+
+
+def test_tables_are_created_once_per_database(db):
+    statements = []
+    db.conn.set_trace_callback(statements.append)
+    for _ in range(3):
+        with db.conn:
+            apply_layer_delta(db, 1, 'walls', {(0, 0)}, set())
+        load_layer(db, 1, 'walls')
+    assert sum('CREATE' in statement for statement in statements) == 3  # Two tables and an index
+
+
+def test_blob_layers_log_deltas_and_replay_them(db):
+    rng = random.Random(3)
+    cells = {(rng.randrange(-50, 50), rng.randrange(-50, 50)) for _ in range(400)}
+    with db.conn:
+        apply_layer_delta(db, 1, 'walls', cells, set())
+    import_layer_rows(db, 1)
+    assert db.rows('walls') == set()
+
+    expected = set(cells)
+    for _ in range(5):
+        added = {(rng.randrange(-80, 80), rng.randrange(-80, 80)) for _ in range(10)} - expected
+        removed = set(rng.sample(sorted(expected), 10))
+        expected = (expected | added) - removed
+        with db.conn:
+            apply_layer_delta(db, 1, 'walls', added, removed)
+
+    assert db.count('map_layer_deltas') == 5
+    assert load_layer(db, 1, 'walls') == expected
+    grid = GridLayer()
+    load_layer_into(db, 1, 'walls', grid.walls)
+    assert set(grid.walls) == expected
+
+    with db.conn:
+        compact_layer(db, 1, 'walls')
+    assert db.count('map_layer_deltas') == 0
+    assert load_layer(db, 1, 'walls') == expected
+
+
+def test_long_delta_logs_are_compacted(db, monkeypatch):
+    monkeypatch.setattr(layer_store, 'COMPACT_AFTER', 3)
+    with db.conn:
+        apply_layer_delta(db, 1, 'doors', {(0, 0)}, set())
+    import_layer_rows(db, 1)
+    for x in range(1, 4):
+        with db.conn:
+            apply_layer_delta(db, 1, 'doors', {(x, 0)}, set())
+    assert db.count('map_layer_deltas') == 0
+    assert load_layer(db, 1, 'doors') == {(0, 0), (1, 0), (2, 0), (3, 0)}
+
+
+def test_compact_on_request(db):
+    with db.conn:
+        apply_layer_delta(db, 1, 'walls', {(0, 0)}, set())
+    import_layer_rows(db, 1)
+    with db.conn:
+        apply_layer_delta(db, 1, 'walls', {(1, 0)}, set(), compact=True)
+    assert db.count('map_layer_deltas') == 0
+    assert load_layer(db, 1, 'walls') == {(0, 0), (1, 0)}
+
+
+def test_export_restores_rows_for_older_readers(db):
+    with db.conn:
+        apply_layer_delta(db, 1, 'walls', {(-2, 4), (7, 7)}, set())
+    import_layer_rows(db, 1)
+    with db.conn:
+        apply_layer_delta(db, 1, 'walls', {(8, 8)}, {(7, 7)})
+
+    export_layer_rows(db, 1)
+    assert db.rows('walls') == {(-2, 4), (8, 8)}
+    assert db.count('map_layers') == 0
+    assert db.count('map_layer_deltas') == 0
+
+
+def test_other_maps_are_untouched(db):
+    add_rows(db, 'walls', {(1, 1)})
+    add_rows(db, 'walls', {(2, 2)}, map_id=2)
+    import_layer_rows(db, 1)
+    with db.conn:
+        apply_layer_delta(db, 1, 'walls', set(), {(1, 1)}, compact=True)
+    assert db.rows('walls', map_id=2) == {(2, 2)}
+    assert load_layer(db, 2, 'walls') == {(2, 2)}
@@ -0,0 +1,154 @@
+# test_pathfinding.py
+import heapq
+import math
+import random
+
+import pytest
+
+from grid_layer import GridLayer
+from pathfinding import (
+    ALTERNATING, EUCLIDEAN, UNIFORM, Pathfinder, build_blocked, find_path, movement_range,
+    path_cost
+)
+
+
+def random_blocked(width, height, density, seed):
+    rng = random.Random(seed)
+    walls = {(x, y) for x in range(width) for y in range(height) if rng.random() < density}
+    return walls, build_blocked(walls, width, height)
+
+
+def reference_costs(start, blocked, width, height, diagonal, rule):
+    """Plain Dijkstra over (cell, diagonal parity) states: cheapest cost per cell."""
+    steps = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+    if diagonal:
+        steps += [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+    best = {(start, 0): 0}
+    heap = [(0, start, 0)]
+    costs = {}
+    while heap:
+        cost, (x, y), parity = heapq.heappop(heap)
+        if cost > best[((x, y), parity)]:
+            continue
+        costs[(x, y)] = min(costs.get((x, y), math.inf), cost)
+        for dx, dy in steps:
+            nx, ny = x + dx, y + dy
+            if not (0 <= nx < width and 0 <= ny < height) or blocked[ny * width + nx]:
+                continue
+            next_parity = parity
+            if dx and dy:
+                if blocked[y * width + nx] or blocked[ny * width + x]:
+                    continue
+                if rule == EUCLIDEAN:
+                    step = math.sqrt(2)
+                elif rule == ALTERNATING:
+                    step = 2 if parity else 1
+                    next_parity = parity ^ 1
+                else:
+                    step = 1
+            else:
+                step = 1
+            state = ((nx, ny), next_parity)
+            if cost + step < best.get(state, math.inf):
+                best[state] = cost + step
+                heapq.heappush(heap, (cost + step, (nx, ny), next_parity))
+    return costs
+
+
+def assert_walkable(path, start, goal, walls, diagonal):
+    assert path[0] == start and path[-1] == goal
+    for (x1, y1), (x2, y2) in zip(path, path[1:]):
+        dx, dy = abs(x2 - x1), abs(y2 - y1)
+        assert (x2, y2) not in walls
+        assert max(dx, dy) == 1 and (diagonal or dx + dy == 1)
+        if dx and dy:
+            assert (x2, y1) not in walls and (x1, y2) not in walls
+
+
+@pytest.mark.parametrize('diagonal,rule', [
+    (False, ALTERNATING), (True, UNIFORM), (True, ALTERNATING), (True, EUCLIDEAN)
+])
+@pytest.mark.parametrize('seed', range(4))
+def test_paths_are_optimal(diagonal, rule, seed):
+    width, height = 18, 14
+    walls, blocked = random_blocked(width, height, 0.25, seed)
+    rng = random.Random(seed)
+    open_cells = sorted(set((x, y) for x in range(width) for y in range(height)) - walls)
+    start = rng.choice(open_cells)
+    costs = reference_costs(start, blocked, width, height, diagonal, rule)
+
+    for goal in rng.sample(open_cells, 25):
+        result = find_path(start, goal, blocked, width, height, diagonal, rule)
+        if goal not in costs:
+            assert result is None
+            continue
+        path, cost = result
+        assert cost == pytest.approx(costs[goal])
+        assert path_cost(path, rule) == pytest.approx(cost)
+        assert_walkable(path, start, goal, walls, diagonal)
+
+
+def test_max_cost_cuts_off_longer_routes():
+    blocked = bytearray(10)
+    assert find_path((0, 0), (6, 0), blocked, 10, 1, max_cost=6) == (
+        [(x, 0) for x in range(7)], 6)
+    assert find_path((0, 0), (6, 0), blocked, 10, 1, max_cost=5) is None
+
+
+def test_walls_and_bounds_make_goals_unreachable():
+    walls = {(1, 0), (1, 1), (1, 2)}
+    blocked = build_blocked(walls, 3, 3)
+    assert find_path((0, 0), (2, 2), blocked, 3, 3, diagonal=True) is None
+    assert find_path((0, 0), (1, 1), blocked, 3, 3) is None
+    assert find_path((0, 0), (5, 5), blocked, 3, 3) is None
+    assert find_path((0, 0), (0, 0), blocked, 3, 3) == ([(0, 0)], 0)
+
+
+def test_diagonals_do_not_cut_wall_corners():
+    blocked = build_blocked({(1, 0)}, 2, 2)
+    path, cost = find_path((0, 0), (1, 1), blocked, 2, 2, diagonal=True, diagonal_rule=UNIFORM)
+    assert path == [(0, 0), (0, 1), (1, 1)] and cost == 2
+
+
+def test_alternating_rule_charges_every_second_diagonal_double():
+    assert path_cost([(0, 0), (1, 1), (2, 2), (3, 3)], ALTERNATING) == 4
+    assert path_cost([(0, 0), (1, 1), (2, 2), (3, 3)], UNIFORM) == 3
+
+
+def test_build_blocked_matches_a_grid_layer():
+    walls = {(0, 0), (3, 2), (4, 4), (9, 9)}
+    grid = GridLayer()
+    grid.walls.update(walls)
+    assert build_blocked(grid.walls, 5, 5) == build_blocked(walls, 5, 5)
+
+
+@pytest.mark.parametrize('diagonal,rule', [(False, ALTERNATING), (True, ALTERNATING), (True, EUCLIDEAN)])
+@pytest.mark.parametrize('budget', [0, 3, 5.5])
+def test_movement_range_matches_reference(diagonal, rule, budget):
+    width, height = 16, 16
+    walls, blocked = random_blocked(width, height, 0.2, 11)
+    start = next((x, y) for x in range(6, 16) for y in range(6, 16) if (x, y) not in walls)
+    costs = reference_costs(start, blocked, width, height, diagonal, rule)
+
+    reach = movement_range(start, blocked, width, height, budget, diagonal, rule)
+    expected = {cell for cell, cost in costs.items() if cost <= budget}
+    assert set(reach) == expected
+    for cell in expected:
+        assert reach.cost(*cell) == pytest.approx(costs[cell])
+
+
+def test_movement_range_with_negative_budget_is_empty():
+    reach = movement_range((1, 1), bytearray(9), 3, 3, -1)
+    assert list(reach) == [] and (1, 1) not in reach
+
+
+def test_pathfinder_caches_per_wall_version():
+    walls = {(1, 0)}
+    pathfinder = Pathfinder()
+    first = pathfinder.find((0, 0), (2, 0), walls, 3, 2, walls_version=1)
+    assert pathfinder.find((0, 0), (2, 0), walls, 3, 2, walls_version=1) is first
+    assert (pathfinder.hits, pathfinder.misses) == (1, 1)
+
+    walls.discard((1, 0))
+    path, cost = pathfinder.find((0, 0), (2, 0), walls, 3, 2, walls_version=2)
+    assert cost == 2 and pathfinder.misses == 2
@@ -0,0 +1,98 @@
+# test_token_animation.py
+import pytest
+
+from token_animation import TokenAnimator
+from token_registry import TokenRegistry
+
+
+def make_token(x=0, y=0, speed=6.0):
+    return {'id': 'a', 'x': x, 'y': y, 'target_x': x, 'target_y': y,
+            'is_moving': False, 'move_speed': speed, 'path': []}
+
+
+def run(animator, token, fps, seconds, first_delta=None):
+    """Step frames until the token arrives; return (arrival time, samples).
+
+    Time is counted from the end of the first frame, the one in which the
+    route was started.
+    """
+    delta = 1.0 / fps
+    elapsed = 0.0
+    samples = []
+    frame = 0
+    while elapsed < seconds:
+        frame_delta = first_delta if frame == 0 and first_delta is not None else delta
+        frame += 1
+        moved, arrived = animator.update(frame_delta)
+        if frame > 1:
+            elapsed += frame_delta
+        samples.append((elapsed, token['x'], token['y']))
+        if arrived:
+            return elapsed, samples
+    return None, samples
+
+
+@pytest.mark.parametrize('fps', [30, 60, 144])
+def test_route_takes_the_same_time_at_any_frame_rate(fps):
+    token = make_token()
+    animator = TokenAnimator(TokenRegistry([token]))
+    animator.start(token, [(1, 0), (2, 0), (3, 0), (3, 1), (3, 2)])
+
+    arrived_at, _ = run(animator, token, fps, 2.0)
+
+    # Five cells at six cells per second; drawing trails the simulation by a step
+    assert arrived_at == pytest.approx(5 / 6.0 + 1 / 60.0, abs=1.0 / fps + 1e-9)
+    assert (token['x'], token['y']) == (3, 2)
+    assert not token['is_moving']
+
+
+@pytest.mark.parametrize('idle_delta', [1.0 / 15, 0.5])
+def test_idle_time_before_start_is_not_applied(idle_delta):
+    token = make_token()
+    animator = TokenAnimator(TokenRegistry([token]))
+    animator.start(token, [(1, 0)])
+
+    # The frame that started the move reports the idle frame's time
+    arrived_at, samples = run(animator, token, 60, 1.0, first_delta=idle_delta)
+
+    assert samples[0] == (0.0, 0, 0)
+    assert arrived_at == pytest.approx(1 / 6.0 + 1 / 60.0, abs=1.0 / 60 + 1e-9)
+
+
+def test_extend_keeps_walking_without_stopping():
+    token = make_token()
+    animator = TokenAnimator(TokenRegistry([token]))
+    animator.start(token, [(1, 0)], eased=False)
+    animator.update(1.0 / 60)
+
+    speeds = []
+    previous_x = token['x']
+    for frame in range(40):
+        if not token['path'] and token['target_x'] < 4:
+            assert animator.extend(token, [(token['target_x'] + 1, 0)])
+        animator.update(1.0 / 60)
+        if frame:
+            speeds.append(token['x'] - previous_x)
+        previous_x = token['x']
+
+    # Constant speed across cell boundaries: no ease-out/ease-in per cell
+    moving = [speed for speed in speeds if speed]
+    assert min(moving) == pytest.approx(max(moving), rel=1e-6)
+
+
+def test_extend_refuses_eased_routes():
+    token = make_token()
+    animator = TokenAnimator(TokenRegistry([token]))
+    animator.start(token, [(2, 0)])
+    assert not animator.extend(token, [(3, 0)])
+
+
+def test_backlog_is_dropped_after_a_stall():
+    token = make_token(speed=1.0)
+    animator = TokenAnimator(TokenRegistry([token]), max_steps=8)
+    animator.start(token, [(10, 0)], eased=False)
+    animator.update(1.0 / 60)
+    animator.update(5.0)
+
+    assert token['progress'] == pytest.approx(8 / 60.0)
+    assert animator.steps_dropped > 0
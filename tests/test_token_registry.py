@@ -0,0 +1,84 @@
+# test_token_registry.py
+from token_registry import TokenRegistry, token_cell
+
+
+def make_token(token_id, x, y, **extra):
+    token = {'id': token_id, 'x': x, 'y': y, 'is_moving': False}
+    token.update(extra)
+    return token
+
+
+def test_lookup_by_id_and_draw_order():
+    a, b = make_token('a', 1, 1), make_token('b', 2, 2)
+    registry = TokenRegistry([a, b])
+    assert registry.get('b') is b
+    assert registry.get('zz') is None
+    assert 'a' in registry and len(registry) == 2
+    assert list(registry) == [a, b]
+    assert registry.tokens == [a, b]
+
+
+def test_tokens_are_hashed_by_nearest_cell():
+    token = make_token('a', 2.6, 3.4)
+    registry = TokenRegistry([token])
+    assert token_cell(token) == (3, 3)
+    assert registry.at_cell(3, 3) == [token]
+    assert registry.at_cell(2, 3) == []
+
+
+def test_moved_rehashes_only_on_a_cell_change():
+    token = make_token('a', 0, 0)
+    registry = TokenRegistry([token])
+    token['x'] = 0.4
+    registry.moved(token)
+    assert registry.at_cell(0, 0) == [token]
+    token['x'] = 0.6
+    registry.moved(token)
+    assert registry.at_cell(0, 0) == []
+    assert registry.at_cell(1, 0) == [token]
+
+
+def test_near_returns_tokens_in_insertion_order():
+    first, second, far = make_token('a', 5, 5), make_token('b', 4, 6), make_token('c', 9, 9)
+    registry = TokenRegistry([first, second, far])
+    assert registry.near(5, 5) == [first, second]
+    assert registry.near(5, 5, radius=4) == [first, second, far]
+    assert registry.near(0, 0) == []
+
+
+def test_remove_drops_every_index():
+    token = make_token('a', 1, 1, is_moving=True)
+    registry = TokenRegistry([token])
+    assert registry.moving == {'a': token}
+    assert registry.remove('a') is token
+    assert registry.remove('a') is None
+    assert registry.get('a') is None
+    assert registry.at_cell(1, 1) == []
+    assert registry.moving == {}
+    assert registry.tokens == []
+
+
+def test_adding_an_existing_id_replaces_the_token():
+    old, new = make_token('a', 1, 1), make_token('a', 7, 7)
+    registry = TokenRegistry([old])
+    registry.add(new)
+    assert registry.tokens == [new]
+    assert registry.at_cell(1, 1) == []
+    assert registry.at_cell(7, 7) == [new]
+
+
+def test_set_moving_tracks_animating_tokens():
+    token = make_token('a', 1, 1)
+    registry = TokenRegistry([token])
+    registry.set_moving(token, True)
+    assert token['is_moving'] and registry.moving == {'a': token}
+    registry.set_moving(token, False)
+    assert not token['is_moving'] and registry.moving == {}
+
+
+def test_shared_cells_keep_both_tokens():
+    a, b = make_token('a', 2, 2), make_token('b', 2, 2)
+    registry = TokenRegistry([a, b])
+    assert registry.at_cell(2, 2) == [a, b]
+    registry.remove('a')
+    assert registry.at_cell(2, 2) == [b]
@@ -0,0 +1,74 @@
+# test_visibility.py
+import random
+
+import pytest
+
+from grid_layer import GridLayer
+from visibility import compute_visible_cells, has_line_of_sight
+
+
+def random_walls(size, density, seed):
+    rng = random.Random(seed)
+    return {(x, y) for x in range(size) for y in range(size) if rng.random() < density}
+
+
+def test_open_room_sees_everything_in_radius():
+    visible = compute_visible_cells((10, 10), 5, set())
+    expected = {(x, y) for x in range(5, 16) for y in range(5, 16)
+                if (x - 10) ** 2 + (y - 10) ** 2 <= 25}
+    assert visible == expected
+
+
+def test_origin_is_visible_and_walls_are_not():
+    walls = {(11, 10), (9, 10)}
+    visible = compute_visible_cells((10, 10), 4, walls)
+    assert (10, 10) in visible
+    assert not visible & walls
+    # Straight behind a wall is hidden
+    assert (12, 10) not in visible
+    assert (8, 10) not in visible
+
+
+def test_zero_radius_sees_only_the_origin():
+    assert compute_visible_cells((3, 4), 0, set()) == {(3, 4)}
+
+
+def test_cells_outside_the_grid_are_not_visible():
+    visible = compute_visible_cells((1, 1), 6, set(), grid_width=5, grid_height=4)
+    assert all(0 <= x < 5 and 0 <= y < 4 for x, y in visible)
+    assert (4, 3) in visible
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_visibility_is_symmetric(seed):
+    size, radius = 20, 8
+    walls = random_walls(size, 0.25, seed)
+    open_cells = [(x, y) for x in range(size) for y in range(size) if (x, y) not in walls]
+    sight = {cell: compute_visible_cells(cell, radius, walls, size, size) for cell in open_cells}
+
+    for a in open_cells:
+        for b in sight[a]:
+            assert a in sight[b], f"{a} sees {b} but not the reverse"
+
+
+@pytest.mark.parametrize('bounded', [True, False])
+def test_grid_layer_walls_match_a_wall_set(bounded):
+    size, radius = 24, 9
+    walls = random_walls(size, 0.2, 11)
+    grid = GridLayer()
+    grid.walls.update(walls)
+    bounds = (size, size) if bounded else (None, None)
+    for origin in [(0, 0), (5, 17), (12, 12), (23, 2), (-3, 30)]:
+        assert (compute_visible_cells(origin, radius, grid.walls, *bounds)
+                == compute_visible_cells(origin, radius, walls, *bounds))
+
+
+def test_line_of_sight_through_a_grid_layer():
+    walls = random_walls(16, 0.2, 5)
+    grid = GridLayer()
+    grid.walls.update(walls)
+    rng = random.Random(2)
+    for _ in range(200):
+        x1, y1, x2, y2 = (rng.randrange(-2, 18) for _ in range(4))
+        assert (has_line_of_sight(grid.walls, x1, y1, x2, y2)
+                == has_line_of_sight(walls, x1, y1, x2, y2))
@@ -0,0 +1,41 @@
+# test_visibility_cache.py
+from visibility import VisibilityCache
+
+
+def counting(calls, value):
+    def run():
+        calls.append(value)
+        return {value}
+    return run
+
+
+def test_cache_reuses_results_and_evicts_oldest():
+    cache = VisibilityCache(max_entries=2)
+    calls = []
+    assert cache.get('a', counting(calls, 1)) == {1}
+    assert cache.get('a', counting(calls, 2)) == {1}
+    cache.get('b', counting(calls, 3))
+    cache.get('c', counting(calls, 4))
+    assert cache.get('a', counting(calls, 5)) == {5}
+    assert calls == [1, 3, 4, 5]
+    assert (cache.hits, cache.misses) == (1, 4)
+
+
+def test_a_hit_refreshes_the_entry():
+    cache = VisibilityCache(max_entries=2)
+    calls = []
+    cache.get('a', counting(calls, 1))
+    cache.get('b', counting(calls, 2))
+    cache.get('a', counting(calls, 3))
+    cache.get('c', counting(calls, 4))
+    assert cache.get('a', counting(calls, 5)) == {1}
+    assert cache.get('b', counting(calls, 6)) == {6}
+
+
+def test_results_are_frozen_and_clear_empties_the_cache():
+    cache = VisibilityCache()
+    result = cache.get('a', counting([], 1))
+    assert isinstance(result, frozenset)
+    assert len(cache) == 1
+    cache.clear()
+    assert len(cache) == 0
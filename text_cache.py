@@ -0,0 +1,91 @@
+# text_cache.py
+"""Cached text and location marker rendering for the map editor.
+
+``TextCache`` loads each font size once and keeps rendered text surfaces
+keyed by (text, size, color), evicting the least recently used.
+``LocationSpriteCache`` composites a location's marker and name label into
+one sprite, so drawing a location is a single blit.  Sprites are keyed by
+the name, so renaming a location is what makes a new one.
+"""
+from collections import OrderedDict
+
+import pygame
+
+MARKER_RADIUS = 8
+MARKER_FILL = (0, 255, 0)
+MARKER_BORDER = (0, 200, 0)
+LABEL_SIZE = 20
+LABEL_COLOR = (255, 255, 255)
+LABEL_BACKGROUND = (0, 0, 0)
+LABEL_OFFSET = 15  # Label centre above the marker centre, in pixels
+
+
+class TextCache:
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._fonts = {}  # size -> Font
+        self._surfaces = OrderedDict()  # (text, size, color) -> surface
+
+    def font(self, size):
+        """The default font at a size, loaded on first use."""
+        font = self._fonts.get(size)
+        if font is None:
+            font = self._fonts[size] = pygame.font.Font(None, size)
+        return font
+
+    def render(self, text, size, color):
+        """Anti-aliased text surface, rendered once per (text, size, color)."""
+        key = (text, size, tuple(color))
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            return surface
+        surface = self.font(size).render(text, True, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self._surfaces.clear()
+
+
+class LocationSpriteCache:
+    def __init__(self, text_cache, max_entries=1024):
+        self.text_cache = text_cache
+        self.max_entries = max_entries
+        self._sprites = OrderedDict()  # name -> (surface, marker centre in the surface)
+
+    def get(self, name):
+        """Return ``(sprite, (anchor_x, anchor_y))`` for a location name.
+
+        Blit the sprite at the marker's screen position minus the anchor.
+        """
+        sprite = self._sprites.get(name)
+        if sprite is not None:
+            self._sprites.move_to_end(name)
+            return sprite
+        sprite = self._sprites[name] = self._compose(name)
+        if len(self._sprites) > self.max_entries:
+            self._sprites.popitem(last=False)
+        return sprite
+
+    def clear(self):
+        self._sprites.clear()
+
+    def _compose(self, name):
+        text = self.text_cache.render(name, LABEL_SIZE, LABEL_COLOR)
+
+        # Lay out around a marker centred at (0, 0)
+        marker_rect = pygame.Rect(-MARKER_RADIUS, -MARKER_RADIUS, 2 * MARKER_RADIUS + 1, 2 * MARKER_RADIUS + 1)
+        text_rect = text.get_rect(center=(0, -LABEL_OFFSET))
+        background_rect = text_rect.inflate(4, 2)
+        bounds = marker_rect.union(background_rect)
+
+        sprite = pygame.Surface(bounds.size, pygame.SRCALPHA)
+        anchor = (-bounds.left, -bounds.top)
+        pygame.draw.circle(sprite, MARKER_FILL, anchor, MARKER_RADIUS)
+        pygame.draw.circle(sprite, MARKER_BORDER, anchor, MARKER_RADIUS, 2)
+        sprite.fill(LABEL_BACKGROUND, background_rect.move(anchor))
+        sprite.blit(text, text_rect.move(anchor))
+        return sprite, anchor
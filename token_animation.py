@@ -0,0 +1,176 @@
+# token_animation.py
+"""Frame-rate independent token movement for the map viewer.
+
+``TokenAnimator.update`` is called once per frame with the frame's
+``time_delta``.  Simulation runs in fixed ``STEP`` increments: each moving
+token's distance along its route advances by ``move_speed`` (cells per
+second) times the step, so a move takes the same time and passes through
+the same positions at 30, 60 or 144 FPS.  At most ``MAX_STEPS`` steps run
+per frame; after a stall the backlog is dropped instead of being caught up,
+which bounds the work any one frame does.
+
+The position drawn is interpolated between the last two simulation steps by
+the time left in the accumulator.  Click and drag routes are eased over the
+whole route, so a multi-cell walk speeds up and slows down once rather than
+at every cell.  Keyboard walks are linear, and ``extend`` appends the next
+cell while the token is still moving, so a held key walks without stopping.
+
+A new route's clock starts on the frame after ``start``.  The
+``time_delta`` of the frame that started it was spent before the click or
+keypress, often at the idle frame rate, so it is not applied to the route.
+
+Token dicts keep their route in ``'route'`` (points from where the move
+started), ``'route_marks'`` (distance along the route at each point) and
+``'progress'``/``'prev_progress'`` (distance covered after the last two
+steps).  ``'target_x'``/``'target_y'`` and ``'path'`` still name the next
+cell and the cells after it.
+"""
+import bisect
+import math
+
+STEP = 1.0 / 60.0  # Seconds of simulation per step
+MAX_STEPS = 8  # Steps per frame before the backlog is dropped
+DEFAULT_SPEED = 6.0  # Cells per second
+
+
+def ease_in_out(t):
+    """Smoothstep: starts and ends at zero speed."""
+    return t * t * (3.0 - 2.0 * t)
+
+
+def linear(t):
+    return t
+
+
+class TokenAnimator:
+    def __init__(self, registry, step=STEP, max_steps=MAX_STEPS, easing=ease_in_out):
+        self.registry = registry
+        self.step = step
+        self.max_steps = max_steps
+        self.easing = easing
+        self.accumulator = 0.0  # Simulation time not yet stepped
+
+        # Counters for profiling
+        self.steps_run = 0
+        self.steps_dropped = 0
+
+    def start(self, token, waypoints, eased=True):
+        """Move a token from where it is now through ``waypoints`` (grid cells).
+
+        ``eased=False`` moves at constant speed, for routes that ``extend``
+        will grow.
+        """
+        token['route'] = [(token['x'], token['y'])]
+        token['route_marks'] = [0.0]
+        token['route_eased'] = eased
+        token['route_fresh'] = True  # Not advanced until the next frame
+        token['progress'] = token['prev_progress'] = 0.0
+        self._append(token, waypoints)
+        token['target_x'], token['target_y'] = token['route'][min(1, len(token['route']) - 1)]
+        token['path'] = list(token['route'][2:])
+        self.registry.set_moving(token, True)
+
+    def extend(self, token, waypoints):
+        """Add cells to the end of a moving token's route, keeping its progress.
+
+        Returns False (doing nothing) if the token isn't moving along a
+        linear route; start a new one instead.
+        """
+        if not token.get('is_moving') or not token.get('route') or token['route_eased']:
+            return False
+        self._append(token, waypoints)
+        token['path'].extend(tuple(point) for point in waypoints)
+        return True
+
+    def stop(self, token):
+        """Stop a token where it is drawn now."""
+        token['route'] = None
+        token['path'] = []
+        self.registry.set_moving(token, False)
+
+    def update(self, time_delta):
+        """Advance every moving token by ``time_delta`` seconds.
+
+        Returns ``(moved, arrived)``: the tokens whose drawn position changed
+        and, of those, the ones that reached the end of their route.
+        """
+        moving = list(self.registry.moving.values())
+        if not moving:
+            self.accumulator = 0.0
+            return [], []
+
+        if all(token.get('route_fresh') for token in moving):
+            # Only new routes: nothing has been waiting on the accumulator
+            self.accumulator = 0.0
+        else:
+            self.accumulator += time_delta
+        steps = int(self.accumulator / self.step + 1e-6)  # Tolerate float drift in the sum
+        if steps > self.max_steps:
+            self.steps_dropped += steps - self.max_steps
+            steps = self.max_steps
+            self.accumulator = steps * self.step
+        self.accumulator = max(0.0, self.accumulator - steps * self.step)
+        self.steps_run += steps
+        alpha = self.accumulator / self.step
+
+        arrived = []
+        for token in moving:
+            if not token.get('route'):
+                # Flagged as moving without a route (e.g. restored state): snap
+                token['x'], token['y'] = token['target_x'], token['target_y']
+                self.registry.moved(token)
+                self.stop(token)
+                arrived.append(token)
+                continue
+
+            if token.pop('route_fresh', False):
+                # Drawn at the start of the route this frame
+                token['prev_progress'] = token['progress'] = 0.0
+                continue
+
+            length = token['route_marks'][-1]
+            speed = token.get('move_speed', DEFAULT_SPEED)
+            for _ in range(steps):
+                token['prev_progress'] = token['progress']
+                progress = token['progress'] + speed * self.step
+                # Summed steps fall just short of the length; don't wait a step for the rounding
+                token['progress'] = length if progress > length - 1e-9 else progress
+
+            # Drawn one step behind the simulation, so arrival is too
+            drawn = token['prev_progress'] + (token['progress'] - token['prev_progress']) * alpha
+            if drawn >= length:
+                token['x'], token['y'] = token['route'][-1]
+                token['target_x'], token['target_y'] = token['x'], token['y']
+                self.registry.moved(token)
+                self.stop(token)
+                arrived.append(token)
+                continue
+
+            if token['route_eased']:
+                drawn = self.easing(drawn / length) * length
+            self._place(token, drawn)
+        return moving, arrived
+
+    def _append(self, token, waypoints):
+        route = token['route']
+        marks = token['route_marks']
+        for point in waypoints:
+            x2, y2 = point
+            x1, y1 = route[-1]
+            route.append((x2, y2))
+            marks.append(marks[-1] + math.hypot(x2 - x1, y2 - y1))
+
+    def _place(self, token, distance):
+        """Put a token ``distance`` cells along its route."""
+        route = token['route']
+        marks = token['route_marks']
+        segment = min(len(route) - 2, max(0, bisect.bisect_right(marks, distance) - 1))
+        (x1, y1), (x2, y2) = route[segment], route[segment + 1]
+        span = marks[segment + 1] - marks[segment]
+        t = (distance - marks[segment]) / span if span else 1.0
+        token['x'] = x1 + (x2 - x1) * t
+        token['y'] = y1 + (y2 - y1) * t
+        if (token['target_x'], token['target_y']) != (x2, y2):
+            token['target_x'], token['target_y'] = x2, y2
+            token['path'] = list(route[segment + 2:])
+        self.registry.moved(token)
@@ -0,0 +1,103 @@
+# token_registry.py
+"""Token lookup for the map viewer.
+
+``TokenRegistry`` keeps the viewer's token dicts in draw order together
+with an id -> token dict and a spatial hash from grid cell to the tokens in
+it, so selection, hit-testing and per-frame lookups don't scan every token.
+Tokens are hashed by their nearest cell; call ``moved`` whenever a token's
+``x``/``y`` change so the hash follows it.  Tokens that are animating are
+also tracked, so per-frame animation only visits those.
+"""
+
+
+def token_cell(token):
+    """Nearest grid cell to a token's (possibly fractional) position."""
+    return (int(round(token['x'])), int(round(token['y'])))
+
+
+class TokenRegistry:
+    def __init__(self, tokens=()):
+        self.tokens = []  # Draw order
+        self.moving = {}  # id -> token, for tokens with is_moving set
+        self._by_id = {}
+        self._order = {}  # id -> insertion number, for stable hit-test priority
+        self._next_order = 0
+        self._cells = {}  # (x, y) -> list of tokens
+        self._token_cells = {}  # id -> cell the token is hashed under
+        for token in tokens:
+            self.add(token)
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __iter__(self):
+        return iter(self.tokens)
+
+    def __contains__(self, token_id):
+        return token_id in self._by_id
+
+    def get(self, token_id):
+        """Return the token with this id, or None."""
+        return self._by_id.get(token_id)
+
+    def add(self, token):
+        if token['id'] in self._by_id:
+            self.remove(token['id'])
+        self.tokens.append(token)
+        self._by_id[token['id']] = token
+        self._order[token['id']] = self._next_order
+        self._next_order += 1
+        self._hash(token, token_cell(token))
+        if token.get('is_moving'):
+            self.moving[token['id']] = token
+
+    def remove(self, token_id):
+        """Remove and return a token, or None if it isn't registered."""
+        token = self._by_id.pop(token_id, None)
+        if token is None:
+            return None
+        self.tokens.remove(token)
+        del self._order[token_id]
+        self.moving.pop(token_id, None)
+        self._unhash(token)
+        return token
+
+    def moved(self, token):
+        """Re-hash a token after its position changed."""
+        cell = token_cell(token)
+        if self._token_cells.get(token['id']) != cell:
+            self._unhash(token)
+            self._hash(token, cell)
+
+    def set_moving(self, token, moving):
+        """Record whether a token is animating (mirrors ``token['is_moving']``)."""
+        token['is_moving'] = moving
+        if moving:
+            self.moving[token['id']] = token
+        else:
+            self.moving.pop(token['id'], None)
+
+    def at_cell(self, x, y):
+        """Tokens hashed under a cell (a copy, safe to keep)."""
+        return list(self._cells.get((x, y), ()))
+
+    def near(self, x, y, radius=1):
+        """Tokens hashed within ``radius`` cells of (x, y), in draw order."""
+        found = []
+        for cell_y in range(y - radius, y + radius + 1):
+            for cell_x in range(x - radius, x + radius + 1):
+                found.extend(self._cells.get((cell_x, cell_y), ()))
+        found.sort(key=lambda token: self._order[token['id']])
+        return found
+
+    def _hash(self, token, cell):
+        self._cells.setdefault(cell, []).append(token)
+        self._token_cells[token['id']] = cell
+
+    def _unhash(self, token):
+        cell = self._token_cells.pop(token['id'], None)
+        bucket = self._cells.get(cell)
+        if bucket is not None:
+            bucket.remove(token)
+            if not bucket:
+                del self._cells[cell]